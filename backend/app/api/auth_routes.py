@@ -1,16 +1,16 @@
 from fastapi import APIRouter, HTTPException, Header
 from pydantic import BaseModel
-import sqlite3
 from datetime import datetime
 from typing import Optional
 
 from app.models.database import (
-    DATABASE,
+    connect,
     hash_password,
     verify_password,
     create_session_token,
     get_session_expiry
 )
+from app.services.chat_sessions import chat_sessions
 
 router = APIRouter()
 
@@ -30,7 +30,7 @@ async def register(req: RegisterRequest):
     if len(req.password) < 6:
         raise HTTPException(status_code=400, detail="Password must be at least 6 characters")
     
-    conn = sqlite3.connect(DATABASE)
+    conn = connect()
     cursor = conn.cursor()
     
     try:
@@ -57,7 +57,7 @@ async def register(req: RegisterRequest):
 @router.post("/api/login")
 async def login(req: LoginRequest):
     """Login and create session"""
-    conn = sqlite3.connect(DATABASE)
+    conn = connect()
     cursor = conn.cursor()
     
     try:
@@ -97,7 +97,7 @@ async def get_current_user(authorization: Optional[str] = Header(None)):
     
     session_token = authorization.replace("Bearer ", "")
     
-    conn = sqlite3.connect(DATABASE)
+    conn = connect()
     cursor = conn.cursor()
     
     try:
@@ -133,12 +133,13 @@ async def logout(authorization: Optional[str] = Header(None)):
     
     session_token = authorization.replace("Bearer ", "")
     
-    conn = sqlite3.connect(DATABASE)
+    conn = connect()
     cursor = conn.cursor()
     
     try:
         cursor.execute("DELETE FROM sessions WHERE session_token = ?", (session_token,))
         conn.commit()
+        chat_sessions.end_owner(session_token)
         return {"message": "Logged out successfully"}
     
     finally:
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, HTTPException, Header
+from fastapi.responses import FileResponse
+from typing import Optional
+
+from app.utils.profiling import profile_store
+
+router = APIRouter()
+
+
+def require_admin(admin_token: Optional[str]):
+    """Reject requests without the profiling admin token"""
+    if not profile_store.is_admin(admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+@router.get("/api/admin/profiles")
+async def list_profiles(x_admin_token: Optional[str] = Header(None)):
+    """List captured request profiles, newest first"""
+    require_admin(x_admin_token)
+    return {"profiles": profile_store.list_reports()}
+
+
+@router.get("/api/admin/profiles/{name}")
+async def download_profile(name: str, x_admin_token: Optional[str] = Header(None)):
+    """Download a .pstats profile report"""
+    require_admin(x_admin_token)
+    path = profile_store.report_path(name)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=name)
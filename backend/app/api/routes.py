@@ -1,19 +1,30 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Header
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from langchain.schema import Document
 import os
 import shutil
-import sqlite3
+import sys
 from datetime import datetime
-from app.services.document_processor import DocumentProcessor
+from app.services.document_processor import DocumentProcessor, PageRangeError
 from app.services.embedding_service import embedding_service
+from app.services.context_builder import context_builder
+from app.services.precompute import artifact_store, precomputer, sample_quiz
+from app.services.bulk_upload import bulk_upload_service
+from app.services.chat_sessions import chat_sessions, ChatSession
 from app.services.llm_service import llm_service
-from app.models.database import db, DATABASE
+from app.utils.concurrency import OverloadedError
+from app.utils.profiling import run_in_threadpool
+from app.utils.scheduler import scheduler, INTERACTIVE, ON_DEMAND, BACKGROUND
+from app.utils.singleflight import single_flight, normalize_text, fingerprint
+from app.models.database import db, connect
 from app.config import settings
 
 router = APIRouter()
 
+# Retrieval scope of /query: every question searches the shared collection
+QUERY_COLLECTION = "course_materials"
+
 # Helper function to get user from session token
 def get_user_from_token(authorization: Optional[str]) -> int:
     """Extract user_id from session token"""
@@ -22,7 +33,7 @@ def get_user_from_token(authorization: Optional[str]) -> int:
     
     session_token = authorization.replace("Bearer ", "")
     
-    conn = sqlite3.connect(DATABASE)
+    conn = connect()
     cursor = conn.cursor()
     
     try:
@@ -52,17 +63,40 @@ def get_user_from_token(authorization: Optional[str]) -> int:
 class QueryRequest(BaseModel):
     question: str
     use_wikipedia: bool = False
+    chat_id: Optional[str] = None  # from POST /chats; follow-ups reuse its history and retrieved chunks
 
 class QueryResponse(BaseModel):
     answer: str
     sources: List[str]
+    chat_id: Optional[str] = None
 
 class SummarizeRequest(BaseModel):
     document_id: int
+    page_start: Optional[int] = None  # pages (PDF) or slides (PPTX), 1-based and inclusive
+    page_end: Optional[int] = None
 
 class QuizRequest(BaseModel):
     document_id: int
     num_questions: int = 5
+    page_start: Optional[int] = None
+    page_end: Optional[int] = None
+
+def requested_pages(request) -> Optional[Tuple[int, int]]:
+    """Page/slide range of a summarize or quiz request, or None for the whole document"""
+    if request.page_start is None and request.page_end is None:
+        return None
+    first = 1 if request.page_start is None else request.page_start
+    last = request.page_end if request.page_end is not None else sys.maxsize
+    return first, last
+
+def index_file(file_path: str, file_type: str, filename: str) -> int:
+    """Extract a saved upload (remembering where each page/slide starts) and add its chunks to the vector store"""
+    text, page_starts = bulk_upload_service.extract(file_path, file_type)
+    return embedding_service.add_document_to_vectordb(
+        text=text,
+        filename=filename,
+        page_starts=page_starts
+    )
 
 # Upload endpoint - NOW REQUIRES AUTH
 @router.post("/upload")
@@ -88,14 +122,9 @@ async def upload_document(
 
         file_size = os.path.getsize(file_path)
 
-        # Extract text
-        text = DocumentProcessor.process_document(file_path, file_extension)
-        
-        # Add to vector store using the CORRECT method
-        chunks_created = embedding_service.add_document_to_vectordb(
-            text=text,
-            filename=file.filename
-        )
+        # Extract and index in a worker thread, as background work that yields to queries
+        async with scheduler.admit(BACKGROUND, user_id):
+            chunks_created = await run_in_threadpool(index_file, file_path, file_extension, file.filename)
         
         # Save to database WITH user_id
         conn = db.get_connection()
@@ -115,6 +144,10 @@ async def upload_document(
         doc_id = cursor.lastrowid
         conn.close()
         
+        # Summary and quiz pool are generated in the background once the document is indexed
+        if settings.PRECOMPUTE_ENABLED:
+            precomputer.enqueue(doc_id, file_path)
+        
         return {
             "message": "Document uploaded successfully",
             "document_id": doc_id,
@@ -125,8 +158,43 @@ async def upload_document(
     except Exception as e:
         if file_path and os.path.exists(file_path):
             os.remove(file_path)
+        if isinstance(e, OverloadedError):
+            raise
         raise HTTPException(status_code=500, detail=str(e))
 
+# Bulk upload - several files and/or ZIP archives in one request
+@router.post("/upload/bulk")
+async def upload_documents_bulk(
+    files: List[UploadFile] = File(...),
+    authorization: Optional[str] = Header(None)
+):
+    """Upload and process many documents at once (requires authentication)"""
+    user_id = get_user_from_token(authorization)
+    
+    # Save files (streaming ZIP members one by one), then extract in parallel and embed together
+    items = await run_in_threadpool(
+        bulk_upload_service.save_uploads, [(file.filename, file.file) for file in files]
+    )
+    try:
+        async with scheduler.admit(BACKGROUND, user_id):
+            items = await run_in_threadpool(bulk_upload_service.ingest, items, user_id)
+    except OverloadedError:
+        for item in items:
+            if item.file_path and os.path.exists(item.file_path):
+                os.remove(item.file_path)
+        raise
+    
+    if settings.PRECOMPUTE_ENABLED:
+        for item in items:
+            if item.status == "ok":
+                precomputer.enqueue(item.document_id, item.file_path)
+    
+    results = [item.result() for item in items]
+    return {
+        "message": f"{sum(1 for r in results if r['status'] == 'ok')} of {len(results)} documents uploaded",
+        "results": results
+    }
+
 # Get documents - FILTER BY USER
 @router.get("/documents")
 async def get_documents(authorization: Optional[str] = Header(None)):
@@ -157,6 +225,105 @@ async def get_documents(authorization: Optional[str] = Header(None)):
     conn.close()
     return {"documents": documents}
 
+# Coalesced building blocks: identical concurrent calls share one execution
+async def search_chunks(question: str, k: int = settings.CONTEXT_FETCH_K):
+    """Candidate chunks with embeddings, shared by concurrent callers asking the same question"""
+    return await single_flight.run(
+        "search",
+        (QUERY_COLLECTION, k, normalize_text(question)),
+        lambda: run_in_threadpool(embedding_service.search_candidates, question, k, QUERY_COLLECTION)
+    )
+
+async def fetch_wikipedia(question: str) -> str:
+    """Wikipedia lookup, shared by concurrent callers asking the same question"""
+    return await single_flight.run(
+        "wikipedia",
+        normalize_text(question),
+        lambda: run_in_threadpool(llm_service.get_wikipedia_answer, question)
+    )
+
+async def admitted(priority: str, user_id: int, work):
+    """Run work (a coroutine function) once the scheduler admits it; a shared flight is admitted once"""
+    async with scheduler.admit(priority, user_id):
+        return await work()
+
+async def generate(operation: str, func, *args, user_id: Optional[int] = None):
+    """LLM generation, shared by concurrent callers with identical inputs"""
+    return await single_flight.run(
+        "llm",
+        fingerprint(operation, *args),
+        lambda: run_in_threadpool(func, *args, user_id)
+    )
+
+async def answer_question(
+    question: str,
+    use_wikipedia: bool,
+    user_id: int,
+    chat: Optional[ChatSession] = None
+) -> QueryResponse:
+    """Retrieve context and generate an answer (a follow-up when chat has earlier turns)"""
+    # Always search documents first; chat follow-ups start from the chunks already retrieved
+    history = None
+    if chat is None:
+        query_vector, results, embeddings = await search_chunks(question)
+    else:
+        query_vector, results, embeddings = await run_in_threadpool(
+            chat_sessions.retrieve, chat, question, QUERY_COLLECTION
+        )
+        history = chat_sessions.history(chat)
+    
+    # Check if we found relevant content in documents
+    if results and len(results) > 0:
+        # If Wikipedia checkbox is enabled, enhance with Wikipedia
+        wiki_info = None
+        if use_wikipedia:
+            try:
+                wiki_info = await fetch_wikipedia(question)
+                
+                # Only add Wikipedia if it's not an error message
+                if wiki_info.startswith("I couldn't") or wiki_info.startswith("Error"):
+                    wiki_info = None
+            except OverloadedError:
+                raise
+            except:
+                # If Wikipedia fails, just use document context
+                wiki_info = None
+        
+        # De-duplicate, diversify and pack the chunks (and Wikipedia text) into the token budget
+        packed = await run_in_threadpool(context_builder.build, query_vector, results, embeddings, wiki_info)
+        sources = list(packed.citations)
+        
+        if packed.wikipedia:
+            # Combine document context with Wikipedia
+            context = f"""Document Content:
+{packed.documents}
+
+Additional Wikipedia Information:
+{packed.wikipedia}"""
+            sources.append("Wikipedia")
+        else:
+            # Generate answer from documents only
+            context = packed.documents
+        
+        if history:
+            answer = await generate(
+                "chat_answer", llm_service.generate_chat_answer, question, context, history, user_id=user_id
+            )
+        else:
+            answer = await generate("answer", llm_service.generate_answer, question, context, user_id=user_id)
+        return QueryResponse(answer=answer, sources=sources)
+    
+    else:
+        # No documents found, use Wikipedia if enabled
+        if use_wikipedia:
+            answer = await fetch_wikipedia(question)
+            return QueryResponse(answer=answer, sources=["Wikipedia"])
+        else:
+            return QueryResponse(
+                answer="I couldn't find relevant information in your documents. Try enabling Wikipedia for general knowledge.",
+                sources=[]
+            )
+
 # Question answering - INTELLIGENT COMBINATION
 @router.post("/query", response_model=QueryResponse)
 async def query_documents(
@@ -167,55 +334,55 @@ async def query_documents(
     user_id = get_user_from_token(authorization)
     
     try:
-        # Always search documents first
-        results = embedding_service.search_documents(request.question, k=5)
-        
-        # Check if we found relevant content in documents
-        if results and len(results) > 0:
-            # We have document content
-            context = "\n\n".join([doc.page_content for doc in results])
-            sources = list(set([doc.metadata.get("source", "Unknown") for doc in results]))
-            
-            # If Wikipedia checkbox is enabled, enhance with Wikipedia
-            if request.use_wikipedia:
-                try:
-                    wiki_info = llm_service.get_wikipedia_answer(request.question)
-                    
-                    # Only add Wikipedia if it's not an error message
-                    if not wiki_info.startswith("I couldn't") and not wiki_info.startswith("Error"):
-                        # Combine document context with Wikipedia
-                        combined_context = f"""Document Content:
-{context}
-
-Additional Wikipedia Information:
-{wiki_info}"""
-                        
-                        answer = llm_service.generate_answer(request.question, combined_context)
-                        sources.append("Wikipedia")
-                        
-                        return QueryResponse(answer=answer, sources=sources)
-                except:
-                    # If Wikipedia fails, just use document context
-                    pass
-            
-            # Generate answer from documents only
-            answer = llm_service.generate_answer(request.question, context)
-            return QueryResponse(answer=answer, sources=sources)
+        if request.chat_id and settings.CHAT_SESSIONS_ENABLED:
+            # Chat questions depend on their session, so they are not coalesced with others
+            chat = chat_sessions.start(authorization.replace("Bearer ", ""), request.chat_id)
+            response = await admitted(
+                INTERACTIVE, user_id,
+                lambda: answer_question(request.question, request.use_wikipedia, user_id, chat)
+            )
+            chat_sessions.record(chat, request.question, response.answer)
+            response.chat_id = chat.chat_id
+            return response
         
-        else:
-            # No documents found, use Wikipedia if enabled
-            if request.use_wikipedia:
-                answer = llm_service.get_wikipedia_answer(request.question)
-                return QueryResponse(answer=answer, sources=["Wikipedia"])
-            else:
-                return QueryResponse(
-                    answer="I couldn't find relevant information in your documents. Try enabling Wikipedia for general knowledge.",
-                    sources=[]
-                )
+        # Identical questions over the same scope that arrive together are answered once
+        return await single_flight.run(
+            "query",
+            (QUERY_COLLECTION, normalize_text(request.question), request.use_wikipedia),
+            lambda: admitted(
+                INTERACTIVE, user_id, lambda: answer_question(request.question, request.use_wikipedia, user_id)
+            )
+        )
     
+    except OverloadedError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Chat sessions
+@router.post("/chats")
+async def start_chat(authorization: Optional[str] = Header(None)):
+    """Start a chat session for follow-up questions (requires authentication)"""
+    get_user_from_token(authorization)
+    if not settings.CHAT_SESSIONS_ENABLED:
+        raise HTTPException(status_code=404, detail="Chat sessions are disabled")
+    chat = chat_sessions.start(authorization.replace("Bearer ", ""))
+    return {"chat_id": chat.chat_id}
+
+@router.delete("/chats/{chat_id}")
+async def end_chat(chat_id: str, authorization: Optional[str] = Header(None)):
+    """Forget a chat session's history and retrieved chunks (requires authentication)"""
+    get_user_from_token(authorization)
+    if not chat_sessions.end(authorization.replace("Bearer ", ""), chat_id):
+        raise HTTPException(status_code=404, detail="Chat not found")
+    return {"message": "Chat ended"}
+
+async def summarize_file(file_path: str, user_id: int, page_range: Optional[Tuple[int, int]] = None) -> str:
+    """Extract a document's text (or just the requested pages) and summarize it"""
+    file_extension = file_path.split(".")[-1].lower()
+    text = await run_in_threadpool(DocumentProcessor.process_document, file_path, file_extension, page_range)
+    return await generate("summary", llm_service.generate_summary, text, user_id=user_id)
+
 # Summarize document
 @router.post("/summarize")
 async def summarize_document(
@@ -242,16 +409,28 @@ async def summarize_document(
     
     file_path = result[0]
     
+    page_range = requested_pages(request)
+    
     try:
-        # Extract text
-        file_extension = file_path.split(".")[-1].lower()
-        text = DocumentProcessor.process_document(file_path, file_extension)
-        
-        # Generate summary
-        summary = llm_service.generate_summary(text)
+        # Precomputed after upload, and kept once generated, only when precompute is enabled (whole documents only)
+        stored = settings.PRECOMPUTE_ENABLED and page_range is None
+        summary = artifact_store.get(request.document_id, "summary") if stored else None
+        if summary is None:
+            # Concurrent requests for the same document share one extraction and LLM call
+            summary = await single_flight.run(
+                "summarize",
+                (request.document_id, page_range),
+                lambda: admitted(ON_DEMAND, user_id, lambda: summarize_file(file_path, user_id, page_range))
+            )
+            if stored:
+                artifact_store.put(request.document_id, "summary", summary)
         
         return {"summary": summary}
     
+    except OverloadedError:
+        raise
+    except PageRangeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -281,16 +460,31 @@ async def generate_quiz(
     
     file_path = result[0]
     
+    page_range = requested_pages(request)
+    
     try:
-        # Extract text
-        file_extension = file_path.split(".")[-1].lower()
-        text = DocumentProcessor.process_document(file_path, file_extension)
+        # Draw from the precomputed question pool when it is large enough (whole documents only)
+        if settings.PRECOMPUTE_ENABLED and page_range is None:
+            quiz = sample_quiz(artifact_store.get(request.document_id, "quiz"), request.num_questions)
+            if quiz is not None:
+                return {"quiz": quiz}
         
-        # Generate quiz
-        quiz = llm_service.generate_quiz(text, request.num_questions)
+        async with scheduler.admit(ON_DEMAND, user_id):
+            # Extract text (only the requested pages, if any)
+            file_extension = file_path.split(".")[-1].lower()
+            text = await run_in_threadpool(DocumentProcessor.process_document, file_path, file_extension, page_range)
+            
+            # Generate quiz
+            quiz = await generate(
+                "quiz", llm_service.generate_quiz, text, request.num_questions, user_id=user_id
+            )
         
         return {"quiz": quiz}
     
+    except OverloadedError:
+        raise
+    except PageRangeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -320,10 +514,14 @@ async def delete_document(
     
     file_path = result[0]
     
+    # Stop any background summary/quiz generation for it
+    precomputer.cancel(document_id)
+    
     # Delete from database
     cursor.execute("DELETE FROM documents WHERE id = ?", (document_id,))
     conn.commit()
     conn.close()
+    artifact_store.delete_document(document_id)
     
     # Delete file
     if os.path.exists(file_path):
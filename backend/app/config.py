@@ -1,4 +1,5 @@
 import os
+import re
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,15 +10,121 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 class Settings:
     GROQ_API_KEY: str = os.getenv("GROQ_API_KEY")
     EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
-    CHROMA_DB_PATH: str = os.path.join(BASE_DIR, "chroma_db")
-    UPLOADS_PATH: str = os.path.join(BASE_DIR, "uploads")
+    CHROMA_DB_PATH: str = os.getenv("CHROMA_DB_PATH", os.path.join(BASE_DIR, "chroma_db"))
+    UPLOADS_PATH: str = os.getenv("UPLOADS_PATH", os.path.join(BASE_DIR, "uploads"))
+
+    # Shared embedding server (None embeds in each worker process)
+    EMBEDDING_SERVER_SOCKET: str = os.getenv("EMBEDDING_SERVER_SOCKET")
+    EMBEDDING_SERVER_AUTOSTART: bool = os.getenv("EMBEDDING_SERVER_AUTOSTART", "false").lower() == "true"
+    EMBEDDING_SERVER_TIMEOUT: float = float(os.getenv("EMBEDDING_SERVER_TIMEOUT", "60"))
+    EMBEDDING_SERVER_STARTUP_TIMEOUT: float = float(os.getenv("EMBEDDING_SERVER_STARTUP_TIMEOUT", "120"))
+
+    # Micro-batching of query embeddings across concurrent requests (size 1 disables it)
+    EMBED_BATCH_MAX_SIZE: int = int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))
+    EMBED_BATCH_WINDOW_MS: float = float(os.getenv("EMBED_BATCH_WINDOW_MS", "2"))
+    EMBED_BATCH_TIMEOUT: float = float(os.getenv("EMBED_BATCH_TIMEOUT", "30"))  # seconds a query waits for its batch
 
     # Groq model settings
     GROQ_MODEL: str = "llama-3.3-70b-versatile"
+    GROQ_API_BASE: str = os.getenv("GROQ_API_BASE")  # None uses Groq's public API
+    GROQ_TIMEOUT: float = float(os.getenv("GROQ_TIMEOUT", "60"))
+
+    # Groq concurrency limits and retry on rate limiting (per worker process)
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    LLM_MAX_PER_USER: int = int(os.getenv("LLM_MAX_PER_USER", "2"))
+    LLM_MAX_QUEUE: int = int(os.getenv("LLM_MAX_QUEUE", "16"))
+    LLM_QUEUE_TIMEOUT: float = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "3"))
+    LLM_RETRY_BASE_DELAY: float = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+    LLM_RETRY_MAX_DELAY: float = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+
+    # Admission control in front of expensive work (per worker process). Slots go to interactive
+    # queries first, then on-demand summaries/quizzes, then uploads and background precompute;
+    # the lower classes are capped so queries always find a free slot.
+    SCHEDULER_ENABLED: bool = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+    SCHEDULER_MAX_CONCURRENT: int = int(os.getenv("SCHEDULER_MAX_CONCURRENT", "16"))
+    SCHEDULER_INTERACTIVE_PER_USER: int = int(os.getenv("SCHEDULER_INTERACTIVE_PER_USER", "2"))
+    SCHEDULER_INTERACTIVE_QUEUE: int = int(os.getenv("SCHEDULER_INTERACTIVE_QUEUE", "64"))
+    SCHEDULER_ON_DEMAND_MAX: int = int(os.getenv("SCHEDULER_ON_DEMAND_MAX", "6"))
+    SCHEDULER_ON_DEMAND_PER_USER: int = int(os.getenv("SCHEDULER_ON_DEMAND_PER_USER", "1"))
+    SCHEDULER_ON_DEMAND_QUEUE: int = int(os.getenv("SCHEDULER_ON_DEMAND_QUEUE", "16"))
+    SCHEDULER_BACKGROUND_MAX: int = int(os.getenv("SCHEDULER_BACKGROUND_MAX", "2"))
+    SCHEDULER_BACKGROUND_PER_USER: int = int(os.getenv("SCHEDULER_BACKGROUND_PER_USER", "1"))
+    SCHEDULER_BACKGROUND_QUEUE: int = int(os.getenv("SCHEDULER_BACKGROUND_QUEUE", "16"))
+    SCHEDULER_QUEUE_TIMEOUT: float = float(os.getenv("SCHEDULER_QUEUE_TIMEOUT", "30"))
+    SCHEDULER_BACKGROUND_QUEUE_TIMEOUT: float = float(os.getenv("SCHEDULER_BACKGROUND_QUEUE_TIMEOUT", "300"))
+    SCHEDULER_YIELD_MS: float = float(os.getenv("SCHEDULER_YIELD_MS", "200"))
+
+    # MediaWiki API used for Wikipedia lookups (None uses en.wikipedia.org)
+    WIKIPEDIA_API_URL: str = os.getenv("WIKIPEDIA_API_URL")
+
+    # Chunking settings (measured in embedding-model tokens; MiniLM truncates at 256)
+    CHUNK_MAX_TOKENS: int = int(os.getenv("CHUNK_MAX_TOKENS", "250"))
+    CHUNK_OVERLAP_TOKENS: int = int(os.getenv("CHUNK_OVERLAP_TOKENS", "40"))
+
+    # HNSW index parameters for new collections (Chroma defaults). Any of them can be set for a
+    # single collection as HNSW_<COLLECTION>_<PARAM>, e.g. HNSW_COURSE_MATERIALS_SEARCH_EF=64.
+    # Space, M and construction ef are fixed once a collection exists; search ef is updated in place.
+    HNSW_SPACE: str = os.getenv("HNSW_SPACE", "l2")
+    HNSW_M: int = int(os.getenv("HNSW_M", "16"))
+    HNSW_CONSTRUCTION_EF: int = int(os.getenv("HNSW_CONSTRUCTION_EF", "100"))
+    HNSW_SEARCH_EF: int = int(os.getenv("HNSW_SEARCH_EF", "100"))
+
+    def hnsw_config(self, collection_name: str) -> dict:
+        """Chroma HNSW configuration for a collection, with per-collection overrides"""
+        prefix = "HNSW_" + re.sub(r"[^A-Z0-9]", "_", collection_name.upper()) + "_"
+        def value(param: str, default, cast):
+            return cast(os.getenv(prefix + param, default))
+        return {
+            "space": value("SPACE", self.HNSW_SPACE, str),
+            "max_neighbors": value("M", self.HNSW_M, int),
+            "ef_construction": value("CONSTRUCTION_EF", self.HNSW_CONSTRUCTION_EF, int),
+            "ef_search": value("SEARCH_EF", self.HNSW_SEARCH_EF, int),
+        }
+
+    # Small collections are searched exactly in-process from a memory-mapped matrix and moved to
+    # Chroma once they outgrow LOCAL_VECTOR_MAX_CHUNKS ("chroma" always uses Chroma). Collections
+    # that already hold chunks in Chroma stay there.
+    VECTOR_BACKEND: str = os.getenv("VECTOR_BACKEND", "auto")
+    LOCAL_VECTOR_PATH: str = os.getenv("LOCAL_VECTOR_PATH", os.path.join(BASE_DIR, "local_vectors"))
+    LOCAL_VECTOR_MAX_CHUNKS: int = int(os.getenv("LOCAL_VECTOR_MAX_CHUNKS", "15000"))
+    LOCAL_VECTOR_DTYPE: str = os.getenv("LOCAL_VECTOR_DTYPE", "float32")  # float16 halves the matrix but searches slower
+
+    # Answer context assembly (budgets in embedding-model tokens, a close proxy for Groq's)
+    CONTEXT_MAX_TOKENS: int = int(os.getenv("CONTEXT_MAX_TOKENS", "1000"))
+    CONTEXT_WIKIPEDIA_MAX_TOKENS: int = int(os.getenv("CONTEXT_WIKIPEDIA_MAX_TOKENS", "300"))
+    CONTEXT_FETCH_K: int = int(os.getenv("CONTEXT_FETCH_K", "20"))
+    CONTEXT_MMR_LAMBDA: float = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+
+    # Chat sessions for /query follow-ups (per worker process, dropped on logout or after CHAT_SESSION_TTL idle seconds)
+    CHAT_SESSIONS_ENABLED: bool = os.getenv("CHAT_SESSIONS_ENABLED", "true").lower() == "true"
+    CHAT_MAX_SESSIONS: int = int(os.getenv("CHAT_MAX_SESSIONS", "256"))
+    CHAT_SESSION_TTL: float = float(os.getenv("CHAT_SESSION_TTL", "3600"))
+    CHAT_MAX_TURNS: int = int(os.getenv("CHAT_MAX_TURNS", "6"))
+    CHAT_HISTORY_MAX_TOKENS: int = int(os.getenv("CHAT_HISTORY_MAX_TOKENS", "400"))
+    # Follow-ups close to the last search reuse its chunks; others fetch this many more and merge
+    CHAT_REUSE_SIMILARITY: float = float(os.getenv("CHAT_REUSE_SIMILARITY", "0.85"))
+    CHAT_FOLLOWUP_FETCH_K: int = int(os.getenv("CHAT_FOLLOWUP_FETCH_K", "8"))
+    CHAT_MAX_CANDIDATES: int = int(os.getenv("CHAT_MAX_CANDIDATES", "30"))
+
+    # Background summary/quiz generation after upload (spends Groq tokens on every document)
+    PRECOMPUTE_ENABLED: bool = os.getenv("PRECOMPUTE_ENABLED", "false").lower() == "true"
+    QUIZ_POOL_SIZE: int = int(os.getenv("QUIZ_POOL_SIZE", "15"))
+    PRECOMPUTE_CLAIM_TIMEOUT: float = float(os.getenv("PRECOMPUTE_CLAIM_TIMEOUT", "600"))
+    PRECOMPUTE_NICE: int = int(os.getenv("PRECOMPUTE_NICE", "10"))
+
+    # Bulk upload (several files or ZIP archives per request)
+    BULK_MAX_FILES: int = int(os.getenv("BULK_MAX_FILES", "200"))
+    BULK_MAX_FILE_MB: int = int(os.getenv("BULK_MAX_FILE_MB", "100"))
+    # Text extraction processes for all uploads (0 extracts in the request thread) and their nice level
+    BULK_EXTRACT_WORKERS: int = int(os.getenv("BULK_EXTRACT_WORKERS", str(min(os.cpu_count() or 1, 4))))
+    EXTRACT_NICE: int = int(os.getenv("EXTRACT_NICE", "10"))
 
-    # Chunking settings
-    CHUNK_SIZE: int = 1000
-    CHUNK_OVERLAP: int = 200
+    # Per-request profiling (off unless a token or sample rate is set)
+    PROFILE_ADMIN_TOKEN: str = os.getenv("PROFILE_ADMIN_TOKEN")
+    PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILES_PATH: str = os.getenv("PROFILES_PATH", os.path.join(BASE_DIR, "profiles"))
+    PROFILE_MAX_REPORTS: int = int(os.getenv("PROFILE_MAX_REPORTS", "50"))
 
 settings = Settings()
 
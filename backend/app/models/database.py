@@ -1,9 +1,32 @@
+import os
 import sqlite3
 import hashlib
 import secrets
 from datetime import datetime, timedelta
+from app.utils.metrics import DB_QUERY_SECONDS
 
-DATABASE = "campus_assistant.db"
+DATABASE = os.getenv("DATABASE_PATH", "campus_assistant.db")
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that records how long each statement takes"""
+    
+    def execute(self, sql, parameters=()):
+        statement = sql.split(None, 1)[0].upper() if sql.strip() else "UNKNOWN"
+        with DB_QUERY_SECONDS.time(statement=statement):
+            return super().execute(sql, parameters)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors are InstrumentedCursor"""
+    
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+
+def connect() -> sqlite3.Connection:
+    """Open a connection to the app database"""
+    return sqlite3.connect(DATABASE, factory=InstrumentedConnection)
 
 class Database:
     def __init__(self):
@@ -12,7 +35,7 @@ class Database:
     
     def init_db(self):
         """Initialize the documents table"""
-        conn = sqlite3.connect(DATABASE)
+        conn = connect()
         cursor = conn.cursor()
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS documents (
@@ -25,12 +48,24 @@ class Database:
                 user_id INTEGER
             )
         ''')
+        # Summaries and quiz pools generated in the background after upload
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS document_artifacts (
+                document_id INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                status TEXT NOT NULL,
+                content TEXT,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (document_id, kind)
+            )
+        ''')
         conn.commit()
         conn.close()
     
     def get_connection(self):
         """Get database connection"""
-        return sqlite3.connect(DATABASE)
+        return connect()
 
 # Create a singleton instance
 db = Database()
@@ -39,7 +74,7 @@ db = Database()
 
 def init_auth_db():
     """Create users and sessions tables if they don't exist"""
-    conn = sqlite3.connect(DATABASE)
+    conn = connect()
     cursor = conn.cursor()
     
     # Users table
@@ -0,0 +1,272 @@
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import BinaryIO, List, Optional, Tuple
+from app.config import settings
+from app.models.database import connect
+from app.services.document_processor import PageStarts, extract_text_timed, lower_priority
+from app.services.embedding_service import embedding_service
+from app.utils.metrics import metrics, EXTRACT_SECONDS, EXTRACT_CHARACTERS
+from app.utils.profiling import record_extraction
+
+SUPPORTED_TYPES = ("pdf", "docx", "pptx")
+
+BULK_FILES = metrics.counter("bulk_upload_files_total", "Files received by bulk upload", ("status",))
+
+
+class FileTooLargeError(Exception):
+    """Raised when an uploaded file or archive member exceeds BULK_MAX_FILE_MB"""
+
+
+class BulkFile:
+    """One document of a bulk upload and its outcome"""
+
+    def __init__(self, filename: str, file_path: Optional[str] = None, status: str = "pending", detail: str = None):
+        self.filename = filename
+        self.file_path = file_path
+        self.file_type = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+        self.status = status
+        self.detail = detail
+        self.text = None
+        self.page_starts = None
+        self.chunks = 0
+        self.document_id = None
+
+    def fail(self, detail: str, status: str = "error"):
+        self.status = status
+        self.detail = detail
+
+    def result(self) -> dict:
+        result = {"filename": self.filename, "status": self.status}
+        if self.status == "ok":
+            result.update(document_id=self.document_id, chunks=self.chunks)
+        else:
+            result["detail"] = self.detail
+        return result
+
+
+class BulkUploadService:
+    """
+    Ingest many documents (loose files or ZIP archives) in one request
+
+    Archive members are streamed to the uploads folder one at a time, text is
+    extracted in a pool of worker processes, all chunks are embedded together
+    so batches span file boundaries, and every documents row is inserted in a
+    single transaction. A file that cannot be read fails on its own; the rest
+    are still ingested.
+    """
+
+    def __init__(self):
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        """Extraction processes, started on first use and kept for later uploads"""
+        if self._pool is None:
+            # Reniced so extraction leaves the CPU to interactive requests
+            self._pool = ProcessPoolExecutor(
+                max_workers=settings.BULK_EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=lower_priority,
+                initargs=(settings.EXTRACT_NICE,)
+            )
+        return self._pool
+    
+    def shutdown(self):
+        """Stop the extraction processes (they are restarted on next use)"""
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+    
+    def extract(self, file_path: str, file_type: str) -> Tuple[str, Optional[PageStarts]]:
+        """Text and page starts of one file, extracted in the pool (outside the app process and its GIL)"""
+        if settings.BULK_EXTRACT_WORKERS > 0:
+            try:
+                text, page_starts, seconds = self.pool.submit(extract_text_timed, file_path, file_type).result()
+            except BrokenProcessPool:
+                self._pool = None
+                raise
+        else:
+            text, page_starts, seconds = extract_text_timed(file_path, file_type)
+        EXTRACT_SECONDS.observe(seconds, file_type=file_type)
+        EXTRACT_CHARACTERS.inc(len(text), file_type=file_type)
+        record_extraction(seconds)
+        return text, page_starts
+
+    @staticmethod
+    def _copy_limited(source: BinaryIO, file_path: str):
+        """Stream source to disk, refusing to write more than BULK_MAX_FILE_MB (zip bombs lie about sizes)"""
+        limit = settings.BULK_MAX_FILE_MB * 1024 * 1024
+        written = 0
+        with open(file_path, "wb") as buffer:
+            while True:
+                block = source.read(1024 * 1024)
+                if not block:
+                    break
+                written += len(block)
+                if written > limit:
+                    raise FileTooLargeError(f"File is larger than {settings.BULK_MAX_FILE_MB} MB")
+                buffer.write(block)
+
+    @staticmethod
+    def _reserve_name(name: str) -> str:
+        """
+        Name, suffixed if a file of that name is already in the uploads folder;
+        an empty file is created under it so no other upload can claim it
+        """
+        stem, dot, extension = name.rpartition(".")
+        candidate, counter = name, 1
+        while True:
+            try:
+                os.close(os.open(
+                    os.path.join(settings.UPLOADS_PATH, candidate), os.O_CREAT | os.O_EXCL | os.O_WRONLY
+                ))
+                return candidate
+            except FileExistsError:
+                candidate = f"{stem}-{counter}{dot}{extension}"
+                counter += 1
+
+    def _save(self, source: BinaryIO, filename: str) -> BulkFile:
+        item = BulkFile(os.path.basename(filename.replace("\\", "/")))
+        if item.file_type not in SUPPORTED_TYPES:
+            item.fail("Unsupported file type", status="skipped")
+            return item
+        item.filename = self._reserve_name(item.filename)
+        item.file_path = os.path.join(settings.UPLOADS_PATH, item.filename)
+        try:
+            self._copy_limited(source, item.file_path)
+        except Exception as e:
+            if os.path.exists(item.file_path):
+                os.remove(item.file_path)
+            item.file_path = None
+            item.fail(str(e))
+        return item
+
+    def save_uploads(self, uploads: List[Tuple[str, BinaryIO]]) -> List[BulkFile]:
+        """Write uploaded files, and the supported members of uploaded ZIPs, to the uploads folder"""
+        items: List[BulkFile] = []
+        for filename, source in uploads:
+            if len(items) >= settings.BULK_MAX_FILES:
+                items.append(BulkFile(filename, status="skipped", detail="Too many files in one upload"))
+                continue
+            if not filename.lower().endswith(".zip"):
+                items.append(self._save(source, filename))
+                continue
+            try:
+                with zipfile.ZipFile(source) as archive:
+                    for member in archive.infolist():
+                        if member.is_dir() or os.path.basename(member.filename).startswith("."):
+                            continue
+                        if len(items) >= settings.BULK_MAX_FILES:
+                            items.append(BulkFile(
+                                member.filename, status="skipped", detail="Too many files in one upload"
+                            ))
+                            continue
+                        if member.file_size > settings.BULK_MAX_FILE_MB * 1024 * 1024:
+                            items.append(BulkFile(
+                                member.filename, status="error",
+                                detail=f"File is larger than {settings.BULK_MAX_FILE_MB} MB"
+                            ))
+                            continue
+                        with archive.open(member) as member_file:
+                            items.append(self._save(member_file, member.filename))
+            except zipfile.BadZipFile:
+                items.append(BulkFile(filename, status="error", detail="Not a valid ZIP archive"))
+        return items
+
+    def _extract_all(self, items: List[BulkFile]):
+        """Extract text from every saved file in parallel"""
+        if settings.BULK_EXTRACT_WORKERS <= 0:
+            futures = None
+        else:
+            try:
+                futures = [
+                    (item, self.pool.submit(extract_text_timed, item.file_path, item.file_type))
+                    for item in items
+                ]
+            except BrokenProcessPool:
+                self._pool = None
+                futures = None
+        if futures is None:
+            futures = [(item, None) for item in items]
+
+        for item, future in futures:
+            try:
+                if future is not None:
+                    text, page_starts, seconds = future.result()
+                else:
+                    text, page_starts, seconds = extract_text_timed(item.file_path, item.file_type)
+            except BrokenProcessPool as e:
+                self._pool = None
+                item.fail(f"Extraction worker crashed: {e}")
+                continue
+            except Exception as e:
+                item.fail(str(e))
+                continue
+            EXTRACT_SECONDS.observe(seconds, file_type=item.file_type)
+            EXTRACT_CHARACTERS.inc(len(text), file_type=item.file_type)
+            record_extraction(seconds)
+            item.text = text
+            item.page_starts = page_starts
+
+    def ingest(self, items: List[BulkFile], user_id: int, collection_name: str = "course_materials") -> List[BulkFile]:
+        """Extract, embed and record every saved file; returns the items with their outcome"""
+        saved = [item for item in items if item.status == "pending"]
+        self._extract_all(saved)
+
+        # Chunk every document, then embed all chunks together
+        extracted = [item for item in saved if item.status == "pending"]
+        all_chunks, all_metadatas = [], []
+        for item in extracted:
+            chunks, metadatas = embedding_service.prepare_chunks(item.text, item.filename, item.page_starts)
+            item.chunks = len(chunks)
+            item.text = item.page_starts = None
+            all_chunks.extend(chunks)
+            all_metadatas.extend(metadatas)
+
+        ids = []
+        try:
+            ids = embedding_service.add_chunks(all_chunks, all_metadatas, collection_name)
+
+            # One transaction for all documents rows
+            conn = connect()
+            try:
+                cursor = conn.cursor()
+                upload_date = datetime.now().isoformat()
+                for item in extracted:
+                    cursor.execute("""
+                        INSERT INTO documents (filename, file_path, file_size, file_type, upload_date, user_id)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """, (
+                        item.filename,
+                        item.file_path,
+                        os.path.getsize(item.file_path),
+                        item.file_type,
+                        upload_date,
+                        user_id
+                    ))
+                    item.document_id = cursor.lastrowid
+                    item.status = "ok"
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception as e:
+            if ids:
+                embedding_service.delete_chunks(ids, collection_name)
+            for item in extracted:
+                item.document_id = None
+                item.fail(str(e))
+
+        # Files that were saved but not recorded are removed again
+        for item in saved:
+            if item.status != "ok" and item.file_path and os.path.exists(item.file_path):
+                os.remove(item.file_path)
+        for item in items:
+            BULK_FILES.inc(status=item.status)
+        return items
+
+
+bulk_upload_service = BulkUploadService()
@@ -0,0 +1,230 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import List, Optional, Tuple
+
+import numpy as np
+from langchain.schema import Document
+
+from app.config import settings
+from app.services.chunker import text_chunker
+from app.services.context_builder import CONTEXT_TOKENS, document_key
+from app.services.embedding_service import embedding_service
+from app.utils.metrics import metrics
+
+CHAT_SESSIONS = metrics.gauge("chat_sessions", "Chat sessions held by this worker")
+CHAT_RETRIEVALS = metrics.counter(
+    "chat_retrievals_total", "Chat question retrievals by how the candidate chunks were found", ("mode",)
+)
+
+
+def chunk_key(doc: Document) -> tuple:
+    """Identity of a retrieved chunk (its document and position), used to merge retrieval sets"""
+    metadata = doc.metadata
+    if metadata.get("chunk_index") is None:
+        return (document_key(doc), doc.page_content)
+    return (document_key(doc), metadata.get("chunk_index"), metadata.get("start_char"))
+
+
+class ChatTurn:
+    """One answered question, with its size in tokens as it appears in the history"""
+
+    def __init__(self, question: str, answer: str):
+        self.question = question
+        self.answer = answer
+        self.tokens = text_chunker.count_tokens(self.text())
+
+    def text(self, answer: Optional[str] = None) -> str:
+        return f"Student: {self.question}\nAssistant: {self.answer if answer is None else answer}"
+
+
+class ChatSession:
+    """Recent turns and retrieved chunks of one conversation"""
+
+    def __init__(self, chat_id: str, owner: str, max_turns: int):
+        self.chat_id = chat_id
+        self.owner = owner
+        self.turns = deque(maxlen=max_turns)
+        self.last_used = time.monotonic()
+        # Guards turns and the cached chunks while they are read or replaced; concurrent questions
+        # on one chat still run in parallel, and the last to finish leaves its chunks cached
+        self.lock = threading.Lock()
+        # Candidate chunks seen so far, their embeddings and the query vector last searched with
+        self.documents: List[Document] = []
+        self.embeddings = np.empty((0, 0), dtype=np.float32)
+        self.search_vector: Optional[np.ndarray] = None
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    return matrix / (np.linalg.norm(matrix, axis=-1, keepdims=True) + 1e-12)
+
+
+class ChatSessionStore:
+    """
+    Bounded in-memory chat sessions for follow-up questions
+
+    Sessions belong to the login session (bearer token) that created them and
+    are kept in LRU order: at most max_sessions, each dropped after ttl idle
+    seconds or on logout. A session remembers its last max_turns questions and
+    answers and the chunks retrieved for them. A follow-up is embedded
+    together with the previous question; if that vector is close to the one
+    last searched with, the cached chunks are re-ranked without searching,
+    otherwise a smaller search (followup_k) extends the cached set. History
+    is compacted newest-first into history_max_tokens for the prompt.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = settings.CHAT_MAX_SESSIONS,
+        ttl: float = settings.CHAT_SESSION_TTL,
+        max_turns: int = settings.CHAT_MAX_TURNS,
+        history_max_tokens: int = settings.CHAT_HISTORY_MAX_TOKENS,
+        reuse_similarity: float = settings.CHAT_REUSE_SIMILARITY,
+        fetch_k: int = settings.CONTEXT_FETCH_K,
+        followup_k: int = settings.CHAT_FOLLOWUP_FETCH_K,
+        max_candidates: int = settings.CHAT_MAX_CANDIDATES
+    ):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_turns = max_turns
+        self.history_max_tokens = history_max_tokens
+        self.reuse_similarity = reuse_similarity
+        self.fetch_k = fetch_k
+        self.followup_k = followup_k
+        self.max_candidates = max_candidates
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self):
+        """Drop idle sessions and the least recently used beyond max_sessions (lock held)"""
+        now = time.monotonic()
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_used <= self.ttl and len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.popitem(last=False)
+        CHAT_SESSIONS.set(len(self._sessions))
+
+    def start(self, owner: str, chat_id: Optional[str] = None) -> ChatSession:
+        """
+        The caller's session chat_id, or a new one
+
+        An unknown chat_id (expired, or held by another worker) starts a fresh
+        session under the same id; a chat_id owned by another login never
+        resolves to that session.
+        """
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(chat_id) if chat_id else None
+            if session is not None and session.owner == owner:
+                self._sessions.move_to_end(chat_id)
+                session.last_used = time.monotonic()
+                return session
+            if not chat_id or session is not None:
+                chat_id = uuid.uuid4().hex
+            session = ChatSession(chat_id, owner, self.max_turns)
+            self._sessions[chat_id] = session
+            self._expire()
+            return session
+
+    def end(self, owner: str, chat_id: str) -> bool:
+        with self._lock:
+            session = self._sessions.get(chat_id)
+            if session is None or session.owner != owner:
+                return False
+            del self._sessions[chat_id]
+            CHAT_SESSIONS.set(len(self._sessions))
+            return True
+
+    def end_owner(self, owner: str):
+        """Drop every session of a login session (logout)"""
+        with self._lock:
+            for chat_id in [c for c, s in self._sessions.items() if s.owner == owner]:
+                del self._sessions[chat_id]
+            CHAT_SESSIONS.set(len(self._sessions))
+
+    def retrieve(
+        self,
+        session: ChatSession,
+        question: str,
+        collection_name: str
+    ) -> Tuple[List[float], List[Document], List[List[float]]]:
+        """
+        Candidate chunks for a question in a session, reusing earlier retrievals
+
+        Returns:
+            (query vector, documents ordered by similarity, document embeddings),
+            like EmbeddingService.search_candidates; empty lists if nothing is indexed
+        """
+        # Embedding and search run outside the lock; concurrent questions on one chat each
+        # start from a consistent snapshot and the last to finish updates the cache
+        with session.lock:
+            previous = session.turns[-1].question if session.turns else None
+            documents, embeddings, searched = session.documents, session.embeddings, session.search_vector
+        vector = embedding_service.embed_query(f"{previous}\n{question}" if previous else question)
+        query = _normalize(np.asarray(vector, dtype=np.float32))
+
+        if not documents:
+            mode = "full"
+            documents, found = embedding_service.search_vector(vector, self.fetch_k, collection_name)
+            CHAT_RETRIEVALS.inc(mode=mode)
+            if not documents:
+                return vector, [], []
+            embeddings = np.asarray(found, dtype=np.float32)
+            searched = query
+        elif float(query @ searched) >= self.reuse_similarity:
+            mode = "reused"
+        else:
+            mode = "extended"
+            found_documents, found = embedding_service.search_vector(vector, self.followup_k, collection_name)
+            known = {chunk_key(doc) for doc in documents}
+            new = [i for i, doc in enumerate(found_documents) if chunk_key(doc) not in known]
+            if new:
+                documents = documents + [found_documents[i] for i in new]
+                embeddings = np.vstack([embeddings, np.asarray([found[i] for i in new], dtype=np.float32)])
+            searched = query
+        if mode != "full":
+            CHAT_RETRIEVALS.inc(mode=mode)
+
+        order = np.argsort(-(_normalize(embeddings) @ query), kind="stable")[:self.max_candidates]
+        documents, embeddings = [documents[i] for i in order], embeddings[order]
+        with session.lock:
+            session.documents, session.embeddings, session.search_vector = documents, embeddings, searched
+        return vector, list(documents), embeddings.tolist()
+
+    def history(self, session: ChatSession) -> str:
+        """
+        Earlier turns for the prompt, compacted into history_max_tokens
+
+        The newest turns are kept verbatim; the first one that does not fit
+        keeps its question and as much of its answer as the budget allows,
+        and anything older is dropped.
+        """
+        with session.lock:
+            turns = list(session.turns)
+        budget = self.history_max_tokens
+        kept = []
+        for turn in reversed(turns):
+            if turn.tokens <= budget:
+                kept.append(turn.text())
+                budget -= turn.tokens
+                continue
+            answer_budget = budget - text_chunker.count_tokens(turn.text(answer=""))
+            offsets = text_chunker.token_offsets(turn.answer)
+            if 0 < answer_budget < len(offsets):
+                kept.append(turn.text(answer=turn.answer[:offsets[answer_budget - 1][1]] + " ..."))
+            break
+        history = "\n\n".join(reversed(kept))
+        if history:
+            CONTEXT_TOKENS.observe(text_chunker.count_tokens(history), stage="history")
+        return history
+
+    def record(self, session: ChatSession, question: str, answer: str):
+        turn = ChatTurn(question, answer)
+        with session.lock:
+            session.turns.append(turn)
+            session.last_used = time.monotonic()
+
+
+chat_sessions = ChatSessionStore()
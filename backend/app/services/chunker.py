@@ -0,0 +1,179 @@
+import re
+from bisect import bisect_left, bisect_right
+from typing import List, Optional, Tuple
+from app.config import settings
+from app.utils.metrics import CHUNK_SECONDS, CHUNKS_CREATED, CHUNK_TOKENS
+
+
+# Paragraph breaks (blank lines) and sentence ends (. ! ? plus closing quotes/brackets)
+_BOUNDARY_PATTERN = re.compile(r"\n[ \t]*\n\s*|[.!?][\"')\]]*\s+")
+
+
+class TextChunker:
+    """Split text into chunks measured in embedding-model tokens"""
+
+    def __init__(
+        self,
+        model_name: str = settings.EMBEDDING_MODEL,
+        max_tokens: int = settings.CHUNK_MAX_TOKENS,
+        overlap_tokens: int = settings.CHUNK_OVERLAP_TOKENS
+    ):
+        self.model_name = model_name
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self._tokenizer = None
+
+    @property
+    def tokenizer(self):
+        """Fast (Rust) tokenizer of the embedding model, loaded on first use"""
+        if self._tokenizer is None:
+            from transformers import AutoTokenizer
+            self._tokenizer = AutoTokenizer.from_pretrained(self.model_name, use_fast=True)
+        return self._tokenizer
+
+    def token_offsets(self, text: str) -> List[Tuple[int, int]]:
+        """Tokenize the whole text once and return (start, end) character offsets per token"""
+        encoding = self.tokenizer(
+            text,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            return_attention_mask=False,
+            verbose=False
+        )
+        return encoding["offset_mapping"]
+
+    def count_tokens(self, text: str) -> int:
+        """Number of model tokens in text (without special tokens)"""
+        if not text:
+            return 0
+        return len(self.token_offsets(text))
+
+    @staticmethod
+    def find_boundaries(text: str, token_starts: List[int]) -> Tuple[List[int], List[int]]:
+        """
+        Scan the text once for paragraph and sentence boundaries
+
+        Returns:
+            Two sorted lists of token indices (paragraph breaks, sentence breaks)
+            at which a chunk may end. Paragraph breaks are also sentence breaks.
+        """
+        paragraph_breaks = []
+        sentence_breaks = []
+        for match in _BOUNDARY_PATTERN.finditer(text):
+            token_index = bisect_left(token_starts, match.end())
+            if not sentence_breaks or sentence_breaks[-1] != token_index:
+                sentence_breaks.append(token_index)
+            is_paragraph = match.group(0).count("\n") >= 2
+            if is_paragraph and (not paragraph_breaks or paragraph_breaks[-1] != token_index):
+                paragraph_breaks.append(token_index)
+        return paragraph_breaks, sentence_breaks
+
+    @staticmethod
+    def _last_break(breaks: List[int], low: int, high: int) -> Optional[int]:
+        """Largest break in (low, high], or None"""
+        i = bisect_right(breaks, high) - 1
+        if i >= 0 and breaks[i] > low:
+            return breaks[i]
+        return None
+
+    @staticmethod
+    def _first_break(breaks: List[int], low: int, high: int) -> Optional[int]:
+        """Smallest break in [low, high), or None"""
+        i = bisect_left(breaks, low)
+        if i < len(breaks) and breaks[i] < high:
+            return breaks[i]
+        return None
+
+    def split(
+        self,
+        text: str,
+        max_tokens: Optional[int] = None,
+        overlap_tokens: Optional[int] = None
+    ) -> List[str]:
+        """
+        Split text into chunks of at most max_tokens model tokens
+
+        Chunks end at a paragraph break when one falls in the second half of
+        the window, otherwise at a sentence break, otherwise at a token
+        boundary. Consecutive chunks overlap by up to overlap_tokens, starting
+        at a sentence boundary where possible.
+
+        Args:
+            text: The text to chunk
+            max_tokens: Maximum tokens per chunk (defaults to settings.CHUNK_MAX_TOKENS)
+            overlap_tokens: Tokens shared between consecutive chunks
+
+        Returns:
+            List of text chunks, sliced verbatim from the input
+        """
+        return [chunk for chunk, _, _ in self.split_with_spans(text, max_tokens, overlap_tokens)]
+
+    def split_with_spans(
+        self,
+        text: str,
+        max_tokens: Optional[int] = None,
+        overlap_tokens: Optional[int] = None
+    ) -> List[Tuple[str, int, int]]:
+        """Same as split() but returns (chunk, start_char, end_char) tuples, with text[start_char:end_char] == chunk"""
+        if not text or not text.strip():
+            return []
+
+        with CHUNK_SECONDS.time():
+            chunks, token_count = self._split_with_spans(text, max_tokens, overlap_tokens)
+        CHUNKS_CREATED.inc(len(chunks))
+        CHUNK_TOKENS.inc(token_count)
+        return chunks
+
+    def _split_with_spans(
+        self,
+        text: str,
+        max_tokens: Optional[int],
+        overlap_tokens: Optional[int]
+    ) -> Tuple[List[Tuple[str, int, int]], int]:
+        """Chunk spans plus the number of tokens in text"""
+        max_tokens = max_tokens or self.max_tokens
+        overlap_tokens = self.overlap_tokens if overlap_tokens is None else overlap_tokens
+        overlap_tokens = min(overlap_tokens, max_tokens // 2)
+
+        offsets = self.token_offsets(text)
+        if not offsets:
+            return [], 0
+        token_starts = [start for start, _ in offsets]
+        paragraph_breaks, sentence_breaks = self.find_boundaries(text, token_starts)
+
+        chunks = []
+        total = len(offsets)
+        start = 0
+        while start < total:
+            end = start + max_tokens
+            if end >= total:
+                end = total
+            else:
+                min_end = start + max_tokens // 2
+                end = (
+                    self._last_break(paragraph_breaks, min_end, end)
+                    or self._last_break(sentence_breaks, min_end, end)
+                    or end
+                )
+
+            start_char = offsets[start][0]
+            end_char = offsets[end - 1][1]
+            raw = text[start_char:end_char]
+            chunk = raw.strip()
+            if chunk:
+                # Spans cover the stripped chunk exactly, so overlapping chunks can be stitched back together
+                start_char += len(raw) - len(raw.lstrip())
+                chunks.append((chunk, start_char, start_char + len(chunk)))
+
+            if end >= total:
+                break
+
+            # Overlap with the previous chunk, preferably from a sentence start
+            overlap_start = end - overlap_tokens
+            next_start = self._first_break(sentence_breaks, overlap_start, end)
+            start = max(next_start if next_start is not None else overlap_start, start + 1)
+
+        return chunks, total
+
+
+text_chunker = TextChunker()
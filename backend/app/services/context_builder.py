@@ -0,0 +1,263 @@
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from langchain.schema import Document
+from app.config import settings
+from app.services.chunker import text_chunker
+from app.services.document_processor import DocumentProcessor
+from app.utils.metrics import metrics
+
+
+CONTEXT_TOKENS = metrics.histogram(
+    "context_tokens", "Answer prompt context size in embedding-model tokens", ("stage",),
+    buckets=(128, 256, 512, 768, 1024, 1536, 2048, 3072, 4096, 8192)
+)
+
+# Legacy chunks (stored without character spans) overlapped by at most this many characters
+MAX_LEGACY_OVERLAP_CHARS = 1000
+
+
+def document_key(doc: Document) -> str:
+    """
+    Which document a chunk came from
+
+    Filenames are not unique in the shared collection (two students may both
+    upload notes.pdf), so chunks carry a per-upload document_key; chunks
+    stored before it existed fall back to the filename.
+    """
+    return doc.metadata.get("document_key") or doc.metadata.get("source", "Unknown")
+
+
+def format_citation(source: str, docs: List[Document]) -> str:
+    """Source name with the pages (PDF) or slides (PPTX) the chunks came from, e.g. 'notes.pdf (pp. 3-5, 9)'"""
+    pages = set()
+    for doc in docs:
+        first, last = doc.metadata.get("page_start"), doc.metadata.get("page_end")
+        if first is not None:
+            pages.update(range(int(first), int(last if last is not None else first) + 1))
+    if not pages:
+        return source
+
+    runs = []
+    for page in sorted(pages):
+        if runs and page == runs[-1][1] + 1:
+            runs[-1][1] = page
+        else:
+            runs.append([page, page])
+    text = ", ".join(str(a) if a == b else f"{a}-{b}" for a, b in runs)
+    unit = DocumentProcessor.PAGED_TYPES.get(source.rsplit(".", 1)[-1].lower(), "page")
+    if unit == "slide":
+        label = "slide" if len(pages) == 1 else "slides"
+    else:
+        label = "p." if len(pages) == 1 else "pp."
+    return f"{source} ({label} {text})"
+
+
+class PackedContext:
+    """Result of ContextBuilder.build"""
+
+    def __init__(
+        self,
+        documents: str,
+        wikipedia: Optional[str],
+        sources: List[str],
+        citations: List[str],
+        tokens_before: int,
+        tokens_after: int,
+        chunks_used: int
+    ):
+        self.documents = documents
+        self.wikipedia = wikipedia
+        self.sources = sources
+        self.citations = citations
+        self.tokens_before = tokens_before
+        self.tokens_after = tokens_after
+        self.chunks_used = chunks_used
+
+
+class ContextBuilder:
+    """
+    Turn retrieved chunks into a compact answer context
+
+    Candidates are re-ranked with maximal marginal relevance so near-duplicate
+    chunks (typically neighbours from one long document) do not crowd out other
+    sources, then packed greedily into a token budget counting only the text
+    each chunk adds: overlap with chunks already selected from the same
+    document is not paid for twice. Selected chunks are finally stitched back
+    into contiguous passages in document order.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = settings.CONTEXT_MAX_TOKENS,
+        wikipedia_max_tokens: int = settings.CONTEXT_WIKIPEDIA_MAX_TOKENS,
+        mmr_lambda: float = settings.CONTEXT_MMR_LAMBDA,
+        baseline_k: int = 5
+    ):
+        self.max_tokens = max_tokens
+        self.wikipedia_max_tokens = wikipedia_max_tokens
+        self.mmr_lambda = mmr_lambda
+        self.baseline_k = baseline_k
+        self.chunker = text_chunker
+
+    @staticmethod
+    def mmr_order(query_vector: List[float], embeddings: List[List[float]], mmr_lambda: float) -> List[int]:
+        """Indices of all candidates in maximal-marginal-relevance order"""
+        if not embeddings:
+            return []
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+        query = np.asarray(query_vector, dtype=np.float32)
+        query /= np.linalg.norm(query) + 1e-12
+
+        relevance = matrix @ query
+        redundancy = np.full(len(matrix), -np.inf, dtype=np.float32)
+        remaining = np.ones(len(matrix), dtype=bool)
+        order = []
+        for _ in range(len(matrix)):
+            penalty = np.where(np.isfinite(redundancy), redundancy, 0.0)
+            scores = mmr_lambda * relevance - (1 - mmr_lambda) * penalty
+            scores[~remaining] = -np.inf
+            best = int(np.argmax(scores))
+            order.append(best)
+            remaining[best] = False
+            redundancy = np.maximum(redundancy, matrix @ matrix[best])
+        return order
+
+    @staticmethod
+    def _span(doc: Document) -> Optional[Tuple[int, int]]:
+        start, end = doc.metadata.get("start_char"), doc.metadata.get("end_char")
+        if start is None or end is None:
+            return None
+        return int(start), int(end)
+
+    @staticmethod
+    def _legacy_overlap(previous: str, following: str) -> int:
+        """Length of the longest suffix of previous that is a prefix of following"""
+        limit = min(len(previous), len(following), MAX_LEGACY_OVERLAP_CHARS)
+        for size in range(limit, 0, -1):
+            if previous.endswith(following[:size]):
+                return size
+        return 0
+
+    def _novel_text(self, doc: Document, selected: List[Document]) -> str:
+        """Part of doc not already covered by selected chunks from the same document"""
+        span = self._span(doc)
+        text = doc.page_content
+        if span is None:
+            index = doc.metadata.get("chunk_index")
+            for other in selected:
+                if index is not None and other.metadata.get("chunk_index") == index - 1:
+                    text = text[self._legacy_overlap(other.page_content, text):]
+            return text
+
+        start, end = span
+        pieces = []
+        cursor = start
+        for other_start, other_end in sorted(filter(None, (self._span(o) for o in selected))):
+            if other_end <= cursor or other_start >= end:
+                continue
+            if other_start > cursor:
+                pieces.append(text[cursor - start:other_start - start])
+            cursor = max(cursor, other_end)
+        if cursor < end:
+            pieces.append(text[cursor - start:])
+        return " ".join(piece.strip() for piece in pieces if piece.strip())
+
+    def _stitch(self, docs: List[Document]) -> List[str]:
+        """Merge one document's selected chunks into contiguous passages, in document order"""
+        def position(doc: Document):
+            span = self._span(doc)
+            return (span[0] if span else 0, doc.metadata.get("chunk_index", 0))
+
+        passages = []
+        last_end, last_index = None, None
+        for doc in sorted(docs, key=position):
+            span = self._span(doc)
+            index = doc.metadata.get("chunk_index")
+            adjacent = last_index is not None and index is not None and index == last_index + 1
+            if span is not None and last_end is not None and (span[0] <= last_end or adjacent):
+                if span[1] > last_end:
+                    tail = doc.page_content[max(last_end - span[0], 0):]
+                    passages[-1] += tail if span[0] <= last_end else " " + tail
+                    last_end = span[1]
+            elif span is None and adjacent:
+                overlap = self._legacy_overlap(passages[-1], doc.page_content)
+                passages[-1] += doc.page_content[overlap:] if overlap else " " + doc.page_content
+            else:
+                passages.append(doc.page_content)
+                last_end = span[1] if span else None
+            last_index = index
+        return passages
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        offsets = self.chunker.token_offsets(text)
+        if len(offsets) <= max_tokens:
+            return text
+        return text[:offsets[max_tokens - 1][1]] if max_tokens > 0 else ""
+
+    def build(
+        self,
+        query_vector: List[float],
+        documents: List[Document],
+        embeddings: List[List[float]],
+        wikipedia: Optional[str] = None
+    ) -> PackedContext:
+        """
+        Select, de-duplicate and pack retrieved chunks (and Wikipedia text) into the budget
+
+        Args:
+            query_vector: Embedding of the question
+            documents: Candidate chunks ordered by similarity
+            embeddings: Embedding of each candidate
+            wikipedia: Optional Wikipedia text to include, trimmed to its own cap
+
+        Returns:
+            PackedContext with the document context, the (trimmed) Wikipedia text,
+            sources in order of first use (plain and with page/slide numbers)
+            and the context size before/after in tokens
+        """
+        count = self.chunker.count_tokens
+        # What the previous pipeline sent: the top chunks joined verbatim, plus all Wikipedia text
+        baseline = "\n\n".join(doc.page_content for doc in documents[:self.baseline_k])
+        tokens_before = count(baseline) + (count(wikipedia) if wikipedia else 0)
+
+        budget = self.max_tokens
+        if wikipedia:
+            wikipedia = self._truncate(wikipedia, min(self.wikipedia_max_tokens, budget))
+            budget -= count(wikipedia)
+
+        # Grouped by document (see document_key), cited by filename
+        selected: Dict[str, List[Document]] = {}
+        document_order: List[str] = []
+        chunks_used = 0
+        for index in self.mmr_order(query_vector, embeddings, self.mmr_lambda):
+            doc = documents[index]
+            key = document_key(doc)
+            novel = self._novel_text(doc, selected.get(key, []))
+            if not novel:
+                continue
+            cost = count(novel)
+            if cost > budget:
+                continue
+            budget -= cost
+            chunks_used += 1
+            if key not in selected:
+                selected[key] = []
+                document_order.append(key)
+            selected[key].append(doc)
+
+        passages = [passage for key in document_order for passage in self._stitch(selected[key])]
+        context = "\n\n".join(passages)
+        tokens_after = count(context) + (count(wikipedia) if wikipedia else 0)
+
+        CONTEXT_TOKENS.observe(tokens_before, stage="baseline")
+        CONTEXT_TOKENS.observe(tokens_after, stage="packed")
+        names = [selected[key][0].metadata.get("source", "Unknown") for key in document_order]
+        citations = list(dict.fromkeys(
+            format_citation(name, selected[key]) for name, key in zip(names, document_order)
+        ))
+        sources = list(dict.fromkeys(names))
+        return PackedContext(context, wikipedia, sources, citations, tokens_before, tokens_after, chunks_used)
+
+
+context_builder = ContextBuilder()
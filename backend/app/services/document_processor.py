@@ -1,25 +1,98 @@
 import os
-from typing import List
+import time
+from bisect import bisect_right
+from typing import List, Optional, Tuple
 from PyPDF2 import PdfReader
 from docx import Document
 from pptx import Presentation
+from app.services.chunker import text_chunker
+from app.utils.metrics import EXTRACT_SECONDS, EXTRACT_CHARACTERS
+
+
+# (character offset in the extracted text, page or slide number) for each page that starts there
+PageStarts = List[Tuple[int, int]]
+
+
+class PageRangeError(ValueError):
+    """Raised when a page/slide range is invalid for a document"""
 
 
 class DocumentProcessor:
     """Process different document types and extract text"""
     
+    # File types whose text can be located by page (PDF) or slide (PPTX)
+    PAGED_TYPES = {"pdf": "page", "pptx": "slide"}
+    
     @staticmethod
-    def extract_text_from_pdf(file_path: str) -> str:
-        """Extract text from PDF file"""
+    def _page_numbers(count: int, page_range: Optional[Tuple[int, int]]) -> range:
+        """1-based page numbers to read, clamped to the document"""
+        if page_range is None:
+            return range(1, count + 1)
+        first, last = page_range
+        if first < 1 or last < first:
+            raise PageRangeError(f"Invalid range {first}-{last}")
+        if first > count:
+            raise PageRangeError(f"Range starts after the last page ({count})")
+        return range(first, min(last, count) + 1)
+    
+    @staticmethod
+    def extract_pages_from_pdf(file_path: str, page_range: Optional[Tuple[int, int]] = None) -> List[Tuple[int, str]]:
+        """(page number, text) for each page of a PDF, parsing only the pages in page_range"""
         try:
             reader = PdfReader(file_path)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-            return text.strip()
+            numbers = DocumentProcessor._page_numbers(len(reader.pages), page_range)
+            return [(number, reader.pages[number - 1].extract_text() + "\n") for number in numbers]
+        except PageRangeError:
+            raise
         except Exception as e:
             raise Exception(f"Error extracting PDF: {str(e)}")
     
+    @staticmethod
+    def extract_pages_from_pptx(file_path: str, page_range: Optional[Tuple[int, int]] = None) -> List[Tuple[int, str]]:
+        """(slide number, text) for each slide, reading shapes only of the slides in page_range"""
+        try:
+            prs = Presentation(file_path)
+            numbers = DocumentProcessor._page_numbers(len(prs.slides), page_range)
+            slides = []
+            for number, slide in enumerate(prs.slides, 1):
+                if number > numbers[-1]:
+                    break
+                if number in numbers:
+                    text = ""
+                    for shape in slide.shapes:
+                        if hasattr(shape, "text"):
+                            text += shape.text + "\n"
+                    slides.append((number, text))
+            return slides
+        except PageRangeError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error extracting PPTX: {str(e)}")
+    
+    @staticmethod
+    def join_pages(pages: List[Tuple[int, str]]) -> Tuple[str, PageStarts]:
+        """Concatenate page texts (stripped as a whole) and record where each page starts"""
+        text = ""
+        page_starts = []
+        for number, page_text in pages:
+            page_starts.append((len(text), number))
+            text += page_text
+        lead = len(text) - len(text.lstrip())
+        return text.strip(), [(max(offset - lead, 0), number) for offset, number in page_starts]
+    
+    @staticmethod
+    def pages_for_span(page_starts: PageStarts, start: int, end: int) -> Tuple[int, int]:
+        """First and last page (or slide) number covering text[start:end]"""
+        offsets = [offset for offset, _ in page_starts]
+        first = page_starts[max(bisect_right(offsets, start) - 1, 0)][1]
+        last = page_starts[max(bisect_right(offsets, max(end - 1, start)) - 1, 0)][1]
+        return first, last
+    
+    @staticmethod
+    def extract_text_from_pdf(file_path: str) -> str:
+        """Extract text from PDF file"""
+        return DocumentProcessor.join_pages(DocumentProcessor.extract_pages_from_pdf(file_path))[0]
+    
     @staticmethod
     def extract_text_from_docx(file_path: str) -> str:
         """Extract text from Word document"""
@@ -35,76 +108,80 @@ class DocumentProcessor:
     @staticmethod
     def extract_text_from_pptx(file_path: str) -> str:
         """Extract text from PowerPoint"""
-        try:
-            prs = Presentation(file_path)
-            text = ""
-            for slide in prs.slides:
-                for shape in slide.shapes:
-                    if hasattr(shape, "text"):
-                        text += shape.text + "\n"
-            return text.strip()
-        except Exception as e:
-            raise Exception(f"Error extracting PPTX: {str(e)}")
+        return DocumentProcessor.join_pages(DocumentProcessor.extract_pages_from_pptx(file_path))[0]
     
     @staticmethod
-    def process_document(file_path: str, file_type: str) -> str:
-        """Process document based on file type"""
+    def extract_with_pages(
+        file_path: str,
+        file_type: str,
+        page_range: Optional[Tuple[int, int]] = None
+    ) -> Tuple[str, Optional[PageStarts]]:
+        """Text and page starts (None for DOCX, which has no fixed pages), optionally limited to page_range"""
         if file_type == "pdf":
-            return DocumentProcessor.extract_text_from_pdf(file_path)
-        elif file_type == "docx":
-            return DocumentProcessor.extract_text_from_docx(file_path)
+            return DocumentProcessor.join_pages(DocumentProcessor.extract_pages_from_pdf(file_path, page_range))
         elif file_type == "pptx":
-            return DocumentProcessor.extract_text_from_pptx(file_path)
+            return DocumentProcessor.join_pages(DocumentProcessor.extract_pages_from_pptx(file_path, page_range))
+        elif file_type == "docx":
+            if page_range is not None:
+                raise PageRangeError("Page ranges are only supported for PDF and PPTX files")
+            return DocumentProcessor.extract_text_from_docx(file_path), None
         else:
             raise ValueError(f"Unsupported file type: {file_type}")
     
     @staticmethod
-    def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
+    def process_document_with_pages(
+        file_path: str,
+        file_type: str,
+        page_range: Optional[Tuple[int, int]] = None
+    ) -> Tuple[str, Optional[PageStarts]]:
+        """Process document based on file type, keeping track of page (or slide) boundaries"""
+        with EXTRACT_SECONDS.time(file_type=file_type):
+            text, page_starts = DocumentProcessor.extract_with_pages(file_path, file_type, page_range)
+        EXTRACT_CHARACTERS.inc(len(text), file_type=file_type)
+        return text, page_starts
+    
+    @staticmethod
+    def process_document(
+        file_path: str,
+        file_type: str,
+        page_range: Optional[Tuple[int, int]] = None
+    ) -> str:
+        """Process document based on file type (only the pages or slides in page_range, if given)"""
+        return DocumentProcessor.process_document_with_pages(file_path, file_type, page_range)[0]
+    
+    @staticmethod
+    def chunk_text(
+        text: str,
+        max_tokens: Optional[int] = None,
+        overlap_tokens: Optional[int] = None
+    ) -> List[str]:
         """
         Split text into chunks with overlap for better context retention
         
         Args:
             text: The text to chunk
-            chunk_size: Maximum size of each chunk in characters
-            overlap: Number of characters to overlap between chunks
+            max_tokens: Maximum size of each chunk in embedding-model tokens
+            overlap_tokens: Number of tokens to overlap between chunks
             
         Returns:
             List of text chunks
         """
-        if not text or len(text) == 0:
-            return []
-        
-        chunks = []
-        start = 0
-        text_length = len(text)
-        
-        while start < text_length:
-            # Calculate end position
-            end = start + chunk_size
-            
-            # If this is not the last chunk, try to break at a sentence or word boundary
-            if end < text_length:
-                # Look for sentence boundary (. ! ?)
-                sentence_end = max(
-                    text.rfind('. ', start, end),
-                    text.rfind('! ', start, end),
-                    text.rfind('? ', start, end)
-                )
-                
-                if sentence_end != -1 and sentence_end > start + chunk_size // 2:
-                    end = sentence_end + 1
-                else:
-                    # Look for word boundary (space)
-                    space_pos = text.rfind(' ', start, end)
-                    if space_pos != -1 and space_pos > start + chunk_size // 2:
-                        end = space_pos
-            
-            # Extract chunk
-            chunk = text[start:end].strip()
-            if chunk:
-                chunks.append(chunk)
-            
-            # Move start position with overlap
-            start = end - overlap if end < text_length else text_length
-        
-        return chunks
+        return text_chunker.split(text, max_tokens=max_tokens, overlap_tokens=overlap_tokens)
+
+
+def lower_priority(increment: int):
+    """Extraction pool initializer: renice the process, where the platform supports it (not on Windows)"""
+    if hasattr(os, "nice"):
+        os.nice(increment)
+
+
+def extract_text_timed(file_path: str, file_type: str) -> Tuple[str, Optional[PageStarts], float]:
+    """
+    Extracted text, page starts and extraction time, for extraction pool processes
+    
+    Lives here rather than next to the pool so worker processes only import
+    the extractors, not the embedding model.
+    """
+    started = time.perf_counter()
+    text, page_starts = DocumentProcessor.extract_with_pages(file_path, file_type)
+    return text, page_starts, time.perf_counter() - started
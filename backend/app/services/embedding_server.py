@@ -0,0 +1,272 @@
+"""
+Shared embedding server
+
+Loads the embedding model once and serves it to every uvicorn worker over a
+Unix socket, so N workers no longer hold N copies of MiniLM and torch.
+
+Run it next to the app (or set EMBEDDING_SERVER_AUTOSTART=true and the first
+worker starts it):
+    python -m app.services.embedding_server --socket /tmp/campus-embeddings.sock
+
+Wire format: every message is a 4-byte big-endian length followed by a JSON
+header; responses carrying vectors append them as raw little-endian float32.
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import struct
+import subprocess
+import sys
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.config import settings, BASE_DIR
+
+HEADER = struct.Struct(">I")
+
+
+class EmbeddingServerError(Exception):
+    """Raised when the embedding server cannot be reached or rejects a request"""
+
+
+def resident_memory_mb(pid: Optional[int] = None) -> float:
+    """Resident set size of a process in MiB (Linux /proc, falling back to peak RSS)"""
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("Connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def send_message(sock: socket.socket, header: dict, payload: bytes = b""):
+    body = json.dumps(header).encode()
+    sock.sendall(HEADER.pack(len(body)) + body + payload)
+
+
+def recv_message(sock: socket.socket) -> Tuple[dict, bytes]:
+    (size,) = HEADER.unpack(_recv_exact(sock, HEADER.size))
+    header = json.loads(_recv_exact(sock, size))
+    payload = _recv_exact(sock, header.get("bytes", 0)) if header.get("bytes") else b""
+    return header, payload
+
+
+class EmbeddingRequestHandler(socketserver.BaseRequestHandler):
+    """Serve requests on one persistent worker connection until it closes"""
+
+    def handle(self):
+        server: "EmbeddingServer" = self.server
+        while True:
+            try:
+                request, _ = recv_message(self.request)
+            except (ConnectionError, OSError):
+                return
+            try:
+                header, payload = server.dispatch(request)
+            except Exception as e:
+                header, payload = {"error": str(e)}, b""
+            try:
+                send_message(self.request, header, payload)
+            except OSError:
+                return
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server holding the only copy of the embedding model"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, model_name: str):
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        self.model_name = model_name
+        self.embeddings = HuggingFaceEmbeddings(model_name=model_name)
+        # The model already uses every core per call; running calls one at a time avoids oversubscription
+        self._model_lock = threading.Lock()
+        self.requests_served = 0
+        self.texts_embedded = 0
+        self.started = time.time()
+
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, EmbeddingRequestHandler)
+        os.chmod(socket_path, 0o600)
+
+    def embed(self, op: str, texts: List[str]) -> List[List[float]]:
+        with self._model_lock:
+            if op == "query":
+                vectors = [self.embeddings.embed_query(text) for text in texts]
+            else:
+                vectors = self.embeddings.embed_documents(texts)
+            self.requests_served += 1
+            self.texts_embedded += len(texts)
+        return vectors
+
+    def dispatch(self, request: dict) -> Tuple[dict, bytes]:
+        op = request.get("op")
+        if op in ("documents", "query"):
+            matrix = np.asarray(self.embed(op, request["texts"]), dtype="<f4")
+            if matrix.ndim != 2:
+                matrix = matrix.reshape(len(request["texts"]), -1)
+            payload = matrix.tobytes()
+            return {"count": matrix.shape[0], "dim": matrix.shape[1], "bytes": len(payload)}, payload
+        if op == "stats":
+            return {
+                "model": self.model_name,
+                "pid": os.getpid(),
+                "rss_mb": round(resident_memory_mb(), 1),
+                "requests": self.requests_served,
+                "texts": self.texts_embedded,
+                "uptime_s": round(time.time() - self.started, 1)
+            }, b""
+        raise ValueError(f"Unknown operation: {op}")
+
+
+class RemoteEmbeddings(Embeddings):
+    """LangChain embeddings backed by the shared embedding server"""
+
+    def __init__(self, socket_path: str, timeout: float = 60.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        # One persistent connection per calling thread (requests on a connection are sequential)
+        self._local = threading.local()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as e:
+            sock.close()
+            raise EmbeddingServerError(f"Embedding server not reachable at {self.socket_path}: {e}")
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def request(self, header: dict) -> Tuple[dict, bytes]:
+        """Send one request, reconnecting once if the server restarted since the last call"""
+        for attempt in range(2):
+            sock = getattr(self._local, "sock", None)
+            if sock is None:
+                sock = self._local.sock = self._connect()
+            try:
+                send_message(sock, header)
+                response, payload = recv_message(sock)
+                break
+            except (ConnectionError, OSError) as e:
+                self._close()
+                if attempt:
+                    raise EmbeddingServerError(f"Embedding server connection failed: {e}")
+        if "error" in response:
+            raise EmbeddingServerError(response["error"])
+        return response, payload
+
+    def _embed(self, op: str, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        response, payload = self.request({"op": op, "texts": texts})
+        matrix = np.frombuffer(payload, dtype="<f4").reshape(response["count"], response["dim"])
+        return matrix.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed("documents", texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed("query", [text])[0]
+
+    def stats(self) -> dict:
+        return self.request({"op": "stats"})[0]
+
+
+def server_is_up(socket_path: str) -> bool:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+def ensure_server(socket_path: str, model_name: str, startup_timeout: float) -> Optional[subprocess.Popen]:
+    """
+    Start the embedding server unless one is already listening
+
+    Workers race for a lock file so only the first one spawns the server; the
+    others wait for the socket to accept connections. The server is started in
+    its own session so it outlives worker restarts. Returns the spawned process,
+    or None if another process started it.
+    """
+    import fcntl  # POSIX only, like the Unix socket itself
+    if server_is_up(socket_path):
+        return None
+    with open(socket_path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            process = None
+            if not server_is_up(socket_path):
+                process = subprocess.Popen(
+                    [sys.executable, "-m", "app.services.embedding_server",
+                     "--socket", socket_path, "--model", model_name],
+                    cwd=BASE_DIR,
+                    start_new_session=True
+                )
+            deadline = time.monotonic() + startup_timeout
+            while not server_is_up(socket_path):
+                if process is not None and process.poll() is not None:
+                    raise EmbeddingServerError(f"Embedding server exited with code {process.returncode}")
+                if time.monotonic() > deadline:
+                    raise EmbeddingServerError(f"Embedding server did not start within {startup_timeout}s")
+                time.sleep(0.1)
+            return process
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Serve the embedding model to app workers over a Unix socket")
+    parser.add_argument("--socket", default=settings.EMBEDDING_SERVER_SOCKET or "/tmp/campus-embeddings.sock")
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL)
+    args = parser.parse_args()
+
+    server = EmbeddingServer(args.socket, args.model)
+    print(f"✓ Embedding server ({args.model}) listening on {args.socket}, RSS {resident_memory_mb():.0f} MiB")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,79 +1,289 @@
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Chroma
+from langchain.schema import Document
 import chromadb
 from chromadb.config import Settings
-from typing import List
+from typing import List, Optional, Tuple
 import os
+import uuid
 from app.config import settings
+from app.services.chunker import text_chunker
+from app.services.document_processor import DocumentProcessor, PageStarts
+from app.services.local_vector_store import LocalVectorStore
+from app.utils.batching import MicroBatcher
+from app.utils.metrics import metrics, EMBED_SECONDS, EMBED_TEXTS, VECTOR_SECONDS
+from app.utils.scheduler import scheduler
+
+UPSERT_BATCH_SIZE = 1000
+
+# Chunks embedded between pauses for interactive requests during ingestion
+INGEST_EMBED_BATCH = 64
+
+VECTOR_SEARCHES = metrics.counter("vector_searches_total", "Vector searches by backend", ("backend",))
 
 class EmbeddingService:
     """Handle embeddings and vector database operations"""
     
     def __init__(self):
         # Initialize embedding model
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=settings.EMBEDDING_MODEL
-        )
+        self.embeddings = self._create_embeddings()
+        
+        # Concurrent query embeddings are encoded together in one model call
+        self.query_batcher = None
+        if settings.EMBED_BATCH_MAX_SIZE > 1:
+            self.query_batcher = MicroBatcher(
+                "query_embedding",
+                self._embed_query_batch,
+                settings.EMBED_BATCH_MAX_SIZE,
+                settings.EMBED_BATCH_WINDOW_MS
+            )
         
         # Initialize ChromaDB client
         self.chroma_client = chromadb.PersistentClient(
             path=settings.CHROMA_DB_PATH
         )
         
-        # Initialize text splitter
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=settings.CHUNK_SIZE,
-            chunk_overlap=settings.CHUNK_OVERLAP,
-            separators=["\n\n", "\n", " ", ""]
-        )
+        # Token-aware chunker shared with DocumentProcessor
+        self.text_chunker = text_chunker
+        
+        # Collections reused across requests
+        self._collections = {}
+        
+        # In-process exact stores for small collections, and collections known to live in Chroma
+        self._local_stores = {}
+        self._chroma_backed = set()
+    
+    @staticmethod
+    def _create_embeddings():
+        """Use the shared embedding server when configured, otherwise load the model in this process"""
+        if settings.EMBEDDING_SERVER_SOCKET:
+            # Unix sockets and file locks only: imported when the server is configured
+            from app.services.embedding_server import RemoteEmbeddings, ensure_server
+            if settings.EMBEDDING_SERVER_AUTOSTART:
+                ensure_server(
+                    settings.EMBEDDING_SERVER_SOCKET,
+                    settings.EMBEDDING_MODEL,
+                    settings.EMBEDDING_SERVER_STARTUP_TIMEOUT
+                )
+            return RemoteEmbeddings(settings.EMBEDDING_SERVER_SOCKET, settings.EMBEDDING_SERVER_TIMEOUT)
+        
+        # Imported here so workers using the server never load torch
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=settings.EMBEDDING_MODEL)
     
     def chunk_text(self, text: str) -> List[str]:
         """Split text into chunks"""
-        chunks = self.text_splitter.split_text(text)
+        chunks = self.text_chunker.split(text)
         return chunks
     
-    def add_document_to_vectordb(
-        self, 
-        text: str, 
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed document chunks"""
+        with EMBED_SECONDS.time(operation="documents"):
+            vectors = self.embeddings.embed_documents(texts)
+        EMBED_TEXTS.inc(len(texts), operation="documents")
+        return vectors
+    
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a search query (batched with concurrent queries when enabled)"""
+        if self.query_batcher is not None:
+            return self.query_batcher(query, timeout=settings.EMBED_BATCH_TIMEOUT)
+        with EMBED_SECONDS.time(operation="query"):
+            vector = self.embeddings.embed_query(query)
+        EMBED_TEXTS.inc(operation="query")
+        return vector
+    
+    def _embed_query_batch(self, queries: List[str]) -> List[List[float]]:
+        """Encode a micro-batch of queries in one call (MiniLM embeds queries and documents alike)"""
+        with EMBED_SECONDS.time(operation="query"):
+            vectors = self.embeddings.embed_documents(queries)
+        EMBED_TEXTS.inc(len(queries), operation="query")
+        return vectors
+    
+    def get_collection(self, collection_name: str):
+        """Chroma collection, created with the HNSW parameters configured for it"""
+        if collection_name not in self._collections:
+            hnsw = settings.hnsw_config(collection_name)
+            collection = self.chroma_client.get_or_create_collection(
+                collection_name,
+                configuration={"hnsw": hnsw}
+            )
+            current = (collection.configuration or {}).get("hnsw") or {}
+            if current.get("ef_search") != hnsw["ef_search"]:
+                collection.modify(configuration={"hnsw": {"ef_search": hnsw["ef_search"]}})
+            fixed = [key for key in ("space", "max_neighbors", "ef_construction") if current.get(key) != hnsw[key]]
+            if fixed:
+                print(f"⚠ Collection {collection_name} was built with different HNSW {', '.join(fixed)}; "
+                      f"re-index it to apply the configured values")
+            self._collections[collection_name] = collection
+        return self._collections[collection_name]
+    
+    def local_store(self, collection_name: str) -> Optional[LocalVectorStore]:
+        """In-process store serving collection_name, or None when the collection lives in Chroma"""
+        if settings.VECTOR_BACKEND != "auto" or collection_name in self._chroma_backed:
+            return None
+        if collection_name not in self._local_stores:
+            os.makedirs(settings.LOCAL_VECTOR_PATH, exist_ok=True)
+            store = LocalVectorStore(
+                os.path.join(settings.LOCAL_VECTOR_PATH, collection_name),
+                settings.LOCAL_VECTOR_DTYPE,
+                settings.hnsw_config(collection_name)["space"]
+            )
+            # Indexed in Chroma before the local backend existed (checked once per process)
+            if not store.exists() and self.get_collection(collection_name).count() > 0:
+                self._chroma_backed.add(collection_name)
+                return None
+            self._local_stores[collection_name] = store
+        store = self._local_stores[collection_name]
+        # Moved to Chroma, possibly by another worker (one stat while the manifest is unchanged)
+        if store.moved():
+            self._chroma_backed.add(collection_name)
+            return None
+        return store
+    
+    def _move_to_chroma(self, collection_name: str, store: LocalVectorStore):
+        """Copy a store that outgrew LOCAL_VECTOR_MAX_CHUNKS into Chroma and mark it moved"""
+        collection = self.get_collection(collection_name)
+        
+        def write(ids, vectors, documents, metadatas):
+            for start in range(0, len(ids), UPSERT_BATCH_SIZE):
+                end = start + UPSERT_BATCH_SIZE
+                collection.add(
+                    ids=ids[start:end],
+                    embeddings=vectors[start:end],
+                    documents=documents[start:end],
+                    metadatas=metadatas[start:end]
+                )
+        
+        store.drain(write)
+        self._chroma_backed.add(collection_name)
+        print(f"✓ Collection {collection_name} outgrew the local vector store and was moved to Chroma")
+    
+    def prepare_chunks(
+        self,
+        text: str,
         filename: str,
-        collection_name: str = "course_materials"
-    ):
-        """Add document chunks to ChromaDB"""
-        # Chunk the text
-        chunks = self.chunk_text(text)
+        page_starts: Optional[PageStarts] = None
+    ) -> Tuple[List[str], List[dict]]:
+        """Chunk a document and build each chunk's metadata"""
+        spans = self.text_chunker.split_with_spans(text)
+        chunks = [chunk for chunk, _, _ in spans]
         
-        # Create metadata for each chunk
+        # Character spans let the context builder undo overlap within one document; filenames
+        # are not unique across students, so the document is identified by its own key
+        document_key = uuid.uuid4().hex
         metadatas = [
-            {"source": filename, "chunk_index": i} 
-            for i in range(len(chunks))
+            {"source": filename, "document_key": document_key, "chunk_index": i, "start_char": start, "end_char": end}
+            for i, (_, start, end) in enumerate(spans)
         ]
         
-        # Create or get collection
-        vectorstore = Chroma.from_texts(
-            texts=chunks,
-            embedding=self.embeddings,
-            metadatas=metadatas,
-            collection_name=collection_name,
-            persist_directory=settings.CHROMA_DB_PATH
-        )
+        # Page (PDF) or slide (PPTX) numbers for citations and range-scoped lookups
+        if page_starts:
+            for metadata in metadatas:
+                metadata["page_start"], metadata["page_end"] = DocumentProcessor.pages_for_span(
+                    page_starts, metadata["start_char"], metadata["end_char"]
+                )
+        return chunks, metadatas
+    
+    def add_chunks(
+        self,
+        chunks: List[str],
+        metadatas: List[dict],
+        collection_name: str = "course_materials"
+    ) -> List[str]:
+        """Embed chunks (possibly from several documents) and write them to the vector store, returning their ids"""
+        if not chunks:
+            return []
         
-        return len(chunks)
+        # Embed in slices, letting interactive requests run in between, then write to the collection
+        vectors = []
+        for start in range(0, len(chunks), INGEST_EMBED_BATCH):
+            scheduler.yield_to_interactive()
+            vectors.extend(self.embed_documents(chunks[start:start + INGEST_EMBED_BATCH]))
+        ids = [str(uuid.uuid4()) for _ in chunks]
+        with VECTOR_SECONDS.time(operation="upsert"):
+            store = self.local_store(collection_name)
+            if store is not None:
+                if store.add(ids, vectors, chunks, metadatas, max_rows=settings.LOCAL_VECTOR_MAX_CHUNKS):
+                    return ids
+                if store.moved():
+                    self._chroma_backed.add(collection_name)  # by another thread or worker
+                else:
+                    self._move_to_chroma(collection_name, store)
+            
+            collection = self.get_collection(collection_name)
+            # Chroma rejects very large single writes
+            for start in range(0, len(chunks), UPSERT_BATCH_SIZE):
+                end = start + UPSERT_BATCH_SIZE
+                collection.add(
+                    ids=ids[start:end],
+                    embeddings=vectors[start:end],
+                    documents=chunks[start:end],
+                    metadatas=metadatas[start:end]
+                )
+        return ids
+    
+    def delete_chunks(self, ids: List[str], collection_name: str = "course_materials"):
+        """Remove chunks by id (used to roll back a failed upload)"""
+        store = self.local_store(collection_name)
+        if store is not None and store.delete(ids):
+            return
+        collection = self.get_collection(collection_name)
+        for start in range(0, len(ids), UPSERT_BATCH_SIZE):
+            collection.delete(ids=ids[start:start + UPSERT_BATCH_SIZE])
     
-    def search_documents(
+    def add_document_to_vectordb(
         self, 
-        query: str, 
-        k: int = 3,
-        collection_name: str = "course_materials"
+        text: str, 
+        filename: str,
+        collection_name: str = "course_materials",
+        page_starts: Optional[PageStarts] = None
     ):
-        """Search for relevant document chunks"""
-        vectorstore = Chroma(
-            collection_name=collection_name,
-            embedding_function=self.embeddings,
-            persist_directory=settings.CHROMA_DB_PATH
-        )
+        """Add document chunks to the vector store"""
+        chunks, metadatas = self.prepare_chunks(text, filename, page_starts)
+        self.add_chunks(chunks, metadatas, collection_name)
+        return len(chunks)
+    
+    def search_candidates(
+        self,
+        query: str,
+        k: int,
+        collection_name: str = "course_materials"
+    ) -> Tuple[List[float], List[Document], List[List[float]]]:
+        """
+        Search for candidate chunks, returning their embeddings as well
         
-        results = vectorstore.similarity_search(query, k=k)
-        return results
+        Returns:
+            (query vector, documents ordered by similarity, document embeddings),
+            the inputs the context builder needs for MMR re-ranking
+        """
+        vector = self.embed_query(query)
+        documents, embeddings = self.search_vector(vector, k, collection_name)
+        return vector, documents, embeddings
+    
+    def search_vector(
+        self,
+        vector: List[float],
+        k: int,
+        collection_name: str = "course_materials"
+    ) -> Tuple[List[Document], List[List[float]]]:
+        """Nearest chunks to an already embedded query, with their embeddings"""
+        with VECTOR_SECONDS.time(operation="search"):
+            store = self.local_store(collection_name)
+            found = store.search(vector, k) if store is not None else None
+            if found is not None:
+                VECTOR_SEARCHES.inc(backend="local")
+                texts, metadatas, embeddings = found
+            else:
+                VECTOR_SEARCHES.inc(backend="chroma")
+                results = self.get_collection(collection_name).query(
+                    query_embeddings=[vector],
+                    n_results=k,
+                    include=["documents", "metadatas", "embeddings"]
+                )
+                texts, metadatas = results["documents"][0], results["metadatas"][0]
+                embeddings = [list(embedding) for embedding in results["embeddings"][0]]
+        documents = [
+            Document(page_content=text, metadata=metadata or {})
+            for text, metadata in zip(texts, metadatas)
+        ]
+        return documents, embeddings
 
 embedding_service = EmbeddingService()
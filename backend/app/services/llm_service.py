@@ -1,24 +1,23 @@
 from langchain_groq import ChatGroq
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
-from typing import List
-import wikipedia
+from langchain_core.callbacks import BaseCallbackHandler
+from groq import RateLimitError
+from typing import List, Optional
+import httpx
+import random
+import time
 from app.config import settings
+from app.services.wikipedia_service import wikipedia
+from app.utils.concurrency import ConcurrencyLimiter, OverloadedError
+from app.utils.singleflight import fingerprint
+from app.utils.metrics import (
+    metrics, LLM_SECONDS, LLM_REQUESTS, LLM_TOKENS, WIKIPEDIA_SECONDS, WIKIPEDIA_REQUESTS
+)
 
+LLM_RETRIES = metrics.counter("llm_retries_total", "Groq calls retried after a 429", ("operation",))
 
-class LLMService:
-    """Handle LLM operations using Groq"""
-    
-    def __init__(self):
-        self.llm = ChatGroq(
-            api_key=settings.GROQ_API_KEY,
-            model_name=settings.GROQ_MODEL,
-            temperature=0.7
-        )
-    
-    def generate_answer(self, query: str, context: str) -> str:
-        """Generate answer based on context"""
-        prompt_template = """You are a helpful AI assistant for students. Use the provided context to answer the question comprehensively.
+ANSWER_PROMPT = """You are a helpful AI assistant for students. Use the provided context to answer the question comprehensively.
 
 If the context contains information from multiple sources (documents and Wikipedia), combine them naturally into your answer.
 
@@ -28,91 +27,205 @@ Context:
 Question: {question}
 
 Answer (provide a comprehensive response using all available information):"""
+
+CHAT_ANSWER_PROMPT = """You are a helpful AI assistant for students. Use the provided context to answer the question comprehensively.
+
+If the context contains information from multiple sources (documents and Wikipedia), combine them naturally into your answer.
+The question may follow up on the earlier conversation; use it to resolve what the question refers to.
+
+Earlier conversation:
+{history}
+
+Context:
+{context}
+
+Question: {question}
+
+Answer (provide a comprehensive response using all available information):"""
+
+SUMMARY_PROMPT = """Summarize the following lecture notes or document in 3-4 clear paragraphs. 
+Focus on key concepts and important information.
+
+Text:
+{text}
+
+Summary:"""
+
+QUIZ_PROMPT = """Generate {num_questions} multiple-choice questions based on the following content. 
+For each question, provide 4 options (A, B, C, D) and indicate the correct answer.
+
+Format:
+Question 1: [question text]
+A) [option]
+B) [option]
+C) [option]
+D) [option]
+Correct Answer: [letter]
+
+Content:
+{text}
+
+Quiz:"""
+
+# Precomputed summaries/quizzes are only served while the prompt (and model) that made them is current
+PROMPT_VERSIONS = {
+    "summary": fingerprint(SUMMARY_PROMPT, settings.GROQ_MODEL)[:12],
+    "quiz": fingerprint(QUIZ_PROMPT, settings.GROQ_MODEL)[:12],
+}
+
+
+class TokenUsageCallback(BaseCallbackHandler):
+    """Record Groq token usage reported at the end of each LLM call"""
+    
+    def __init__(self, operation: str):
+        self.operation = operation
+    
+    def on_llm_end(self, response, **kwargs):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        for kind in ("prompt_tokens", "completion_tokens"):
+            if usage.get(kind):
+                LLM_TOKENS.inc(usage[kind], operation=self.operation, kind=kind.split("_")[0])
+
+
+class LLMService:
+    """Handle LLM operations using Groq"""
+    
+    def __init__(self):
+        # One pooled HTTP client for all Groq calls in this process
+        self.http_client = httpx.Client(
+            timeout=settings.GROQ_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONCURRENCY * 2,
+                max_keepalive_connections=settings.LLM_MAX_CONCURRENCY
+            )
+        )
+        self.llm = ChatGroq(
+            api_key=settings.GROQ_API_KEY,
+            model_name=settings.GROQ_MODEL,
+            base_url=settings.GROQ_API_BASE,
+            http_client=self.http_client,
+            max_retries=0,  # 429s are retried by _run_chain with jittered backoff
+            temperature=0.7
+        )
         
-        prompt = PromptTemplate(
-            template=prompt_template,
-            input_variables=["context", "question"]
+        # Prompts and chains are built once and reused by every request
+        self.answer_chain = LLMChain(
+            llm=self.llm,
+            prompt=PromptTemplate(template=ANSWER_PROMPT, input_variables=["context", "question"])
+        )
+        self.chat_answer_chain = LLMChain(
+            llm=self.llm,
+            prompt=PromptTemplate(template=CHAT_ANSWER_PROMPT, input_variables=["history", "context", "question"])
+        )
+        self.summary_chain = LLMChain(
+            llm=self.llm,
+            prompt=PromptTemplate(template=SUMMARY_PROMPT, input_variables=["text"])
+        )
+        self.quiz_chain = LLMChain(
+            llm=self.llm,
+            prompt=PromptTemplate(template=QUIZ_PROMPT, input_variables=["text", "num_questions"])
         )
         
-        chain = LLMChain(llm=self.llm, prompt=prompt)
-        response = chain.run(context=context, question=query)
+        self.limiter = ConcurrencyLimiter(
+            "groq",
+            max_concurrent=settings.LLM_MAX_CONCURRENCY,
+            max_per_user=settings.LLM_MAX_PER_USER,
+            max_queue=settings.LLM_MAX_QUEUE,
+            queue_timeout=settings.LLM_QUEUE_TIMEOUT
+        )
+    
+    @staticmethod
+    def _retry_delay(error: RateLimitError, attempt: int) -> float:
+        """Retry-After from Groq if given, otherwise exponential backoff with full jitter"""
+        retry_after = error.response.headers.get("retry-after") if error.response is not None else None
+        try:
+            if retry_after is not None:
+                return min(float(retry_after), settings.LLM_RETRY_MAX_DELAY) * random.uniform(1.0, 1.2)
+        except ValueError:
+            pass
+        ceiling = min(settings.LLM_RETRY_BASE_DELAY * (2 ** attempt), settings.LLM_RETRY_MAX_DELAY)
+        return random.uniform(0, ceiling)
+    
+    def _run_chain(self, operation: str, chain: LLMChain, user_id: Optional[int] = None, **inputs) -> str:
+        """
+        Run a chain under the concurrency limiter, retrying Groq 429s
         
-        return response
+        Raises OverloadedError when no slot frees up in time or Groq keeps
+        rate limiting after LLM_MAX_RETRIES retries.
+        """
+        with self.limiter.slot(user_id):
+            for attempt in range(settings.LLM_MAX_RETRIES + 1):
+                status = "error"
+                try:
+                    with LLM_SECONDS.time(operation=operation):
+                        result = chain.run(callbacks=[TokenUsageCallback(operation)], **inputs)
+                    status = "ok"
+                    return result
+                except RateLimitError as e:
+                    status = "rate_limited"
+                    if attempt == settings.LLM_MAX_RETRIES:
+                        raise OverloadedError(
+                            "The AI service is busy, please try again shortly",
+                            retry_after=self._retry_delay(e, attempt)
+                        ) from e
+                    LLM_RETRIES.inc(operation=operation)
+                    time.sleep(self._retry_delay(e, attempt))
+                finally:
+                    LLM_REQUESTS.inc(operation=operation, status=status)
+    
+    def generate_answer(self, query: str, context: str, user_id: Optional[int] = None) -> str:
+        """Generate answer based on context"""
+        return self._run_chain("answer", self.answer_chain, user_id, context=context, question=query)
+    
+    def generate_chat_answer(self, query: str, context: str, history: str, user_id: Optional[int] = None) -> str:
+        """Generate a follow-up answer, with the (compacted) earlier conversation in the prompt"""
+        return self._run_chain(
+            "answer", self.chat_answer_chain, user_id, history=history, context=context, question=query
+        )
     
     def get_wikipedia_answer(self, query: str) -> str:
         """Get answer from Wikipedia"""
+        with WIKIPEDIA_SECONDS.time():
+            answer, result = self._lookup_wikipedia(query)
+        WIKIPEDIA_REQUESTS.inc(result=result)
+        return answer
+    
+    def _lookup_wikipedia(self, query: str):
+        """Return (answer text, outcome) where outcome is hit, miss or error"""
         try:
             # Search Wikipedia
             results = wikipedia.search(query, results=1)
             
             if not results:
-                return "I couldn't find information about that on Wikipedia."
+                return "I couldn't find information about that on Wikipedia.", "miss"
             
             # Get summary
             summary = wikipedia.summary(results[0], sentences=3)
-            return summary
+            return summary, "hit"
         
         except wikipedia.exceptions.DisambiguationError as e:
             # If disambiguation, take the first option
             try:
                 summary = wikipedia.summary(e.options[0], sentences=3)
-                return summary
+                return summary, "hit"
             except:
-                return "I found multiple topics. Please be more specific."
+                return "I found multiple topics. Please be more specific.", "miss"
         
         except wikipedia.exceptions.PageError:
-            return "I couldn't find that page on Wikipedia."
+            return "I couldn't find that page on Wikipedia.", "miss"
         
         except Exception as e:
-            return f"Error searching Wikipedia: {str(e)}"
+            return f"Error searching Wikipedia: {str(e)}", "error"
     
-    def generate_summary(self, text: str) -> str:
+    def generate_summary(self, text: str, user_id: Optional[int] = None) -> str:
         """Generate summary of document text"""
-        prompt_template = """Summarize the following lecture notes or document in 3-4 clear paragraphs. 
-Focus on key concepts and important information.
-
-Text:
-{text}
-
-Summary:"""
-        
-        prompt = PromptTemplate(
-            template=prompt_template,
-            input_variables=["text"]
-        )
-        
-        chain = LLMChain(llm=self.llm, prompt=prompt)
-        summary = chain.run(text=text[:4000])  # Limit text length
-        
-        return summary
+        return self._run_chain("summary", self.summary_chain, user_id, text=text[:4000])  # Limit text length
     
-    def generate_quiz(self, text: str, num_questions: int = 5) -> str:
+    def generate_quiz(self, text: str, num_questions: int = 5, user_id: Optional[int] = None) -> str:
         """Generate quiz questions from text"""
-        prompt_template = """Generate {num_questions} multiple-choice questions based on the following content. 
-For each question, provide 4 options (A, B, C, D) and indicate the correct answer.
-
-Format:
-Question 1: [question text]
-A) [option]
-B) [option]
-C) [option]
-D) [option]
-Correct Answer: [letter]
-
-Content:
-{text}
-
-Quiz:"""
-        
-        prompt = PromptTemplate(
-            template=prompt_template,
-            input_variables=["text", "num_questions"]
+        return self._run_chain(
+            "quiz", self.quiz_chain, user_id, text=text[:3000], num_questions=num_questions
         )
-        
-        chain = LLMChain(llm=self.llm, prompt=prompt)
-        quiz = chain.run(text=text[:3000], num_questions=num_questions)
-        
-        return quiz
 
 
 llm_service = LLMService()
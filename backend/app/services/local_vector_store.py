@@ -0,0 +1,321 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+# Rows cast to float32 at a time when scoring a float16 matrix
+SCORE_BLOCK_ROWS = 8192
+
+# Reads of the manifest and its generation, when writers keep replacing the generation under the reader
+LOAD_ATTEMPTS = 3
+
+
+def _lock_file(f):
+    """Exclusive lock on an open file: flock on POSIX, msvcrt's byte lock on Windows"""
+    try:
+        import fcntl
+    except ImportError:
+        import msvcrt
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)  # gives up after ~10 s of waiting
+                return
+            except OSError:
+                continue
+    fcntl.flock(f, fcntl.LOCK_EX)
+
+
+def _unlock_file(f):
+    try:
+        import fcntl
+    except ImportError:
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        return
+    fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class _Snapshot:
+    """One generation of a store as loaded by this process (matrix is None once the store moved to Chroma)"""
+
+    def __init__(self, key, matrix: Optional[np.ndarray], norms: Optional[np.ndarray], records: dict):
+        self.key = key
+        self.matrix = matrix
+        self.norms = norms
+        self.ids: List[str] = records["ids"]
+        self.documents: List[str] = records["documents"]
+        self.metadatas: List[dict] = records["metadatas"]
+
+    @property
+    def moved(self) -> bool:
+        return self.matrix is None
+
+
+_NO_RECORDS = {"ids": [], "documents": [], "metadatas": []}
+
+
+class LocalVectorStore:
+    """
+    Exact-search vector store for one small collection
+
+    Embeddings live in a memory-mapped .npy matrix (float32 or float16) next
+    to a JSON file of chunk ids, texts and metadata. A search is one
+    matrix-vector product over all rows followed by a partial sort, so results
+    are exact and cost no index. Writes produce a new generation of both files
+    and then swap a small manifest, so readers in other worker processes see
+    either the old or the new corpus, never a mix; writers are serialized with
+    a lock file. A store drained into Chroma leaves a "moved" manifest behind,
+    so writers that still hold it fail over to Chroma instead of starting a
+    new local corpus.
+    """
+
+    def __init__(self, path: str, dtype: str = "float32", space: str = "l2"):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.space = space
+        self._manifest = os.path.join(path, "manifest.json")
+        self._snapshot: Optional[_Snapshot] = None
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        """True while the store holds a corpus (not yet created or moved to Chroma otherwise)"""
+        snapshot = self._load()
+        return snapshot is not None and not snapshot.moved
+
+    def moved(self) -> bool:
+        snapshot = self._load()
+        return snapshot is not None and snapshot.moved
+
+    @contextmanager
+    def _exclusive(self):
+        """Serialize writers across threads and worker processes"""
+        with open(self.path.rstrip(os.sep) + ".lock", "a+") as lock:
+            _lock_file(lock)
+            try:
+                yield
+            finally:
+                _unlock_file(lock)
+
+    def _norms(self, matrix: np.ndarray) -> np.ndarray:
+        norms = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), SCORE_BLOCK_ROWS):
+            block = np.asarray(matrix[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            norms[start:start + len(block)] = (block * block).sum(axis=1)
+        return norms if self.space == "l2" else np.sqrt(norms)
+
+    def _load(self) -> Optional[_Snapshot]:
+        """
+        Current generation, or None if the store was never written
+
+        Re-read only when another writer has replaced the manifest; the
+        snapshot of a store moved to Chroma has no matrix.
+        """
+        try:
+            stat = os.stat(self._manifest)
+        except FileNotFoundError:
+            return None
+        key = (stat.st_ino, stat.st_mtime_ns)
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.key == key:
+            return snapshot
+
+        with self._lock:
+            for attempt in range(LOAD_ATTEMPTS):
+                if attempt:
+                    try:
+                        stat = os.stat(self._manifest)
+                    except FileNotFoundError:
+                        return None
+                    key = (stat.st_ino, stat.st_mtime_ns)
+                if self._snapshot is not None and self._snapshot.key == key:
+                    return self._snapshot
+                try:
+                    with open(self._manifest) as f:
+                        manifest = json.load(f)
+                    if manifest.get("moved"):
+                        self._snapshot = _Snapshot(key, None, None, _NO_RECORDS)
+                        return self._snapshot
+                    generation = manifest["generation"]
+                    matrix = np.load(os.path.join(self.path, f"vectors-{generation}.npy"), mmap_mode="r")
+                    with open(os.path.join(self.path, f"records-{generation}.json")) as f:
+                        records = json.load(f)
+                except FileNotFoundError:
+                    # A writer replaced the generation while we were reading it: read the new one
+                    if attempt == LOAD_ATTEMPTS - 1:
+                        raise
+                    continue
+                self._snapshot = _Snapshot(key, matrix, self._norms(matrix), records)
+                return self._snapshot
+
+    def count(self) -> int:
+        snapshot = self._load()
+        return len(snapshot.ids) if snapshot else 0
+
+    def _write(self, previous: Optional[_Snapshot], keep: np.ndarray, vectors: np.ndarray, records: dict):
+        """
+        Write a new generation holding previous rows where keep is True followed by vectors
+
+        The writing process keeps the new generation loaded (records and norms
+        carried over), so its own searches do not re-read the files.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        generation = 0
+        if os.path.exists(self._manifest):
+            with open(self._manifest) as f:
+                generation = json.load(f)["generation"] + 1
+
+        dimensions = vectors.shape[1] if len(vectors) else previous.matrix.shape[1]
+        rows = int(keep.sum()) + len(vectors)
+        matrix_path = os.path.join(self.path, f"vectors-{generation}.npy")
+        matrix = np.lib.format.open_memmap(matrix_path, mode="w+", dtype=self.dtype, shape=(rows, dimensions))
+        row = 0
+        if previous is not None:
+            for start in range(0, len(previous.matrix), SCORE_BLOCK_ROWS):
+                block = previous.matrix[start:start + SCORE_BLOCK_ROWS][keep[start:start + SCORE_BLOCK_ROWS]]
+                matrix[row:row + len(block)] = block
+                row += len(block)
+        matrix[row:] = vectors
+        matrix.flush()
+        del matrix
+        matrix = np.load(matrix_path, mmap_mode="r")
+        norms = self._norms(np.asarray(vectors))
+        if previous is not None:
+            norms = np.concatenate([previous.norms[keep], norms])
+
+        with open(os.path.join(self.path, f"records-{generation}.json"), "w") as f:
+            json.dump(records, f)
+        with open(self._manifest + ".tmp", "w") as f:
+            json.dump({"generation": generation, "rows": rows, "dimensions": dimensions, "dtype": self.dtype.name}, f)
+        os.replace(self._manifest + ".tmp", self._manifest)
+        stat = os.stat(self._manifest)
+        with self._lock:
+            self._snapshot = _Snapshot((stat.st_ino, stat.st_mtime_ns), matrix, norms, records)
+
+        # The previous generation stays until the next write, for readers that read the old
+        # manifest just before the swap; ones that already map it keep their open file
+        self._remove_generations(keep=(generation, generation - 1))
+
+    def _remove_generations(self, keep: Tuple[int, ...] = ()):
+        """Delete generation files other than keep; ones still mapped on Windows go with a later write"""
+        kept = {str(generation) for generation in keep}
+        for name in os.listdir(self.path):
+            if name.startswith(("vectors-", "records-")) and name.split("-", 1)[1].split(".")[0] not in kept:
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except PermissionError:
+                    pass
+
+    def add(
+        self,
+        ids: List[str],
+        vectors: List[List[float]],
+        documents: List[str],
+        metadatas: List[dict],
+        max_rows: Optional[int] = None
+    ) -> bool:
+        """
+        Append chunks
+
+        Returns False (and writes nothing) if the store would grow beyond
+        max_rows or has been moved to Chroma meanwhile.
+        """
+        with self._exclusive():
+            previous = self._load()
+            if previous is not None and previous.moved:
+                return False
+            existing = len(previous.ids) if previous else 0
+            if max_rows is not None and existing + len(ids) > max_rows:
+                return False
+            records = {
+                "ids": (previous.ids if previous else []) + list(ids),
+                "documents": (previous.documents if previous else []) + list(documents),
+                "metadatas": (previous.metadatas if previous else []) + list(metadatas),
+            }
+            keep = np.ones(existing, dtype=bool)
+            self._write(previous, keep, np.asarray(vectors, dtype=self.dtype), records)
+            return True
+
+    def delete(self, ids: List[str]) -> bool:
+        """Remove chunks; False if the store has been moved to Chroma (delete them there instead)"""
+        with self._exclusive():
+            previous = self._load()
+            if previous is not None and previous.moved:
+                return False
+            if previous is None:
+                return True
+            removed = set(ids)
+            keep = np.array([chunk_id not in removed for chunk_id in previous.ids], dtype=bool)
+            if keep.all():
+                return True
+            records = {
+                key: [value for value, kept in zip(values, keep) if kept]
+                for key, values in (
+                    ("ids", previous.ids), ("documents", previous.documents), ("metadatas", previous.metadatas)
+                )
+            }
+            empty = np.empty((0, previous.matrix.shape[1]), dtype=self.dtype)
+            self._write(previous, keep, empty, records)
+            return True
+
+    def drain(self, write: Callable[[List[str], np.ndarray, List[str], List[dict]], None]):
+        """Hand every row to write (e.g. a Chroma collection), then leave only a "moved" manifest"""
+        with self._exclusive():
+            snapshot = self._load()
+            if snapshot is not None and not snapshot.moved and snapshot.ids:
+                write(snapshot.ids, np.asarray(snapshot.matrix, dtype=np.float32),
+                      snapshot.documents, snapshot.metadatas)
+            os.makedirs(self.path, exist_ok=True)
+            with open(self._manifest + ".tmp", "w") as f:
+                json.dump({"moved": "chroma"}, f)
+            os.replace(self._manifest + ".tmp", self._manifest)
+            stat = os.stat(self._manifest)
+            with self._lock:
+                self._snapshot = _Snapshot((stat.st_ino, stat.st_mtime_ns), None, None, _NO_RECORDS)
+            self._remove_generations()
+
+    def search(self, vector: List[float], k: int) -> Optional[Tuple[List[str], List[dict], List[List[float]]]]:
+        """
+        Exact k nearest chunks under the store's distance (Chroma's l2, cosine or ip)
+
+        Returns:
+            (documents, metadatas, embeddings) ordered by distance, or None if
+            the store has been moved to Chroma (possibly by another worker)
+        """
+        snapshot = self._load()
+        if snapshot is None:
+            return [], [], []
+        if snapshot.moved:
+            return None
+        matrix = snapshot.matrix
+        k = min(k, len(matrix))
+        if k == 0:
+            return [], [], []
+
+        query = np.asarray(vector, dtype=np.float32)
+        if matrix.dtype == np.float32:
+            dots = matrix @ query
+        else:
+            dots = np.empty(len(matrix), dtype=np.float32)
+            for start in range(0, len(matrix), SCORE_BLOCK_ROWS):
+                block = np.asarray(matrix[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+                dots[start:start + len(block)] = block @ query
+
+        if self.space == "l2":
+            distances = snapshot.norms - 2 * dots  # + |q|^2, the same for every row
+        elif self.space == "cosine":
+            distances = -dots / (snapshot.norms * (np.linalg.norm(query) + 1e-12) + 1e-12)
+        else:
+            distances = -dots
+
+        top = np.argpartition(distances, k - 1)[:k] if k < len(matrix) else np.arange(len(matrix))
+        top = top[np.argsort(distances[top], kind="stable")]
+        return (
+            [snapshot.documents[i] for i in top],
+            [snapshot.metadatas[i] for i in top],
+            np.asarray(matrix[top], dtype=np.float32).tolist()
+        )
@@ -0,0 +1,292 @@
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from app.config import settings
+from app.models.database import connect
+from app.services.document_processor import DocumentProcessor
+from app.services.llm_service import llm_service, PROMPT_VERSIONS
+from app.utils.metrics import metrics
+from app.utils.scheduler import scheduler, BACKGROUND
+
+
+PRECOMPUTE_JOBS = metrics.counter(
+    "precompute_jobs_total", "Background summary/quiz generations", ("kind", "status")
+)
+PRECOMPUTED_REQUESTS = metrics.counter(
+    "precomputed_requests_total", "Summary/quiz requests served from the precomputed store", ("kind", "result")
+)
+
+# "Question 3:" headings in QUIZ_PROMPT's output format (tolerating markdown bold)
+_QUESTION_PATTERN = re.compile(r"^\s*\**\s*Question\s+\d+\s*[:.]\s*\**", re.IGNORECASE | re.MULTILINE)
+
+
+def split_quiz(text: str) -> List[str]:
+    """Split generated quiz text into question blocks, without their 'Question N:' headings"""
+    blocks = [block.strip() for block in _QUESTION_PATTERN.split(text)[1:]]
+    return [block for block in blocks if block]
+
+
+def format_quiz(questions: List[str]) -> str:
+    """Number question blocks back into the format of QUIZ_PROMPT"""
+    return "\n\n".join(f"Question {i}: {block}" for i, block in enumerate(questions, 1))
+
+
+class ArtifactStore:
+    """
+    Precomputed summaries and quiz pools in the document_artifacts table
+
+    Rows are keyed by (document_id, kind) and stamped with the prompt version
+    that produced them; rows from an older prompt are never served. A row in
+    'pending' state is a claim by the worker generating it, so several app
+    workers never generate the same artifact twice.
+    """
+
+    def get(self, document_id: int, kind: str):
+        """Ready content for the current prompt version, or None"""
+        conn = connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT content FROM document_artifacts
+                WHERE document_id = ? AND kind = ? AND prompt_version = ? AND status = 'ready'
+            """, (document_id, kind, PROMPT_VERSIONS[kind]))
+            row = cursor.fetchone()
+        finally:
+            conn.close()
+        PRECOMPUTED_REQUESTS.inc(kind=kind, result="hit" if row else "miss")
+        return json.loads(row[0]) if row else None
+
+    def claim(self, document_id: int, kind: str) -> bool:
+        """Mark an artifact as being generated; False if it is already ready or claimed"""
+        conn = connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT OR IGNORE INTO document_artifacts
+                    (document_id, kind, prompt_version, status, content, updated_at)
+                VALUES (?, ?, ?, 'pending', NULL, ?)
+            """, (document_id, kind, PROMPT_VERSIONS[kind], datetime.now().isoformat()))
+            conn.commit()
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def release(self, document_id: int, kind: str):
+        """Drop an unfinished claim so the artifact can be generated later"""
+        conn = connect()
+        try:
+            conn.cursor().execute("""
+                DELETE FROM document_artifacts WHERE document_id = ? AND kind = ? AND status = 'pending'
+            """, (document_id, kind))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def put(self, document_id: int, kind: str, content) -> bool:
+        """Store ready content, unless the document has been deleted meanwhile"""
+        conn = connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT OR REPLACE INTO document_artifacts
+                    (document_id, kind, prompt_version, status, content, updated_at)
+                SELECT ?, ?, ?, 'ready', ?, ? WHERE EXISTS (SELECT 1 FROM documents WHERE id = ?)
+            """, (
+                document_id, kind, PROMPT_VERSIONS[kind], json.dumps(content),
+                datetime.now().isoformat(), document_id
+            ))
+            conn.commit()
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def delete_document(self, document_id: int):
+        conn = connect()
+        try:
+            conn.cursor().execute("DELETE FROM document_artifacts WHERE document_id = ?", (document_id,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def purge_stale(self):
+        """Remove artifacts from older prompts and claims abandoned by a crashed worker"""
+        expired = (datetime.now() - timedelta(seconds=settings.PRECOMPUTE_CLAIM_TIMEOUT)).isoformat()
+        conn = connect()
+        try:
+            cursor = conn.cursor()
+            for kind, version in PROMPT_VERSIONS.items():
+                cursor.execute("""
+                    DELETE FROM document_artifacts WHERE kind = ? AND prompt_version != ?
+                """, (kind, version))
+            cursor.execute("""
+                DELETE FROM document_artifacts WHERE status = 'pending' AND updated_at < ?
+            """, (expired,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def missing(self):
+        """(document_id, file_path) of documents lacking a current summary or quiz pool"""
+        conn = connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT d.id, d.file_path FROM documents d
+                WHERE (SELECT COUNT(*) FROM document_artifacts a WHERE a.document_id = d.id) < ?
+                ORDER BY d.upload_date DESC
+            """, (len(PROMPT_VERSIONS),))
+            return cursor.fetchall()
+        finally:
+            conn.close()
+
+
+class Precomputer:
+    """
+    Background generation of summaries and quiz pools after a document is indexed
+
+    One low-priority daemon thread per worker process works through a queue of
+    documents. Before each Groq call it waits until interactive requests leave
+    the LLM limiter at least half idle and then takes a background scheduler
+    slot; extraction runs at a raised nice level. Cancelled documents are
+    skipped, and results for a document deleted while its artifact was being
+    generated are discarded.
+    """
+
+    def __init__(self, store: ArtifactStore):
+        self.store = store
+        self._queue: "queue.Queue" = queue.Queue()
+        self._cancelled = set()
+        # Times each document is queued, and the one being processed: only these can be cancelled
+        self._queued: Dict[int, int] = {}
+        self._current: Optional[int] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the worker thread, which first re-queues anything missing or made stale by a prompt change"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="precompute", daemon=True)
+            self._thread.start()
+
+    def _put(self, document_id: int, file_path: str):
+        with self._lock:
+            self._queued[document_id] = self._queued.get(document_id, 0) + 1
+        self._queue.put((document_id, file_path))
+
+    def enqueue(self, document_id: int, file_path: str):
+        with self._lock:
+            self._cancelled.discard(document_id)
+        self._put(document_id, file_path)
+
+    def cancel(self, document_id: int):
+        """Skip or stop a queued or running document; a no-op for documents never queued"""
+        with self._lock:
+            if document_id in self._queued or document_id == self._current:
+                self._cancelled.add(document_id)
+
+    def _take(self, document_id: int):
+        """Move a dequeued document from the queue to in progress"""
+        with self._lock:
+            remaining = self._queued.pop(document_id, 1) - 1
+            if remaining:
+                self._queued[document_id] = remaining
+            self._current = document_id
+
+    def _finish(self, document_id: int):
+        """Forget a cancellation once the document is neither queued nor running"""
+        with self._lock:
+            self._current = None
+            if document_id not in self._queued:
+                self._cancelled.discard(document_id)
+
+    def is_cancelled(self, document_id: int) -> bool:
+        with self._lock:
+            return document_id in self._cancelled
+
+    @staticmethod
+    def _lower_priority():
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), settings.PRECOMPUTE_NICE)
+        except (AttributeError, OSError):
+            pass
+
+    def _wait_for_idle_llm(self, document_id: int) -> bool:
+        """Block while interactive requests need the Groq slots; False if the document was cancelled"""
+        limiter = llm_service.limiter
+        while limiter.waiting > 0 or limiter.active >= max(limiter.max_concurrent // 2, 1):
+            if self.is_cancelled(document_id):
+                return False
+            time.sleep(0.5)
+        return not self.is_cancelled(document_id)
+
+    def _generate(self, kind: str, text: str):
+        if kind == "summary":
+            return llm_service.generate_summary(text, user_id="precompute")
+        pool = split_quiz(llm_service.generate_quiz(text, settings.QUIZ_POOL_SIZE, user_id="precompute"))
+        if not pool:
+            raise ValueError("Quiz output did not contain any questions")
+        return pool
+
+    def process(self, document_id: int, file_path: str):
+        """Generate whatever is missing for one document"""
+        text = None
+        for kind in PROMPT_VERSIONS:
+            if self.is_cancelled(document_id):
+                PRECOMPUTE_JOBS.inc(kind=kind, status="cancelled")
+                continue
+            if not self.store.claim(document_id, kind):
+                continue
+            status = "failed"
+            try:
+                if self._wait_for_idle_llm(document_id):
+                    # Background class: capped, and behind every query and on-demand request
+                    with scheduler.slot(BACKGROUND, "precompute"):
+                        if text is None:
+                            file_extension = file_path.split(".")[-1].lower()
+                            text = DocumentProcessor.process_document(file_path, file_extension)
+                        content = self._generate(kind, text)
+                    if not self.is_cancelled(document_id) and self.store.put(document_id, kind, content):
+                        status = "done"
+                if status != "done":
+                    status = "cancelled"
+            except Exception as e:
+                print(f"Precompute of {kind} for document {document_id} failed: {e}")
+            finally:
+                if status != "done":
+                    self.store.release(document_id, kind)
+                PRECOMPUTE_JOBS.inc(kind=kind, status=status)
+
+    def _run(self):
+        self._lower_priority()
+        try:
+            self.store.purge_stale()
+            for document_id, file_path in self.store.missing():
+                self._put(document_id, file_path)
+        except Exception as e:
+            print(f"Precompute rebuild failed: {e}")
+
+        while True:
+            document_id, file_path = self._queue.get()
+            self._take(document_id)
+            try:
+                if not self.is_cancelled(document_id) and os.path.exists(file_path):
+                    self.process(document_id, file_path)
+            finally:
+                self._finish(document_id)
+
+
+artifact_store = ArtifactStore()
+precomputer = Precomputer(artifact_store)
+
+
+def sample_quiz(pool: List[str], num_questions: int) -> Optional[str]:
+    """A quiz of num_questions drawn from a precomputed pool, or None if the pool is too small"""
+    if not pool or len(pool) < num_questions:
+        return None
+    return format_quiz(random.sample(pool, num_questions))
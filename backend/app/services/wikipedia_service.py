@@ -1,5 +1,10 @@
 import wikipedia
 from typing import Optional
+from app.config import settings
+
+# Point the client at another MediaWiki API, e.g. a local stand-in for load tests
+if settings.WIKIPEDIA_API_URL:
+    wikipedia.wikipedia.API_URL = settings.WIKIPEDIA_API_URL
 
 class WikipediaService:
     """Handle Wikipedia queries"""
@@ -0,0 +1,107 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional
+from app.utils.metrics import metrics
+
+
+BATCH_SIZE = metrics.histogram(
+    "microbatch_size", "Items per micro-batch", ("batcher",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+BATCH_WAIT_SECONDS = metrics.histogram(
+    "microbatch_wait_seconds", "Time an item waited before its batch started", ("batcher",),
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.5)
+)
+
+
+class MicroBatcher:
+    """
+    Group items submitted by concurrent threads into one batched call
+
+    A background thread takes the first waiting item, keeps collecting for up
+    to max_wait_ms (or until max_batch_size items are queued), runs
+    batch_func once on the whole batch and resolves each caller's future with
+    its own result. A lone caller therefore pays at most max_wait_ms extra;
+    under load the batch fills before the window closes.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        batch_func: Callable[[List[Any]], List[Any]],
+        max_batch_size: int,
+        max_wait_ms: float
+    ):
+        self.name = name
+        self.batch_func = batch_func
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending: List[tuple] = []
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_thread(self):
+        # Started lazily so forked/spawned workers each get their own thread
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=f"microbatch-{self.name}", daemon=True)
+            self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        """Queue an item; the future resolves to batch_func's result for it"""
+        future = Future()
+        with self._condition:
+            self._ensure_thread()
+            self._pending.append((item, future, time.perf_counter()))
+            self._condition.notify()
+        return future
+
+    def __call__(self, item: Any, timeout: Optional[float] = None) -> Any:
+        """Submit an item and wait for its result"""
+        return self.submit(item).result(timeout)
+
+    def _next_batch(self) -> List[tuple]:
+        with self._condition:
+            self._condition.wait_for(lambda: self._pending)
+            deadline = time.perf_counter() + self.max_wait
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+        return batch
+
+    def _run(self):
+        try:
+            self._loop()
+        finally:
+            # Dying on a BaseException: hand items queued meanwhile to a new thread
+            with self._condition:
+                self._thread = None
+                if self._pending:
+                    self._ensure_thread()
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            started = time.perf_counter()
+            BATCH_SIZE.observe(len(batch), batcher=self.name)
+            for _, _, queued in batch:
+                BATCH_WAIT_SECONDS.observe(started - queued, batcher=self.name)
+            try:
+                results = list(self.batch_func([item for item, _, _ in batch]))
+            except BaseException as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                if not isinstance(e, Exception):
+                    raise
+                continue
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+            # A short result list must not leave callers waiting
+            for _, future, _ in batch[len(results):]:
+                future.set_exception(RuntimeError(
+                    f"{self.name}: batch function returned {len(results)} results for {len(batch)} items"
+                ))
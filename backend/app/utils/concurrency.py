@@ -0,0 +1,103 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+from app.utils.metrics import metrics
+
+
+QUEUE_DEPTH = metrics.gauge("limiter_queue_depth", "Callers waiting for a slot", ("limiter",))
+IN_FLIGHT = metrics.gauge("limiter_in_flight", "Callers holding a slot", ("limiter",))
+QUEUE_WAIT_SECONDS = metrics.histogram("limiter_wait_seconds", "Time spent waiting for a slot", ("limiter",))
+REJECTED = metrics.counter("limiter_rejected_total", "Callers turned away", ("limiter", "reason"))
+
+
+class OverloadedError(Exception):
+    """Raised when work cannot be admitted; maps to HTTP 503 with Retry-After"""
+
+    def __init__(self, message: str, retry_after: float = 5.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """
+    Global and per-user cap on concurrent calls, with a bounded wait queue
+
+    Callers beyond the caps wait in FIFO-ish order (threads woken by a
+    condition variable). When max_queue callers are already waiting, or a
+    caller waits longer than queue_timeout, OverloadedError is raised so the
+    request can fail fast instead of piling up.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int,
+        max_per_user: int,
+        max_queue: int,
+        queue_timeout: float,
+        retry_after: float = 5.0
+    ):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self.waiting = 0
+        self._active_per_user: Dict[object, int] = {}
+        self._condition = threading.Condition()
+
+    def _has_room(self, user_id: Optional[object]) -> bool:
+        if self.active >= self.max_concurrent:
+            return False
+        if user_id is not None and self._active_per_user.get(user_id, 0) >= self.max_per_user:
+            return False
+        return True
+
+    def acquire(self, user_id: Optional[object] = None):
+        """Take a slot, waiting in the queue if needed"""
+        started = time.perf_counter()
+        with self._condition:
+            if not self._has_room(user_id):
+                if self.waiting >= self.max_queue:
+                    REJECTED.inc(limiter=self.name, reason="queue_full")
+                    raise OverloadedError(f"{self.name} queue is full", self.retry_after)
+                self.waiting += 1
+                QUEUE_DEPTH.set(self.waiting, limiter=self.name)
+                try:
+                    admitted = self._condition.wait_for(lambda: self._has_room(user_id), self.queue_timeout)
+                finally:
+                    self.waiting -= 1
+                    QUEUE_DEPTH.set(self.waiting, limiter=self.name)
+                if not admitted:
+                    REJECTED.inc(limiter=self.name, reason="timeout")
+                    raise OverloadedError(f"Timed out waiting for {self.name}", self.retry_after)
+            self.active += 1
+            if user_id is not None:
+                self._active_per_user[user_id] = self._active_per_user.get(user_id, 0) + 1
+            IN_FLIGHT.set(self.active, limiter=self.name)
+        QUEUE_WAIT_SECONDS.observe(time.perf_counter() - started, limiter=self.name)
+
+    def release(self, user_id: Optional[object] = None):
+        """Give a slot back and wake waiting callers"""
+        with self._condition:
+            self.active -= 1
+            if user_id is not None:
+                remaining = self._active_per_user.get(user_id, 1) - 1
+                if remaining:
+                    self._active_per_user[user_id] = remaining
+                else:
+                    self._active_per_user.pop(user_id, None)
+            IN_FLIGHT.set(self.active, limiter=self.name)
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, user_id: Optional[object] = None):
+        """Hold a slot for the duration of the with-block"""
+        self.acquire(user_id)
+        try:
+            yield
+        finally:
+            self.release(user_id)
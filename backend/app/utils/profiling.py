@@ -0,0 +1,195 @@
+import cProfile
+import functools
+import hmac
+import os
+import pstats
+import random
+import re
+import threading
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Callable, List, Optional
+from fastapi.concurrency import run_in_threadpool as _run_in_threadpool
+from app.config import settings
+
+
+class RequestProfile:
+    """cProfile data of one request: its event-loop thread, its worker-thread calls and extraction-process time"""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.workers: List[cProfile.Profile] = []
+        self.extract_seconds = 0.0
+        self.extract_calls = 0
+        self.token = None
+        self._lock = threading.Lock()
+
+    def add_worker(self, profile: cProfile.Profile):
+        with self._lock:
+            self.workers.append(profile)
+
+    def add_extraction(self, seconds: float):
+        with self._lock:
+            self.extract_seconds += seconds
+            self.extract_calls += 1
+
+    def stats(self) -> pstats.Stats:
+        """All threads merged; extraction appears as one entry of its own"""
+        stats = pstats.Stats(self.profile)
+        with self._lock:
+            for worker in self.workers:
+                stats.add(worker)
+            if self.extract_calls:
+                # Wall time spent in extraction processes, which cProfile cannot see; the worker
+                # thread's wait for the result is already counted, so it is not added to the total
+                calls, seconds = self.extract_calls, self.extract_seconds
+                stats.stats[("<extraction process>", 0, "extract_text_timed")] = (calls, calls, seconds, seconds, {})
+        return stats
+
+
+# Profile of the request being handled, inherited by the worker threads it starts
+_current: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+
+def profiled(func: Callable) -> Callable:
+    """func, profiled into the current request's report when that request is being profiled"""
+    request = _current.get()
+    if request is None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Profilers cannot run side by side here (Python 3.12+); the call goes unrecorded
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            request.add_worker(profile)
+    return wrapper
+
+
+async def run_in_threadpool(func: Callable, *args, **kwargs):
+    """fastapi's run_in_threadpool, with the call included in the request's profile"""
+    return await _run_in_threadpool(profiled(func), *args, **kwargs)
+
+
+def record_extraction(seconds: float):
+    """Add time spent in an extraction process to the current request's profile, if any"""
+    request = _current.get()
+    if request is not None:
+        request.add_extraction(seconds)
+
+
+class ProfileStore:
+    """
+    Capture cProfile reports for selected requests into a bounded folder
+
+    Reports are standard .pstats files: open them with `python -m pstats`,
+    snakeviz, or convert to a flamegraph with flameprof / gprof2dot.
+    A report holds the event-loop thread plus every call the request hands
+    to run_in_threadpool from this module, each profiled on its own worker
+    thread and merged in. Text extraction runs in other processes that
+    cProfile cannot see; its wall time is added as a single
+    "<extraction process>" entry. Work done on other threads (the query
+    micro-batcher, the precomputer, or a coalesced call led by another
+    request) only shows up as the time spent waiting for it.
+
+    Only one request is profiled at a time per worker; cProfile hooks the
+    whole event-loop thread, so other requests running on it at the same
+    time will also show up in the report.
+    """
+
+    def __init__(
+        self,
+        folder: str = settings.PROFILES_PATH,
+        max_reports: int = settings.PROFILE_MAX_REPORTS,
+        admin_token: Optional[str] = settings.PROFILE_ADMIN_TOKEN,
+        sample_rate: float = settings.PROFILE_SAMPLE_RATE
+    ):
+        self.folder = folder
+        self.max_reports = max_reports
+        self.admin_token = admin_token
+        self.sample_rate = sample_rate
+        self._busy = threading.Lock()
+
+    def is_admin(self, token: Optional[str]) -> bool:
+        """True when token matches the configured admin token"""
+        if not self.admin_token or not token:
+            return False
+        return hmac.compare_digest(token, self.admin_token)
+
+    def should_profile(self, token: Optional[str]) -> bool:
+        """Profile when the admin header is present or the request is sampled"""
+        if self.is_admin(token):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self) -> Optional[RequestProfile]:
+        """Start profiling, or return None if another request is being profiled"""
+        if not self._busy.acquire(blocking=False):
+            return None
+        request = RequestProfile()
+        try:
+            request.profile.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) already owns the hook
+            self._busy.release()
+            return None
+        request.token = _current.set(request)
+        return request
+
+    def stop(self, request: RequestProfile, method: str, path: str, elapsed: float) -> str:
+        """Stop profiling, write the report and return its file name"""
+        try:
+            request.profile.disable()
+            _current.reset(request.token)
+        finally:
+            self._busy.release()
+
+        os.makedirs(self.folder, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", path).strip("-") or "root"
+        name = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{method}_{slug}_{int(elapsed * 1000)}ms.pstats"
+        request.stats().dump_stats(os.path.join(self.folder, name))
+        self._trim()
+        return name
+
+    def _trim(self):
+        """Delete the oldest reports beyond max_reports"""
+        reports = self.list_reports()
+        for report in reports[self.max_reports:]:
+            try:
+                os.remove(os.path.join(self.folder, report["name"]))
+            except FileNotFoundError:
+                pass
+
+    def list_reports(self) -> List[dict]:
+        """Reports on disk, newest first"""
+        if not os.path.isdir(self.folder):
+            return []
+        reports = []
+        for name in os.listdir(self.folder):
+            if not name.endswith(".pstats"):
+                continue
+            stat = os.stat(os.path.join(self.folder, name))
+            reports.append({
+                "name": name,
+                "size": stat.st_size,
+                "created": datetime.fromtimestamp(stat.st_mtime).isoformat()
+            })
+        reports.sort(key=lambda r: r["name"], reverse=True)
+        return reports
+
+    def report_path(self, name: str) -> Optional[str]:
+        """Absolute path of a report, or None if the name is unknown"""
+        if os.path.basename(name) != name or not name.endswith(".pstats"):
+            return None
+        path = os.path.join(self.folder, name)
+        return path if os.path.isfile(path) else None
+
+
+profile_store = ProfileStore()
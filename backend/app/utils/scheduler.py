@@ -0,0 +1,261 @@
+import asyncio
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, List, Optional
+from app.config import settings
+from app.utils.concurrency import OverloadedError
+from app.utils.metrics import metrics
+
+
+SCHEDULER_QUEUE_DEPTH = metrics.gauge("scheduler_queue_depth", "Requests waiting for admission", ("priority",))
+SCHEDULER_IN_FLIGHT = metrics.gauge("scheduler_in_flight", "Admitted requests still running", ("priority",))
+SCHEDULER_WAIT_SECONDS = metrics.histogram(
+    "scheduler_wait_seconds", "Time from arrival to admission", ("priority",)
+)
+SCHEDULER_REJECTED = metrics.counter("scheduler_rejected_total", "Requests turned away", ("priority", "reason"))
+SCHEDULER_YIELD_SECONDS = metrics.histogram(
+    "scheduler_yield_seconds", "Time background work paused for interactive requests"
+)
+
+# Priority classes, highest first
+INTERACTIVE = "interactive"
+ON_DEMAND = "on_demand"
+BACKGROUND = "background"
+PRIORITIES = (INTERACTIVE, ON_DEMAND, BACKGROUND)
+
+
+class PriorityClass:
+    """Limits for one priority class"""
+
+    def __init__(self, max_concurrent: int, max_per_user: int, max_queue: int, queue_timeout: Optional[float]):
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+
+class Ticket:
+    """A request's place in the scheduler, from arrival until release"""
+
+    def __init__(self, priority: str, user_id: Optional[object], sequence: int, loop=None):
+        self.priority = priority
+        self.user_id = user_id
+        self.sequence = sequence
+        self.arrived = time.perf_counter()
+        self.granted = False
+        # Woken through the event loop for async callers, a threading.Event otherwise
+        self._loop = loop
+        self._future = loop.create_future() if loop is not None else None
+        self._event = threading.Event() if loop is None else None
+
+    def _wake(self):
+        if self._future is not None:
+            self._loop.call_soon_threadsafe(lambda: self._future.done() or self._future.set_result(None))
+        else:
+            self._event.set()
+
+
+class PriorityScheduler:
+    """
+    Admission control for expensive work, by priority class and user
+
+    Each request takes one of max_concurrent slots before it runs. Freed slots
+    go to the highest priority class with someone waiting; within a class, to
+    the waiting user holding the fewest slots (then first come, first served),
+    so one student with many uploads cannot starve the others. Lower classes
+    are also capped below max_concurrent, which keeps slots free for
+    interactive requests even while long ingestion jobs run. Each class has a
+    bounded queue and wait timeout; beyond them OverloadedError is raised
+    (HTTP 503 with Retry-After).
+
+    Background work should call yield_to_interactive() between batches: it
+    pauses briefly while interactive requests are running, so ingestion does
+    not compete with them for the CPU.
+
+    When disabled, slots are granted immediately and nothing is counted.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        classes: Dict[str, PriorityClass],
+        yield_seconds: float = 0.2,
+        retry_after: float = 5.0,
+        enabled: bool = True
+    ):
+        self.enabled = enabled
+        self.max_concurrent = max_concurrent
+        self.classes = classes
+        self.yield_seconds = yield_seconds
+        self.retry_after = retry_after
+        self.active = 0
+        self._active_by_class = {priority: 0 for priority in PRIORITIES}
+        self._active_by_user: Dict[tuple, int] = {}
+        self._queues: Dict[str, List[Ticket]] = {priority: [] for priority in PRIORITIES}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def queue_depth(self, priority: str) -> int:
+        return len(self._queues[priority])
+
+    def in_flight(self, priority: str) -> int:
+        return self._active_by_class[priority]
+
+    def _user_active(self, ticket: Ticket) -> int:
+        return self._active_by_user.get((ticket.priority, ticket.user_id), 0)
+
+    def _report(self, priority: str):
+        SCHEDULER_QUEUE_DEPTH.set(len(self._queues[priority]), priority=priority)
+        SCHEDULER_IN_FLIGHT.set(self._active_by_class[priority], priority=priority)
+
+    def _grant(self, ticket: Ticket):
+        ticket.granted = True
+        self.active += 1
+        self._active_by_class[ticket.priority] += 1
+        key = (ticket.priority, ticket.user_id)
+        self._active_by_user[key] = self._active_by_user.get(key, 0) + 1
+        SCHEDULER_WAIT_SECONDS.observe(time.perf_counter() - ticket.arrived, priority=ticket.priority)
+        ticket._wake()
+
+    def _dispatch(self):
+        """Hand free slots to waiting tickets, highest class first and fairest user first (lock held)"""
+        for priority in PRIORITIES:
+            limits = self.classes[priority]
+            queue = self._queues[priority]
+            while queue and self.active < self.max_concurrent and self._active_by_class[priority] < limits.max_concurrent:
+                eligible = [
+                    ticket for ticket in queue
+                    if ticket.user_id is None or self._user_active(ticket) < limits.max_per_user
+                ]
+                if not eligible:
+                    break
+                ticket = min(eligible, key=lambda t: (self._user_active(t), t.sequence))
+                queue.remove(ticket)
+                self._grant(ticket)
+            self._report(priority)
+
+    def _enqueue(self, priority: str, user_id: Optional[object], loop=None) -> Ticket:
+        with self._condition:
+            if len(self._queues[priority]) >= self.classes[priority].max_queue:
+                SCHEDULER_REJECTED.inc(priority=priority, reason="queue_full")
+                raise OverloadedError("The server is busy, please try again shortly", self.retry_after)
+            ticket = Ticket(priority, user_id, next(self._sequence), loop)
+            self._queues[priority].append(ticket)
+            self._dispatch()
+            return ticket
+
+    def _abandon(self, ticket: Ticket) -> bool:
+        """Leave the queue after a timeout or cancellation; True if the slot was granted meanwhile"""
+        with self._condition:
+            if ticket.granted:
+                return True
+            self._queues[ticket.priority].remove(ticket)
+            self._report(ticket.priority)
+            self._condition.notify_all()
+            return False
+
+    def _timed_out(self, ticket: Ticket):
+        SCHEDULER_REJECTED.inc(priority=ticket.priority, reason="timeout")
+        raise OverloadedError("The server is busy, please try again shortly", self.retry_after)
+
+    def release(self, ticket: Ticket):
+        """Give a slot back and admit whoever is next"""
+        with self._condition:
+            self.active -= 1
+            self._active_by_class[ticket.priority] -= 1
+            key = (ticket.priority, ticket.user_id)
+            remaining = self._active_by_user.get(key, 1) - 1
+            if remaining:
+                self._active_by_user[key] = remaining
+            else:
+                self._active_by_user.pop(key, None)
+            self._dispatch()
+            self._report(ticket.priority)
+            self._condition.notify_all()
+
+    def acquire(self, priority: str, user_id: Optional[object] = None) -> Ticket:
+        """Wait (blocking the thread) for a slot in a priority class"""
+        ticket = self._enqueue(priority, user_id)
+        if not ticket._event.wait(self.classes[priority].queue_timeout) and not self._abandon(ticket):
+            self._timed_out(ticket)
+        return ticket
+
+    async def acquire_async(self, priority: str, user_id: Optional[object] = None) -> Ticket:
+        """Wait for a slot without blocking the event loop"""
+        ticket = self._enqueue(priority, user_id, asyncio.get_running_loop())
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket._future), self.classes[priority].queue_timeout)
+        except asyncio.TimeoutError:
+            if not self._abandon(ticket):
+                self._timed_out(ticket)
+        except asyncio.CancelledError:
+            # Client went away while queued
+            if self._abandon(ticket):
+                self.release(ticket)
+            raise
+        return ticket
+
+    @contextmanager
+    def slot(self, priority: str, user_id: Optional[object] = None):
+        """Hold a slot for the duration of the with-block (threads)"""
+        if not self.enabled:
+            yield None
+            return
+        ticket = self.acquire(priority, user_id)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    @asynccontextmanager
+    async def admit(self, priority: str, user_id: Optional[object] = None):
+        """Hold a slot for the duration of the async with-block"""
+        if not self.enabled:
+            yield None
+            return
+        ticket = await self.acquire_async(priority, user_id)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def yield_to_interactive(self):
+        """Pause (up to yield_seconds) while interactive requests are running or waiting"""
+        if not self.enabled:
+            return
+        started = time.perf_counter()
+        with self._condition:
+            busy = lambda: self._active_by_class[INTERACTIVE] > 0 or self._queues[INTERACTIVE]
+            if not busy():
+                return
+            self._condition.wait_for(lambda: not busy(), self.yield_seconds)
+        SCHEDULER_YIELD_SECONDS.observe(time.perf_counter() - started)
+
+
+scheduler = PriorityScheduler(
+    settings.SCHEDULER_MAX_CONCURRENT,
+    {
+        INTERACTIVE: PriorityClass(
+            settings.SCHEDULER_MAX_CONCURRENT,
+            settings.SCHEDULER_INTERACTIVE_PER_USER,
+            settings.SCHEDULER_INTERACTIVE_QUEUE,
+            settings.SCHEDULER_QUEUE_TIMEOUT
+        ),
+        ON_DEMAND: PriorityClass(
+            settings.SCHEDULER_ON_DEMAND_MAX,
+            settings.SCHEDULER_ON_DEMAND_PER_USER,
+            settings.SCHEDULER_ON_DEMAND_QUEUE,
+            settings.SCHEDULER_QUEUE_TIMEOUT
+        ),
+        BACKGROUND: PriorityClass(
+            settings.SCHEDULER_BACKGROUND_MAX,
+            settings.SCHEDULER_BACKGROUND_PER_USER,
+            settings.SCHEDULER_BACKGROUND_QUEUE,
+            settings.SCHEDULER_BACKGROUND_QUEUE_TIMEOUT
+        ),
+    },
+    yield_seconds=settings.SCHEDULER_YIELD_MS / 1000,
+    enabled=settings.SCHEDULER_ENABLED
+)
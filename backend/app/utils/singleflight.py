@@ -0,0 +1,58 @@
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, Hashable
+from app.utils.metrics import metrics
+
+
+COALESCED_CALLS = metrics.counter(
+    "singleflight_calls_total", "Calls that ran the work (leader) or joined one in flight (follower)",
+    ("group", "role")
+)
+
+
+def normalize_text(text: str) -> str:
+    """Case- and whitespace-insensitive form of a question, ignoring trailing punctuation"""
+    return " ".join(text.lower().split()).rstrip("?!. ")
+
+
+def fingerprint(*parts: Any) -> str:
+    """Short stable hash of arbitrary (possibly long) inputs, for use in keys"""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(repr(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class SingleFlight:
+    """
+    Deduplicate identical concurrent work within one event loop
+
+    The first caller for a key starts the work as its own task; callers that
+    arrive with the same key while it is running await the same task instead
+    of repeating it. Results (and exceptions) are shared, nothing is kept
+    after the work finishes, and a caller that disconnects does not cancel
+    the work for the others.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+
+    async def run(self, group: str, key: Hashable, work: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the result of work(), shared with concurrent callers using the same key"""
+        full_key = (group, key)
+        task = self._in_flight.get(full_key)
+        if task is None:
+            COALESCED_CALLS.inc(group=group, role="leader")
+            task = asyncio.ensure_future(work())
+            self._in_flight[full_key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(full_key, None))
+        else:
+            COALESCED_CALLS.inc(group=group, role="follower")
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+
+single_flight = SingleFlight()
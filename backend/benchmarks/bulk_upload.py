@@ -0,0 +1,99 @@
+"""
+Bulk upload benchmark: one request per file vs one ZIP to /api/upload/bulk
+
+Builds a "semester" of slide decks, notes and PDFs, uploads them one by one
+through /api/upload and then as a single ZIP through /api/upload/bulk, and
+reports wall time and files per second for each. Fails if an extraction
+worker has imported the embedding service or the API routes.
+
+Run from the backend folder:
+    python -m benchmarks.bulk_upload --files 24 --pages 10
+"""
+
+import argparse
+import os
+import sys
+import time
+import zipfile
+
+# Must never be imported by extraction pool processes
+HEAVY_MODULES = ("app.services.embedding_service", "app.api.routes", "sentence_transformers", "torch", "chromadb")
+
+
+def loaded_modules(names) -> list:
+    """Which of names this process has imported (run inside a pool worker)"""
+    return [name for name in names if name in sys.modules]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare sequential uploads with one bulk ZIP upload")
+    parser.add_argument("--files", type=int, default=24)
+    parser.add_argument("--pages", type=int, default=10, help="Pages (or slides) per file")
+    parser.add_argument("--fake-embeddings", action="store_true")
+    args = parser.parse_args()
+
+    from benchmarks import fakes
+    workdir = fakes.use_temp_data("campus_bulk_")
+    from benchmarks.fixtures import write_docx, write_pdf, write_pptx
+    fakes.install(fake_embeddings=args.fake_embeddings)
+    if args.fake_embeddings:
+        fakes.use_offline_tokenizer()
+    from fastapi.testclient import TestClient
+    from main import app
+    from app.config import settings
+
+    fixtures_dir = os.path.join(workdir, "semester")
+    os.makedirs(fixtures_dir)
+    writers = [("pdf", write_pdf), ("docx", write_docx), ("pptx", write_pptx)]
+    paths = []
+    for i in range(args.files):
+        extension, writer = writers[i % len(writers)]
+        paths.append(writer(os.path.join(fixtures_dir, f"week{i + 1:02d}.{extension}"), args.pages))
+    archive_path = os.path.join(workdir, "semester.zip")
+    with zipfile.ZipFile(archive_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for path in paths:
+            archive.write(path, f"semester/{os.path.basename(path)}")
+
+    with TestClient(app) as client:
+        client.post("/api/register", json={"username": "teacher", "password": "benchmark"})
+        login = client.post("/api/login", json={"username": "teacher", "password": "benchmark"})
+        headers = {"Authorization": f"Bearer {login.json()['session_token']}"}
+
+        # Warm up the model and the extraction pool so neither run pays start-up costs
+        with open(paths[0], "rb") as f:
+            client.post("/api/upload", headers=headers, files={"file": (os.path.basename(paths[0]), f)})
+        with open(paths[0], "rb") as f:
+            client.post("/api/upload/bulk", headers=headers, files=[("files", (os.path.basename(paths[0]), f))])
+
+        started = time.perf_counter()
+        sequential_ok = 0
+        for path in paths:
+            with open(path, "rb") as f:
+                response = client.post("/api/upload", headers=headers, files={"file": (os.path.basename(path), f)})
+            sequential_ok += response.status_code == 200
+        sequential_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        with open(archive_path, "rb") as f:
+            response = client.post("/api/upload/bulk", headers=headers, files=[("files", ("semester.zip", f))])
+        bulk_s = time.perf_counter() - started
+        results = response.json().get("results", [])
+        bulk_ok = sum(1 for result in results if result["status"] == "ok")
+
+        from app.services.bulk_upload import bulk_upload_service
+        leaked = []
+        if settings.BULK_EXTRACT_WORKERS > 0:
+            leaked = bulk_upload_service.pool.submit(loaded_modules, HEAVY_MODULES).result()
+
+    print(f"files={args.files} pages/file={args.pages} extract workers={settings.BULK_EXTRACT_WORKERS}")
+    print(f"sequential /api/upload: {sequential_s:.2f}s ({args.files / sequential_s:.1f} files/s), {sequential_ok} ok")
+    print(f"bulk ZIP upload:        {bulk_s:.2f}s ({args.files / bulk_s:.1f} files/s), {bulk_ok} ok")
+    print(f"speed-up: {sequential_s / bulk_s:.1f}x")
+    if leaked:
+        print(f"FAIL: extraction workers imported {', '.join(leaked)}")
+        return 1
+    return 0 if bulk_ok == args.files else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Multi-turn conversations: stateless /api/query vs chat sessions
+
+Indexes a few synthetic textbooks and has students hold conversations of
+several turns about one of them, mixing new questions from the book with
+content-free follow-ups ("Can you explain that in more detail?"). Each
+conversation is asked three ways: stateless with only the question,
+stateless with the client prepending the earlier turns to the question
+(what a client has to do today to keep context), and in a chat session.
+The fake model answers with --answer-words words of text, so earlier turns
+weigh in the prompt like real answers do. Reports vector searches, chunks
+fetched and answer-prompt tokens per turn, query latency, and how often the
+answer cited the book the conversation is about.
+
+Run from the backend folder:
+    python -m benchmarks.chat_sessions --conversations 20 --turns 6 --fake-embeddings
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+from benchmarks.suite import summarize_latencies
+
+FOLLOW_UPS = [
+    "Can you explain that in more detail?",
+    "Why is that the case?",
+    "Give me an example of it.",
+    "How does this relate to what you said before?",
+]
+
+
+def make_conversations(books: dict, count: int, turns: int, seed: int = 3) -> list:
+    """(book, questions) pairs: a question from the book, then follow-ups and nearby questions"""
+    rng = random.Random(seed)
+    names = sorted(books)
+    conversations = []
+    for _ in range(count):
+        name = rng.choice(names)
+        sentences = [s for s in books[name].replace("\n", " ").split(". ") if len(s) > 40]
+        start = rng.randrange(len(sentences) - turns)
+        questions = [sentences[start][:120]]
+        for turn in range(1, turns):
+            questions.append(rng.choice(FOLLOW_UPS) if turn % 2 else sentences[start + turn][:120])
+        conversations.append((name, questions))
+    return conversations
+
+
+async def converse(client, headers: dict, book: str, questions: list, mode: str) -> dict:
+    chat_id = None
+    if mode == "chat":
+        chat_id = (await client.post("/api/chats", headers=headers)).json()["chat_id"]
+    latencies, cited = [], 0
+    history = []
+    for question in questions:
+        asked = question
+        if mode == "client history" and history:
+            asked = "\n".join(history) + "\n" + question
+        body = {"question": asked, "use_wikipedia": False}
+        if chat_id:
+            body["chat_id"] = chat_id
+        started = time.perf_counter()
+        response = await client.post("/api/query", headers=headers, json=body)
+        latencies.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+        result = response.json()
+        cited += any(source.startswith(book) for source in result["sources"])
+        history += [f"Student: {question}", f"Assistant: {result['answer']}"]
+    if chat_id:
+        await client.delete(f"/api/chats/{chat_id}", headers=headers)
+    return {"latencies": latencies, "cited": cited}
+
+
+async def run(args) -> int:
+    import httpx
+    from main import app
+    from app.models.database import init_auth_db
+    from app.services.chunker import text_chunker
+    from app.services.embedding_service import embedding_service, VECTOR_SEARCHES
+    from app.services.chat_sessions import CHAT_RETRIEVALS
+    from benchmarks import fakes
+    from benchmarks.fixtures import make_textbook
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+
+    # Record the size of every prompt the fake Groq model receives and answer at a realistic length
+    prompt_tokens = []
+    answer = " ".join(make_textbook(args.answer_words * 12, seed=99).split()[:args.answer_words])
+
+    def recording_generate(self, messages, *a, **kw):
+        prompt_tokens.append(text_chunker.count_tokens(messages[-1].content if messages else ""))
+        time.sleep(fakes.LATENCY_MS["llm"] / 1000)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=answer))])
+
+    fakes.FakeChatModel._generate = recording_generate
+
+    # Chunks returned by every vector search
+    fetched = []
+    search_vector = embedding_service.search_vector
+
+    def counting_search(vector, k, collection_name="course_materials"):
+        documents, embeddings = search_vector(vector, k, collection_name)
+        fetched.append(len(documents))
+        return documents, embeddings
+
+    embedding_service.search_vector = counting_search
+
+    init_auth_db()
+    books = {f"course-{i}.pdf": make_textbook(40000, seed=20 + i) for i in range(args.books)}
+    for name, text in books.items():
+        embedding_service.add_document_to_vectordb(text, name)
+    conversations = make_conversations(books, args.conversations, args.turns)
+
+    searches = lambda: sum(VECTOR_SEARCHES.value(backend=backend) for backend in ("local", "chroma"))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=600) as client:
+        await client.post("/api/register", json={"username": "talker", "password": "sessions"})
+        login = await client.post("/api/login", json={"username": "talker", "password": "sessions"})
+        headers = {"Authorization": f"Bearer {login.json()['session_token']}"}
+
+        turns = args.conversations * args.turns
+        print(f"conversations={args.conversations} turns={args.turns} books={args.books}")
+        print(f"{'mode':<16} {'searches/turn':>13} {'chunks/turn':>11} {'prompt tok':>10} "
+              f"{'p50 ms':>8} {'p99 ms':>8} {'cites book':>10}")
+        for mode in ("stateless", "client history", "chat"):
+            searches_before, fetched_before, prompts_before = searches(), len(fetched), len(prompt_tokens)
+            latencies, cited = [], 0
+            for book, questions in conversations:
+                result = await converse(client, headers, book, questions, mode)
+                latencies += result["latencies"]
+                cited += result["cited"]
+            prompts = prompt_tokens[prompts_before:]
+            latency = summarize_latencies(latencies)
+            print(f"{mode:<16} {(searches() - searches_before) / turns:>13.2f} "
+                  f"{sum(fetched[fetched_before:]) / turns:>11.1f} "
+                  f"{sum(prompts) / max(len(prompts), 1):>10.0f} {latency['p50_ms']:>8} {latency['p99_ms']:>8} "
+                  f"{cited / turns:>10.0%}")
+    modes = ", ".join(
+        f"{mode} {int(CHAT_RETRIEVALS.value(mode=mode))}" for mode in ("full", "extended", "reused")
+    )
+    print(f"chat retrievals: {modes}")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare stateless queries with chat sessions")
+    parser.add_argument("--conversations", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--books", type=int, default=4)
+    parser.add_argument("--answer-words", type=int, default=150, help="Length of each fake answer")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--fake-embeddings", action="store_true")
+    args = parser.parse_args()
+
+    from benchmarks import fakes
+    fakes.use_temp_data("campus_chat_")
+    fakes.install(fake_embeddings=args.fake_embeddings, llm_latency_ms=args.llm_latency_ms)
+    if args.fake_embeddings:
+        fakes.use_offline_tokenizer()
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Chunking throughput benchmark
+
+Compares the token-aware TextChunker with the two chunkers it replaced
+(the character loop formerly in DocumentProcessor.chunk_text and LangChain's
+RecursiveCharacterTextSplitter) on synthetic textbook-scale input.
+
+Run from the backend folder:
+    python -m benchmarks.chunking --chars 2000000 --repeat 3
+"""
+
+import argparse
+import time
+from typing import Callable, List
+
+from app.services.chunker import text_chunker
+from benchmarks.fixtures import make_textbook
+
+# all-MiniLM-L6-v2 truncates at 256 tokens including [CLS] and [SEP]
+MODEL_TOKEN_LIMIT = 256 - 2
+
+
+def legacy_char_chunker(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
+    """The character loop previously in DocumentProcessor.chunk_text"""
+    chunks = []
+    start = 0
+    text_length = len(text)
+    while start < text_length:
+        end = start + chunk_size
+        if end < text_length:
+            sentence_end = max(
+                text.rfind('. ', start, end),
+                text.rfind('! ', start, end),
+                text.rfind('? ', start, end)
+            )
+            if sentence_end != -1 and sentence_end > start + chunk_size // 2:
+                end = sentence_end + 1
+            else:
+                space_pos = text.rfind(' ', start, end)
+                if space_pos != -1 and space_pos > start + chunk_size // 2:
+                    end = space_pos
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        start = end - overlap if end < text_length else text_length
+    return chunks
+
+
+def langchain_splitter() -> Callable[[str], List[str]]:
+    """The RecursiveCharacterTextSplitter previously in EmbeddingService"""
+    try:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+    except ImportError:
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=200,
+        separators=["\n\n", "\n", " ", ""]
+    )
+    return splitter.split_text
+
+
+def run_chunker(name: str, chunker: Callable[[str], List[str]], text: str, repeat: int) -> dict:
+    """Time a chunker and check its chunks against the model token limit"""
+    best = float("inf")
+    chunks = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        chunks = chunker(text)
+        best = min(best, time.perf_counter() - started)
+
+    token_counts = [len(text_chunker.token_offsets(chunk)) for chunk in chunks]
+    over_limit = sum(1 for count in token_counts if count > MODEL_TOKEN_LIMIT)
+    return {
+        "chunker": name,
+        "seconds": round(best, 4),
+        "mb_per_second": round(len(text) / best / 1e6, 2),
+        "chunks": len(chunks),
+        "max_tokens": max(token_counts, default=0),
+        "truncated_chunks": over_limit,
+        "truncated_percent": round(100 * over_limit / max(len(chunks), 1), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark document chunkers")
+    parser.add_argument("--chars", type=int, default=2_000_000, help="Size of synthetic textbook")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per chunker (best is reported)")
+    args = parser.parse_args()
+
+    text = make_textbook(args.chars)
+    # Load the tokenizer outside the timed region
+    text_chunker.count_tokens("warm up")
+
+    results = [
+        run_chunker("token-aware (TextChunker)", text_chunker.split, text, args.repeat),
+        run_chunker("legacy character loop", legacy_char_chunker, text, args.repeat),
+        run_chunker("RecursiveCharacterTextSplitter", langchain_splitter(), text, args.repeat),
+    ]
+
+    print(f"Input: {len(text):,} characters")
+    print(f"{'chunker':<34}{'seconds':>9}{'MB/s':>8}{'chunks':>8}{'max tok':>9}{'truncated':>11}")
+    for r in results:
+        print(
+            f"{r['chunker']:<34}{r['seconds']:>9}{r['mb_per_second']:>8}{r['chunks']:>8}"
+            f"{r['max_tokens']:>9}{r['truncated_percent']:>10}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
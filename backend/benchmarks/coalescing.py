@@ -0,0 +1,86 @@
+"""
+Single-flight coalescing benchmark
+
+Sends a burst of identical /api/summarize and /api/query requests (a class
+of students told to do the same thing at once) to the in-process app with
+fake Groq latency, and reports how many LLM and vector-search calls actually
+ran and the latency each student saw.
+
+Run from the backend folder:
+    python -m benchmarks.coalescing --students 200 --llm-latency-ms 1500 --fake-embeddings
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.suite import summarize_latencies
+
+
+async def burst(client, students: int, method: str, url: str, headers: dict, **kwargs) -> dict:
+    async def one():
+        started = time.perf_counter()
+        response = await client.request(method, url, headers=headers, **kwargs)
+        return (time.perf_counter() - started) * 1000, response.status_code
+
+    results = await asyncio.gather(*(one() for _ in range(students)))
+    errors = sum(1 for _, status in results if status != 200)
+    return summarize_latencies([latency for latency, _ in results], errors)
+
+
+async def run(args) -> int:
+    import httpx
+    from main import app
+    from app.models.database import init_auth_db
+    from app.utils.metrics import LLM_REQUESTS, VECTOR_SECONDS
+    from app.utils.singleflight import COALESCED_CALLS
+    from benchmarks.fixtures import write_pdf
+
+    init_auth_db()
+    fixture = write_pdf(os.path.join(tempfile.mkdtemp(), "chapter.pdf"), args.pages)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=600) as client:
+        await client.post("/api/register", json={"username": "teacher", "password": "coalesce"})
+        login = await client.post("/api/login", json={"username": "teacher", "password": "coalesce"})
+        headers = {"Authorization": f"Bearer {login.json()['session_token']}"}
+        with open(fixture, "rb") as f:
+            upload = await client.post("/api/upload", headers=headers, files={"file": ("chapter.pdf", f)})
+        document_id = upload.json()["document_id"]
+
+        for label, method, url, body in (
+            ("summarize", "POST", "/api/summarize", {"document_id": document_id}),
+            ("query", "POST", "/api/query", {"question": "What does chlorophyll absorb?", "use_wikipedia": True}),
+        ):
+            llm_before = sum(LLM_REQUESTS.value(operation=op, status="ok") for op in ("answer", "summary"))
+            search_before = VECTOR_SECONDS.count(operation="search")
+            latency = await burst(client, args.students, method, url, headers, json=body)
+            llm_calls = sum(LLM_REQUESTS.value(operation=op, status="ok") for op in ("answer", "summary")) - llm_before
+            searches = VECTOR_SECONDS.count(operation="search") - search_before
+            print(f"{label}: {args.students} students -> {int(llm_calls)} LLM call(s), {searches} vector search(es), "
+                  f"p50 {latency['p50_ms']} ms, p99 {latency['p99_ms']} ms, errors {latency['errors']}")
+        followers = sum(COALESCED_CALLS.value(group=g, role="follower") for g in ("query", "summarize"))
+        print(f"requests served by joining in-flight work: {int(followers)}")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Burst identical requests to measure coalescing")
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--llm-latency-ms", type=float, default=1500.0)
+    parser.add_argument("--fake-embeddings", action="store_true")
+    args = parser.parse_args()
+
+    from benchmarks import fakes
+    fakes.use_temp_data("campus_coalesce_")
+    fakes.install(fake_embeddings=args.fake_embeddings, llm_latency_ms=args.llm_latency_ms)
+    if args.fake_embeddings:
+        fakes.use_offline_tokenizer()
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Answer context size: verbatim top-k chunks vs the token-budgeted context builder
+
+Indexes a few synthetic textbooks (one long, several short, like a real
+course), asks questions drawn from their sentences and reports the context
+size the answer prompt would carry before (top-5 chunks joined verbatim plus
+the full Wikipedia text) and after packing, the number of distinct sources
+used, and checks that every stitched passage is verbatim document text.
+
+Run from the backend folder:
+    python -m benchmarks.context --questions 50 --budget 1200
+"""
+
+import argparse
+import os
+import random
+import sys
+
+WIKIPEDIA_TEXT = (
+    "Photosynthesis is a biological process used by many cellular organisms to convert light "
+    "energy into chemical energy, which is stored in organic compounds that can later be "
+    "metabolized through cellular respiration to fuel the organism's activities. "
+) * 6
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare answer context size before and after packing")
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--budget", type=int, default=None, help="CONTEXT_MAX_TOKENS override")
+    parser.add_argument("--fake-embeddings", action="store_true")
+    args = parser.parse_args()
+
+    from benchmarks import fakes
+    fakes.use_temp_data("campus_context_")
+    if args.budget:
+        os.environ["CONTEXT_MAX_TOKENS"] = str(args.budget)
+
+    from benchmarks.fixtures import make_textbook
+    fakes.install(fake_embeddings=args.fake_embeddings)
+    if args.fake_embeddings:
+        fakes.use_offline_tokenizer()
+    from app.services.embedding_service import embedding_service
+    from app.config import settings
+    from app.services.context_builder import ContextBuilder, context_builder
+    # Same top-5 chunks, overlap removed but nothing dropped: how much of the old prompt was duplicated
+    dedupe_only = ContextBuilder(max_tokens=10 ** 6)
+
+    books = {"textbook.pdf": make_textbook(60000, seed=1)}
+    books.update({f"handout-{i}.docx": make_textbook(6000, seed=10 + i) for i in range(4)})
+    for name, text in books.items():
+        embedding_service.add_document_to_vectordb(text, name, collection_name="benchmark_context")
+
+    rng = random.Random(7)
+    sentences = [s for text in books.values() for s in text.replace("\n", " ").split(". ") if len(s) > 40]
+    before, top5, deduped, after, sources_before, sources_after, chunks_after = [], [], [], [], [], [], []
+    verbatim = True
+    for i in range(args.questions):
+        question = rng.choice(sentences)[:120]
+        wikipedia = WIKIPEDIA_TEXT if i % 2 else None
+        vector, documents, embeddings = embedding_service.search_candidates(
+            question, settings.CONTEXT_FETCH_K, "benchmark_context"
+        )
+        top = dedupe_only.build(vector, documents[:dedupe_only.baseline_k], embeddings[:dedupe_only.baseline_k])
+        deduped.append(top.tokens_after)
+        packed = context_builder.build(vector, documents, embeddings, wikipedia)
+        before.append(packed.tokens_before)
+        top5.append(top.tokens_before)
+        after.append(packed.tokens_after)
+        sources_before.append(len({d.metadata["source"] for d in documents[:context_builder.baseline_k]}))
+        sources_after.append(len(packed.sources))
+        chunks_after.append(packed.chunks_used)
+        for passage in packed.documents.split("\n\n"):
+            if not any(passage in text for text in books.values()):
+                verbatim = False
+
+    mean = lambda values: sum(values) / len(values)
+    print(f"questions={args.questions} budget={context_builder.max_tokens} tokens "
+          f"(wikipedia cap {context_builder.wikipedia_max_tokens}), half the questions include Wikipedia text")
+    print(f"context tokens  before: mean {mean(before):.0f}, max {max(before)}")
+    print(f"top-5 chunks alone: {sum(deduped)} tokens after removing overlap, "
+          f"{100 * (1 - sum(deduped) / sum(top5)):.0f}% of them were duplicated")
+    print(f"context tokens  after:  mean {mean(after):.0f}, max {max(after)} "
+          f"({100 * (1 - sum(after) / sum(before)):.0f}% smaller)")
+    print(f"chunks in context before: {context_builder.baseline_k}, after: {mean(chunks_after):.1f} (of {settings.CONTEXT_FETCH_K} candidates)")
+    print(f"distinct sources before: {mean(sources_before):.2f}, after: {mean(sources_after):.2f}")
+    print(f"passages are verbatim document text: {'yes' if verbatim else 'NO'}")
+    return 0 if verbatim else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+In-process embeddings vs the shared embedding server
+
+Starts N worker processes that each build the app's EmbeddingService, once
+with the model loaded in every worker and once pointed at a single shared
+embedding server, then compares resident memory (per worker and in total,
+server included) and query/document embedding throughput.
+
+Run from the backend folder:
+    python -m benchmarks.embedding_server --workers 4 --queries 200
+"""
+
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fakes import data_env
+from benchmarks.fixtures import make_paragraphs
+from benchmarks.suite import summarize_latencies
+
+QUESTIONS = [
+    "What does chlorophyll absorb?",
+    "Explain the light-dependent reactions",
+    "Where does the Calvin cycle take place?",
+    "How do enzymes lower activation energy?",
+]
+
+
+def worker(env: dict, fake: bool, queries: int, documents: list, barrier, results):
+    """One app worker: build EmbeddingService, then embed queries and a document batch"""
+    os.environ.update(env)
+    if fake:
+        from benchmarks import fakes
+        fakes.install(fake_embeddings=True)
+    from app.services.embedding_server import resident_memory_mb
+    from app.services.embedding_service import embedding_service
+
+    embedding_service.embed_query("warm up")
+    barrier.wait()
+    latencies = []
+    started = time.perf_counter()
+    for i in range(queries):
+        call_started = time.perf_counter()
+        embedding_service.embed_query(QUESTIONS[i % len(QUESTIONS)])
+        latencies.append((time.perf_counter() - call_started) * 1000)
+    query_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    embedding_service.embed_documents(documents)
+    document_seconds = time.perf_counter() - started
+    results.put({
+        "rss_mb": resident_memory_mb(),
+        "latencies": latencies,
+        "query_seconds": query_seconds,
+        "document_seconds": document_seconds
+    })
+
+
+def serve(socket_path: str, fake: bool):
+    """Entry point for the server subprocess (so --fake-embeddings applies to it too)"""
+    if fake:
+        from benchmarks import fakes
+        fakes.install(fake_embeddings=True)
+    from app.services import embedding_server
+    sys.argv = [sys.argv[0], "--socket", socket_path]
+    return embedding_server.main()
+
+
+def run_mode(label: str, env: dict, args, documents: list) -> dict:
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(args.workers)
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(env, args.fake_embeddings, args.queries, documents, barrier, results))
+        for _ in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    wall = max(o["query_seconds"] for o in outcomes)
+    document_wall = max(o["document_seconds"] for o in outcomes)
+    return {
+        "mode": label,
+        "worker_rss_mb": [round(o["rss_mb"], 1) for o in outcomes],
+        "queries_per_s": round(args.workers * args.queries / wall, 1),
+        "chunks_per_s": round(args.workers * len(documents) / document_wall, 1),
+        "query_latency": summarize_latencies([l for o in outcomes for l in o["latencies"]])
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare per-worker embedding models with the shared server")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200, help="Queries embedded by each worker")
+    parser.add_argument("--chunks", type=int, default=64, help="Document chunks embedded by each worker")
+    parser.add_argument("--fake-embeddings", action="store_true")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="campus_embed_")
+    socket_path = os.path.join(workdir, "embeddings.sock")
+    base_env = data_env(workdir)
+    documents = make_paragraphs(args.chunks)
+
+    reports = [run_mode("in-process", dict(base_env, EMBEDDING_SERVER_SOCKET=""), args, documents)]
+
+    server = subprocess.Popen(
+        [sys.executable, "-c",
+         f"from benchmarks.embedding_server import serve; serve({socket_path!r}, {args.fake_embeddings!r})"],
+        env=dict(os.environ, **base_env)
+    )
+    try:
+        from app.services.embedding_server import RemoteEmbeddings, server_is_up
+        deadline = time.monotonic() + 300
+        while not server_is_up(socket_path):
+            if server.poll() is not None or time.monotonic() > deadline:
+                print("embedding server failed to start")
+                return 1
+            time.sleep(0.1)
+        shared = run_mode("shared server", dict(base_env, EMBEDDING_SERVER_SOCKET=socket_path), args, documents)
+        stats = RemoteEmbeddings(socket_path).stats()
+        shared["server_rss_mb"] = stats["rss_mb"]
+        reports.append(shared)
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"workers={args.workers} queries/worker={args.queries} chunks/worker={args.chunks}")
+    print(f"{'mode':<14} {'worker RSS MiB':>16} {'total MiB':>10} {'queries/s':>10} {'chunks/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for report in reports:
+        workers_total = sum(report["worker_rss_mb"])
+        total = workers_total + report.get("server_rss_mb", 0)
+        mean = workers_total / len(report["worker_rss_mb"])
+        print(f"{report['mode']:<14} {mean:>16.0f} {total:>10.0f} {report['queries_per_s']:>10} "
+              f"{report['chunks_per_s']:>9} {report['query_latency']['p50_ms']:>8} {report['query_latency']['p99_ms']:>8}")
+    if "server_rss_mb" in reports[-1]:
+        print(f"(shared total includes the server process: {reports[-1]['server_rss_mb']:.0f} MiB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+Local stand-ins for the network services used by the app
+
+install() must run before any app module is imported: the services create
+their ChatGroq / HuggingFaceEmbeddings clients at import time.
+"""
+
+import hashlib
+import math
+import os
+import re
+import sys
+import tempfile
+import time
+import types
+from typing import Any, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from benchmarks.standins import fake_completion
+
+
+# Simulated service latency, set by install()
+LATENCY_MS = {"llm": 0.0, "wikipedia": 0.0}
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that returns canned text after a fixed delay, accepting ChatGroq's arguments"""
+
+    api_key: Optional[str] = None
+    base_url: Optional[str] = None
+    model_name: str = "fake-groq"
+    temperature: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-groq"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        if LATENCY_MS["llm"]:
+            time.sleep(LATENCY_MS["llm"] / 1000)
+        prompt = messages[-1].content if messages else ""
+        text = fake_completion(prompt)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic bag-of-words embeddings, a fast offline replacement for MiniLM"""
+
+    def __init__(self, model_name: str = "hash", dimensions: int = 384, **kwargs: Any):
+        self.model_name = model_name
+        self.dimensions = dimensions
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.md5(word.encode()).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class RegexTokenizer:
+    """Word-piece-like tokenizer standing in for the MiniLM fast tokenizer when offline"""
+
+    _pattern = re.compile(r"\w{1,6}|[^\w\s]")
+
+    def __call__(self, text: str, **kwargs: Any) -> dict:
+        return {"offset_mapping": [(m.start(), m.end()) for m in self._pattern.finditer(text)]}
+
+
+class _WikipediaException(Exception):
+    pass
+
+
+class _DisambiguationError(_WikipediaException):
+    def __init__(self, title: str = "", options: Optional[List[str]] = None):
+        super().__init__(title)
+        self.title = title
+        self.options = options or []
+
+
+class _PageError(_WikipediaException):
+    pass
+
+
+def make_wikipedia_stub() -> types.ModuleType:
+    """Module exposing the parts of the `wikipedia` package the app uses"""
+    module = types.ModuleType("wikipedia")
+    exceptions = types.ModuleType("wikipedia.exceptions")
+    exceptions.WikipediaException = _WikipediaException
+    exceptions.DisambiguationError = _DisambiguationError
+    exceptions.PageError = _PageError
+
+    def search(query, results=10, suggestion=False):
+        if LATENCY_MS["wikipedia"]:
+            time.sleep(LATENCY_MS["wikipedia"] / 1000)
+        return [query.title()][:results]
+
+    def summary(title, sentences=0, **kwargs):
+        if LATENCY_MS["wikipedia"]:
+            time.sleep(LATENCY_MS["wikipedia"] / 1000)
+        text = f"{title} is a topic covered in the school curriculum. " * max(sentences, 1)
+        return text.strip()
+
+    module.search = search
+    module.summary = summary
+    module.exceptions = exceptions
+    module.DisambiguationError = _DisambiguationError
+    module.PageError = _PageError
+    return module
+
+
+def data_env(workdir: str) -> Dict[str, str]:
+    """Settings that put the app's database, vector stores and uploads under workdir"""
+    return {
+        "DATABASE_PATH": os.path.join(workdir, "campus_assistant.db"),
+        "CHROMA_DB_PATH": os.path.join(workdir, "chroma_db"),
+        "LOCAL_VECTOR_PATH": os.path.join(workdir, "local_vectors"),
+        "UPLOADS_PATH": os.path.join(workdir, "uploads"),
+    }
+
+
+def use_temp_data(prefix: str) -> str:
+    """Point this process's app data at a fresh temporary folder (call before importing app)"""
+    workdir = tempfile.mkdtemp(prefix=prefix)
+    os.environ.update(data_env(workdir))
+    return workdir
+
+
+def install(fake_embeddings: bool = False, llm_latency_ms: float = 0.0, wiki_latency_ms: float = 0.0):
+    """Swap Groq, Wikipedia (and optionally MiniLM) for local fakes; call before importing app"""
+    os.environ.setdefault("GROQ_API_KEY", "offline-benchmark")
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+    LATENCY_MS["llm"] = llm_latency_ms
+    LATENCY_MS["wikipedia"] = wiki_latency_ms
+
+    wikipedia_stub = make_wikipedia_stub()
+    sys.modules["wikipedia"] = wikipedia_stub
+    sys.modules["wikipedia.exceptions"] = wikipedia_stub.exceptions
+
+    import langchain_groq
+    langchain_groq.ChatGroq = FakeChatModel
+
+    if fake_embeddings:
+        import langchain_huggingface
+        langchain_huggingface.HuggingFaceEmbeddings = HashEmbeddings
+
+
+def use_offline_tokenizer():
+    """Point the shared chunker at RegexTokenizer (for machines without the MiniLM tokenizer cached)"""
+    from app.services.chunker import text_chunker
+    text_chunker._tokenizer = RegexTokenizer()
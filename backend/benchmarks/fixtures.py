@@ -0,0 +1,142 @@
+"""
+Synthetic PDF, DOCX and PPTX fixtures of configurable size
+"""
+
+import os
+import random
+from typing import List
+
+WORDS = (
+    "photosynthesis chlorophyll energy light plant cell membrane nucleus "
+    "electron current voltage resistance circuit force motion velocity "
+    "acceleration mass gravity equation reaction acid base salt element "
+    "compound mixture solution history empire trade revolution constitution "
+    "democracy economy market demand supply population river climate soil"
+).split()
+
+
+def _paragraph(rng: random.Random) -> str:
+    sentences = []
+    for _ in range(rng.randint(3, 8)):
+        words = rng.choices(WORDS, k=rng.randint(8, 24))
+        sentences.append(" ".join(words).capitalize() + rng.choice([".", ".", ".", "?", "!"]))
+    return " ".join(sentences)
+
+
+def make_paragraphs(count: int, seed: int = 42) -> List[str]:
+    """Generate count paragraphs of 3-8 random sentences"""
+    rng = random.Random(seed)
+    return [_paragraph(rng) for _ in range(count)]
+
+
+def make_textbook(num_chars: int, seed: int = 42) -> str:
+    """Generate paragraphs of text until num_chars is reached"""
+    rng = random.Random(seed)
+    paragraphs = []
+    size = 0
+    while size < num_chars:
+        paragraph = _paragraph(rng)
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+
+def _wrap(text: str, width: int = 90) -> List[str]:
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + len(word) + 1 > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        lines.append(line)
+    return lines
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: int, paragraphs_per_page: int = 4, seed: int = 42) -> str:
+    """Write a plain-text PDF with one content stream per page (no third-party writer needed)"""
+    paragraphs = make_paragraphs(pages * paragraphs_per_page, seed)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once page object ids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    page_ids = []
+    for page in range(pages):
+        lines = []
+        for paragraph in paragraphs[page * paragraphs_per_page:(page + 1) * paragraphs_per_page]:
+            lines.extend(_wrap(paragraph))
+            lines.append("")
+        ops = ["BT", "/F1 10 Tf", "12 TL", "50 770 Td"]
+        ops.extend(f"({_pdf_escape(line)}) Tj T*" for line in lines[:60])
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+
+    with open(path, "wb") as f:
+        f.write(out)
+    return path
+
+
+def write_docx(path: str, pages: int, paragraphs_per_page: int = 4, seed: int = 42) -> str:
+    """Write a Word document with a heading per page-equivalent"""
+    from docx import Document
+
+    document = Document()
+    paragraphs = make_paragraphs(pages * paragraphs_per_page, seed)
+    for page in range(pages):
+        document.add_heading(f"Section {page + 1}", level=2)
+        for paragraph in paragraphs[page * paragraphs_per_page:(page + 1) * paragraphs_per_page]:
+            document.add_paragraph(paragraph)
+    document.save(path)
+    return path
+
+
+def write_pptx(path: str, slides: int, paragraphs_per_slide: int = 2, seed: int = 42) -> str:
+    """Write a slide deck with a title and body text on each slide"""
+    from pptx import Presentation
+
+    presentation = Presentation()
+    layout = presentation.slide_layouts[1]
+    paragraphs = make_paragraphs(slides * paragraphs_per_slide, seed)
+    for slide_number in range(slides):
+        slide = presentation.slides.add_slide(layout)
+        slide.shapes.title.text = f"Slide {slide_number + 1}"
+        body = paragraphs[slide_number * paragraphs_per_slide:(slide_number + 1) * paragraphs_per_slide]
+        slide.placeholders[1].text = "\n".join(body)
+    presentation.save(path)
+    return path
+
+
+def write_fixtures(folder: str, pages: int) -> dict:
+    """Write one fixture per supported format and return {file_type: path}"""
+    os.makedirs(folder, exist_ok=True)
+    return {
+        "pdf": write_pdf(os.path.join(folder, f"textbook_{pages}p.pdf"), pages),
+        "docx": write_docx(os.path.join(folder, f"notes_{pages}p.docx"), pages),
+        "pptx": write_pptx(os.path.join(folder, f"slides_{pages}s.pptx"), pages),
+    }
@@ -0,0 +1,180 @@
+"""
+HNSW parameter tuning: recall@k vs exact search, query latency and index memory
+
+Samples embeddings from a stored Chroma collection (or generates clustered
+synthetic ones), holds some out as queries, and for every combination of
+M, construction ef and search ef builds a scratch collection, measuring
+recall@k against exact (brute-force) top-k, per-query latency, build time
+and the HNSW index size. Search ef is changed in place on one build, like
+HNSW_SEARCH_EF does for an existing collection.
+
+Run from the backend folder:
+    python -m benchmarks.hnsw_tuning --collection course_materials --sample 20000
+    python -m benchmarks.hnsw_tuning --synthetic 50000 --m 8 16 32 --search-ef 16 32 64 128
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.suite import summarize_latencies
+
+
+def load_stored(collection_name: str, sample: int) -> np.ndarray:
+    """Up to sample embeddings from the app's Chroma collection"""
+    import chromadb
+    from app.config import settings
+    client = chromadb.PersistentClient(path=settings.CHROMA_DB_PATH)
+    collection = client.get_collection(collection_name)
+    vectors = []
+    offset = 0
+    while len(vectors) < sample:
+        batch = collection.get(include=["embeddings"], limit=min(5000, sample - len(vectors)), offset=offset)
+        if not len(batch["embeddings"]):
+            break
+        vectors.extend(batch["embeddings"])
+        offset += len(batch["embeddings"])
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def make_synthetic(count: int, dimensions: int = 384, clusters: int = 200, seed: int = 0) -> np.ndarray:
+    """Clustered vectors, closer to real chunk embeddings than uniform noise"""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dimensions)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=count)
+    vectors = centres[labels] + 0.6 * rng.normal(size=(count, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top_k(index_vectors: np.ndarray, queries: np.ndarray, k: int, space: str) -> np.ndarray:
+    """Brute-force neighbour ids under the same distance Chroma uses"""
+    if space == "cosine":
+        normed = index_vectors / (np.linalg.norm(index_vectors, axis=1, keepdims=True) + 1e-12)
+        scores = (queries / (np.linalg.norm(queries, axis=1, keepdims=True) + 1e-12)) @ normed.T
+    elif space == "ip":
+        scores = queries @ index_vectors.T
+    else:
+        scores = -(
+            (queries ** 2).sum(axis=1, keepdims=True) - 2 * queries @ index_vectors.T
+            + (index_vectors ** 2).sum(axis=1)[None, :]
+        )
+    top = np.argpartition(-scores, k, axis=1)[:, :k]
+    return top
+
+
+def estimate_index_bytes(count: int, dimensions: int, m: int) -> int:
+    """hnswlib memory: level-0 links (2M) + vector + label per element, plus expected upper-level links"""
+    level0 = count * (2 * m * 4 + 4 + dimensions * 4 + 8)
+    upper = count * (m * 4 + 4) / max(m - 1, 1)
+    return int(level0 + upper)
+
+
+def directory_bytes(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            if name.endswith(".bin"):
+                total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def evaluate(args, index_vectors: np.ndarray, queries: np.ndarray, truth: np.ndarray) -> list:
+    import chromadb
+    workdir = tempfile.mkdtemp(prefix="campus_hnsw_")
+    client = chromadb.PersistentClient(path=workdir)
+    ids = [str(i) for i in range(len(index_vectors))]
+    rows = []
+    for m in args.m:
+        for construction_ef in args.construction_ef:
+            name = f"tune-m{m}-c{construction_ef}"
+            collection = client.create_collection(name, configuration={"hnsw": {
+                "space": args.space, "max_neighbors": m, "ef_construction": construction_ef,
+                "ef_search": max(args.search_ef), "sync_threshold": max(args.batch, 1000), "batch_size": args.batch
+            }})
+            started = time.perf_counter()
+            for start in range(0, len(index_vectors), args.batch):
+                collection.add(ids=ids[start:start + args.batch], embeddings=index_vectors[start:start + args.batch])
+            build_s = time.perf_counter() - started
+            disk = directory_bytes(workdir)
+
+            for search_ef in args.search_ef:
+                collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+                collection.query(query_embeddings=queries[:1], n_results=args.k)  # reload with the new ef
+                latencies, hits = [], 0
+                for query, expected in zip(queries, truth):
+                    started = time.perf_counter()
+                    result = collection.query(query_embeddings=[query], n_results=args.k, include=[])
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    hits += len({int(i) for i in result["ids"][0]} & set(expected.tolist()))
+                latency = summarize_latencies(latencies)
+                rows.append({
+                    "space": args.space,
+                    "m": m,
+                    "construction_ef": construction_ef,
+                    "search_ef": search_ef,
+                    "recall": round(hits / (len(queries) * args.k), 4),
+                    "p50_ms": latency["p50_ms"],
+                    "p99_ms": latency["p99_ms"],
+                    "build_s": round(build_s, 2),
+                    "index_mb_est": round(estimate_index_bytes(len(index_vectors), index_vectors.shape[1], m) / 2 ** 20, 1),
+                    "index_mb_disk": round(disk / 2 ** 20, 1),
+                })
+                row = rows[-1]
+                print(f"M={m:<3} cef={construction_ef:<4} sef={search_ef:<4} recall@{args.k}={row['recall']:.3f} "
+                      f"p50={row['p50_ms']}ms p99={row['p99_ms']}ms build={row['build_s']}s "
+                      f"index~{row['index_mb_est']}MiB (disk {row['index_mb_disk']}MiB)", flush=True)
+            client.delete_collection(name)
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure recall/latency/memory of HNSW settings")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--collection", default="course_materials", help="Sample embeddings from this collection")
+    source.add_argument("--synthetic", type=int, help="Use this many synthetic 384-d vectors instead")
+    parser.add_argument("--sample", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200, help="Held-out vectors used as queries")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--space", choices=["l2", "cosine", "ip"], default="l2")
+    parser.add_argument("--m", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=[100, 200])
+    parser.add_argument("--search-ef", type=int, nargs="+", default=[10, 20, 50, 100])
+    parser.add_argument("--batch", type=int, default=5000)
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--output", help="Write all rows as JSON")
+    args = parser.parse_args()
+
+    vectors = make_synthetic(args.synthetic) if args.synthetic else load_stored(args.collection, args.sample)
+    if len(vectors) <= args.queries + args.k:
+        print(f"Only {len(vectors)} vectors available; need more than {args.queries + args.k}")
+        return 1
+    rng = np.random.default_rng(1)
+    order = rng.permutation(len(vectors))
+    queries = vectors[order[:args.queries]]
+    index_vectors = vectors[order[args.queries:]]
+    truth = exact_top_k(index_vectors, queries, args.k, args.space)
+    print(f"{len(index_vectors)} indexed vectors, {len(queries)} queries, dim={vectors.shape[1]}, space={args.space}")
+
+    rows = evaluate(args, index_vectors, queries, truth)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
+
+    good = [row for row in rows if row["recall"] >= args.target_recall]
+    if good:
+        best = min(good, key=lambda row: (row["p99_ms"], row["index_mb_est"]))
+        print(f"\nFastest setting with recall@{args.k} >= {args.target_recall}: "
+              f"HNSW_SPACE={best['space']} HNSW_M={best['m']} HNSW_CONSTRUCTION_EF={best['construction_ef']} "
+              f"HNSW_SEARCH_EF={best['search_ef']} (recall {best['recall']}, p99 {best['p99_ms']} ms)")
+    else:
+        print(f"\nNo setting reached recall@{args.k} >= {args.target_recall}; try larger M or search ef")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
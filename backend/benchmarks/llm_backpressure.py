@@ -0,0 +1,76 @@
+"""
+LLMService backpressure check against the Groq stand-in with injected 429s
+
+Fires concurrent generate_answer calls from several users through the real
+LLMService (ChatGroq pointed at the local stand-in) and reports how many
+succeeded, were retried, or were shed as 503s, plus the peak number of calls
+the stand-in saw at once, which must not exceed LLM_MAX_CONCURRENCY.
+
+Run from the backend folder:
+    python -m benchmarks.llm_backpressure --calls 200 --users 20 --rate-limit-ratio 0.3
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.standins import GroqConfig, WikipediaConfig, start_standins
+from benchmarks.suite import summarize_latencies
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Exercise LLMService limits against a 429-injecting fake Groq")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=64, help="Concurrent callers")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.3)
+    parser.add_argument("--ttft-ms", type=float, default=200.0)
+    args = parser.parse_args()
+
+    groq_config = GroqConfig(args.ttft_ms, 500.0, rate_limit_ratio=args.rate_limit_ratio, retry_after_s=0.2)
+    groq_server, wiki_server, env = start_standins(groq_config, WikipediaConfig(0))
+    os.environ.update(env)
+
+    from app.config import settings
+    from app.services.llm_service import llm_service, LLM_RETRIES
+    from app.utils.concurrency import OverloadedError
+
+    outcomes = {"ok": 0, "overloaded": 0, "error": 0}
+    latencies = []
+
+    def call(i: int):
+        started = time.perf_counter()
+        try:
+            llm_service.generate_answer("What does chlorophyll absorb?", "Chlorophyll absorbs light.", user_id=i % args.users)
+            outcome = "ok"
+        except OverloadedError:
+            outcome = "overloaded"
+        except Exception:
+            outcome = "error"
+        return outcome, (time.perf_counter() - started) * 1000
+
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        for outcome, latency in pool.map(call, range(args.calls)):
+            outcomes[outcome] += 1
+            latencies.append(latency)
+
+    latency = summarize_latencies(latencies)
+    print(f"calls={args.calls} users={args.users} callers={args.threads} 429 ratio={args.rate_limit_ratio}")
+    print(f"limits: concurrency={settings.LLM_MAX_CONCURRENCY} per_user={settings.LLM_MAX_PER_USER} "
+          f"queue={settings.LLM_MAX_QUEUE} retries={settings.LLM_MAX_RETRIES}")
+    print(f"outcomes: {outcomes}")
+    print(f"retries: {int(LLM_RETRIES.value(operation='answer'))}, stand-in 429s: {groq_config.rate_limited}")
+    print(f"peak concurrent Groq calls: {groq_config.peak_in_flight}")
+    print(f"latency ms: p50={latency['p50_ms']} p95={latency['p95_ms']} p99={latency['p99_ms']}")
+
+    groq_server.shutdown()
+    wiki_server.shutdown()
+    ok = outcomes["error"] == 0 and groq_config.peak_in_flight <= settings.LLM_MAX_CONCURRENCY
+    print("PASS" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
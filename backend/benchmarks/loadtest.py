@@ -0,0 +1,336 @@
+"""
+Load-testing harness for the real app
+
+Starts the Groq and Wikipedia stand-ins, launches `uvicorn main:app` with
+each requested worker count, and drives a realistic mix of student traffic
+(login, upload, query, summarize, quiz, document list) at increasing
+concurrency. For every stage it reports throughput, latency percentiles and
+error rate, and marks the concurrency where latency breaks down.
+
+Run from the backend folder:
+    python -m benchmarks.loadtest --workers 1 2 4 --concurrency 1 4 16 64 --stage-seconds 30
+    python -m benchmarks.loadtest --target http://127.0.0.1:8000   # an already running server
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.fakes import data_env
+from benchmarks.fixtures import write_pdf
+from benchmarks.standins import GroqConfig, WikipediaConfig, start_standins
+from benchmarks.suite import summarize_latencies
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Relative weights of each action in a student's session
+DEFAULT_MIX = {
+    "query": 70,
+    "summarize": 8,
+    "quiz": 8,
+    "documents": 8,
+    "upload": 4,
+    "login": 2,
+}
+
+QUESTIONS = [
+    "What does chlorophyll absorb?",
+    "Explain the role of voltage in a circuit",
+    "What caused the revolution described in the notes?",
+    "How does supply and demand set market prices?",
+    "What is the difference between an element and a compound?",
+]
+
+
+class StageRecorder:
+    """Latency samples and errors for one load stage"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.status_codes: Dict[str, int] = {}
+
+    def record(self, action: str, latency_ms: float, status: Optional[int]):
+        self.samples.setdefault(action, []).append(latency_ms)
+        key = str(status) if status is not None else "exception"
+        self.status_codes[key] = self.status_codes.get(key, 0) + 1
+        if status is None or status >= 400:
+            self.errors[action] = self.errors.get(action, 0) + 1
+
+    def summary(self, elapsed: float) -> dict:
+        all_samples = [latency for samples in self.samples.values() for latency in samples]
+        total_errors = sum(self.errors.values())
+        return {
+            "requests": len(all_samples),
+            "throughput_rps": round(len(all_samples) / elapsed, 2) if elapsed else 0.0,
+            "error_rate": round(total_errors / len(all_samples), 4) if all_samples else 0.0,
+            "status_codes": self.status_codes,
+            "overall": summarize_latencies(all_samples, total_errors),
+            "actions": {
+                action: summarize_latencies(samples, self.errors.get(action, 0))
+                for action, samples in sorted(self.samples.items())
+            },
+        }
+
+
+class StudentSession:
+    """One virtual student: registers, uploads a document, then loops over the action mix"""
+
+    def __init__(self, client: httpx.AsyncClient, name: str, fixture: bytes, recorder: StageRecorder, think_ms: float):
+        self.client = client
+        self.name = name
+        self.fixture = fixture
+        self.recorder = recorder
+        self.think_ms = think_ms
+        self.headers: Dict[str, str] = {}
+        self.document_ids: List[int] = []
+
+    async def _call(self, action: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=self.headers, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(action, (time.perf_counter() - started) * 1000, None)
+            return None
+        self.recorder.record(action, (time.perf_counter() - started) * 1000, response.status_code)
+        return response
+
+    async def login(self):
+        response = await self._call(
+            "login", "POST", "/api/login", json={"username": self.name, "password": "loadtest"}
+        )
+        if response is not None and response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['session_token']}"}
+
+    async def upload(self):
+        response = await self._call(
+            "upload", "POST", "/api/upload",
+            files={"file": (f"{self.name}-{len(self.document_ids)}.pdf", self.fixture, "application/pdf")},
+        )
+        if response is not None and response.status_code == 200:
+            self.document_ids.append(response.json()["document_id"])
+
+    async def start(self):
+        await self.client.post("/api/register", json={"username": self.name, "password": "loadtest"})
+        await self.login()
+        await self.upload()
+
+    async def step(self, action: str):
+        if action == "query":
+            await self._call("query", "POST", "/api/query", json={
+                "question": random.choice(QUESTIONS),
+                "use_wikipedia": random.random() < 0.3,
+            })
+        elif action == "summarize" and self.document_ids:
+            await self._call("summarize", "POST", "/api/summarize", json={
+                "document_id": random.choice(self.document_ids),
+            })
+        elif action == "quiz" and self.document_ids:
+            await self._call("quiz", "POST", "/api/generate-quiz", json={
+                "document_id": random.choice(self.document_ids),
+                "num_questions": random.choice([3, 5, 10]),
+            })
+        elif action == "documents":
+            await self._call("documents", "GET", "/api/documents")
+        elif action == "upload":
+            await self.upload()
+        elif action == "login":
+            await self.login()
+
+    async def run(self, stop_at: float, mix: Dict[str, int]):
+        actions, weights = list(mix), list(mix.values())
+        while time.perf_counter() < stop_at:
+            await self.step(random.choices(actions, weights)[0])
+            if self.think_ms:
+                await asyncio.sleep(random.expovariate(1000 / self.think_ms))
+
+
+async def run_stage(base_url: str, stage: str, concurrency: int, seconds: float, fixture: bytes,
+                    mix: Dict[str, int], think_ms: float, timeout: float) -> dict:
+    """Run `concurrency` students for `seconds` and summarise the results"""
+    recorder = StageRecorder()
+    limits = httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        sessions = [
+            StudentSession(client, f"load-{stage}-{i}", fixture, recorder, think_ms)
+            for i in range(concurrency)
+        ]
+        await asyncio.gather(*(session.start() for session in sessions))
+        started = time.perf_counter()
+        await asyncio.gather(*(session.run(started + seconds, mix) for session in sessions))
+        elapsed = time.perf_counter() - started
+    result = recorder.summary(elapsed)
+    result["concurrency"] = concurrency
+    return result
+
+
+def find_breakdown(stages: List[dict], latency_factor: float, max_error_rate: float) -> Optional[int]:
+    """First concurrency whose p95 exceeds latency_factor x the lowest-load p95, or whose error rate is too high"""
+    if not stages:
+        return None
+    baseline_p95 = stages[0]["overall"]["p95_ms"] or 1.0
+    for stage in stages:
+        if stage["error_rate"] > max_error_rate or stage["overall"]["p95_ms"] > baseline_p95 * latency_factor:
+            return stage["concurrency"]
+    return None
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app(workers: int, env: Dict[str, str]) -> Tuple[subprocess.Popen, str]:
+    """Launch uvicorn with a fresh temporary database, vector store and uploads folder"""
+    port = free_port()
+    workdir = tempfile.mkdtemp(prefix=f"campus_load_w{workers}_")
+    app_env = dict(os.environ)
+    app_env.update(env)
+    app_env.update(data_env(workdir))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=app_env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 300  # first start may load the embedding model
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("uvicorn did not become healthy in time")
+
+
+def stop_app(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def print_stages(label: str, stages: List[dict], breakdown: Optional[int]):
+    print(f"\n== {label} ==")
+    print(f"{'users':>6}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}")
+    for stage in stages:
+        overall = stage["overall"]
+        marker = "  <- latency breaks down" if stage["concurrency"] == breakdown else ""
+        print(
+            f"{stage['concurrency']:>6}{stage['throughput_rps']:>9}{overall['p50_ms']:>10}"
+            f"{overall['p95_ms']:>10}{overall['p99_ms']:>10}{100 * stage['error_rate']:>8.1f}%{marker}"
+        )
+
+
+def parse_mix(text: Optional[str]) -> Dict[str, int]:
+    """Parse 'query=70,summarize=10,...' into weights"""
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in text.split(","):
+        action, weight = part.split("=")
+        if action not in DEFAULT_MIX:
+            raise ValueError(f"Unknown action in mix: {action}")
+        mix[action] = int(weight)
+    return mix
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the app with local Groq/Wikipedia stand-ins")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="uvicorn worker counts to test")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64],
+                        help="Concurrent students per stage")
+    parser.add_argument("--stage-seconds", type=float, default=30.0)
+    parser.add_argument("--think-ms", type=float, default=1000.0, help="Mean pause between a student's requests")
+    parser.add_argument("--mix", default=None, help="Action weights, e.g. query=70,summarize=8,quiz=8,upload=4")
+    parser.add_argument("--pages", type=int, default=5, help="Pages in the uploaded PDF")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--ttft-ms", type=float, default=400.0, help="Groq stand-in time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=250.0, help="Groq stand-in generation speed")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="Share of Groq calls answered with 429")
+    parser.add_argument("--wiki-latency-ms", type=float, default=150.0)
+    parser.add_argument("--latency-factor", type=float, default=3.0,
+                        help="p95 growth over the lowest-load stage that counts as breakdown")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--target", default=None, help="Test this running server instead of launching uvicorn")
+    parser.add_argument("--output", default=None, help="JSON results file (default bench_results/loadtest-<timestamp>.json)")
+    args = parser.parse_args(argv)
+    mix = parse_mix(args.mix)
+
+    groq_config = GroqConfig(args.ttft_ms, args.tokens_per_second, rate_limit_ratio=args.rate_limit_ratio)
+    groq_server, wiki_server, env = start_standins(groq_config, WikipediaConfig(args.wiki_latency_ms))
+    fixture_path = write_pdf(os.path.join(tempfile.mkdtemp(prefix="campus_load_"), "notes.pdf"), args.pages)
+    with open(fixture_path, "rb") as f:
+        fixture = f.read()
+
+    runs = []
+    targets = [("target", None)] if args.target else [(f"{w} worker(s)", w) for w in args.workers]
+    for label, workers in targets:
+        process = None
+        if workers is None:
+            base_url = args.target
+        else:
+            process, base_url = start_app(workers, env)
+        try:
+            stages = []
+            for concurrency in args.concurrency:
+                stage = asyncio.run(run_stage(
+                    base_url, f"w{workers}c{concurrency}", concurrency, args.stage_seconds,
+                    fixture, mix, args.think_ms, args.timeout,
+                ))
+                stages.append(stage)
+                print(f"  {label}: {concurrency} users -> {stage['throughput_rps']} req/s, "
+                      f"p95 {stage['overall']['p95_ms']} ms, errors {100 * stage['error_rate']:.1f}%")
+        finally:
+            if process is not None:
+                stop_app(process)
+        breakdown = find_breakdown(stages, args.latency_factor, args.max_error_rate)
+        runs.append({
+            "label": label,
+            "workers": workers,
+            "breakdown_concurrency": breakdown,
+            "peak_throughput_rps": max((s["throughput_rps"] for s in stages), default=0.0),
+            "stages": stages,
+        })
+        print_stages(label, stages, breakdown)
+
+    report = {
+        "meta": {"timestamp": datetime.now().isoformat(), "args": vars(args), "mix": mix},
+        "groq_standin": {
+            "requests": groq_config.requests,
+            "rate_limited": groq_config.rate_limited,
+            "peak_in_flight": groq_config.peak_in_flight,
+        },
+        "runs": runs,
+    }
+    output = args.output or os.path.join("bench_results", f"loadtest-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    groq_server.shutdown()
+    wiki_server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
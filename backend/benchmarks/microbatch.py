@@ -0,0 +1,82 @@
+"""
+Query embedding micro-batching benchmark
+
+Embeds questions from C concurrent threads, first one model call per
+question (the unbatched path) and then through MicroBatcher with each
+configured window, and reports throughput, p50/p99 latency and the mean
+batch size per concurrency level.
+
+Run from the backend folder:
+    python -m benchmarks.microbatch --concurrency 1 4 16 64 --windows 1 2 5 --max-batch 32
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fixtures import make_paragraphs
+from benchmarks.suite import summarize_latencies
+
+
+def run_level(embed, questions: list, concurrency: int) -> dict:
+    def one(question: str) -> float:
+        started = time.perf_counter()
+        embed(question)
+        return (time.perf_counter() - started) * 1000
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, questions[:concurrency]))  # warm up threads
+        started = time.perf_counter()
+        latencies = list(pool.map(one, questions))
+        elapsed = time.perf_counter() - started
+    report = summarize_latencies(latencies)
+    report["per_second"] = round(len(questions) / elapsed, 1)
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Throughput and tail latency of batched query embedding")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--windows", type=float, nargs="+", default=[1.0, 2.0, 5.0], help="Batch windows in ms")
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--queries", type=int, default=512)
+    parser.add_argument("--fake-embeddings", action="store_true")
+    args = parser.parse_args()
+
+    if args.fake_embeddings:
+        from benchmarks.fakes import HashEmbeddings
+        embeddings = HashEmbeddings()
+    else:
+        from langchain_huggingface import HuggingFaceEmbeddings
+        from app.config import settings
+        embeddings = HuggingFaceEmbeddings(model_name=settings.EMBEDDING_MODEL)
+    from app.utils.batching import MicroBatcher, BATCH_SIZE
+
+    # Question-length texts: the first sentence of each generated paragraph
+    questions = [p.split(". ")[0] + "?" for p in make_paragraphs(args.queries)]
+
+    variants = [("unbatched", None)] + [(f"window {w:g} ms", w) for w in args.windows]
+    print(f"{'mode':<16} {'threads':>7} {'queries/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'mean batch':>11}")
+    for label, window in variants:
+        if window is None:
+            embed = embeddings.embed_query
+        else:
+            batcher_name = f"bench_{window:g}"
+            batcher = MicroBatcher(batcher_name, embeddings.embed_documents, args.max_batch, window)
+            embed = batcher
+        for concurrency in args.concurrency:
+            batches_before = BATCH_SIZE.count(batcher=batcher_name) if window is not None else 0
+            report = run_level(embed, questions, concurrency)
+            mean_batch = "-"
+            if window is not None:
+                batches = BATCH_SIZE.count(batcher=batcher_name) - batches_before
+                # Warm-up queries also went through the batcher
+                mean_batch = f"{(len(questions) + concurrency) / max(batches, 1):.1f}"
+            print(f"{label:<16} {concurrency:>7} {report['per_second']:>10} {report['p50_ms']:>8} "
+                  f"{report['p99_ms']:>8} {mean_batch:>11}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
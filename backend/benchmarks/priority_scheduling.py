@@ -0,0 +1,186 @@
+"""
+Query latency under heavy ingestion, with and without the priority scheduler
+
+Runs the in-process app against fake Groq and measures /api/query latency
+for a student asking one question after another: first on an idle server,
+then while several other students keep uploading large PDFs. Each mode
+(scheduler disabled, enabled) runs in its own process on a fresh corpus.
+Reports query p50/p99, documents ingested, and the scheduler's queue depth
+and wait times. It fails (exit code 1) if the p99 under ingestion with the
+scheduler exceeds --max-slowdown (default 2) times the idle p99, if no
+upload completed during the measurement (nothing was tested), or if a mode
+crashes or exceeds --timeout.
+
+Run from the backend folder:
+    python -m benchmarks.priority_scheduling --uploaders 4 --pages 40 --fake-embeddings
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import queue
+import sys
+import tempfile
+import time
+
+from benchmarks.suite import summarize_latencies
+
+
+async def login(client, username: str) -> dict:
+    await client.post("/api/register", json={"username": username, "password": "schedule"})
+    response = await client.post("/api/login", json={"username": username, "password": "schedule"})
+    return {"Authorization": f"Bearer {response.json()['session_token']}"}
+
+
+async def ask(client, headers: dict, count: int) -> list:
+    """Sequential distinct questions (so nothing is coalesced), returning latencies in ms"""
+    latencies = []
+    for i in range(count):
+        started = time.perf_counter()
+        response = await client.post(
+            "/api/query", headers=headers,
+            json={"question": f"What does chlorophyll absorb in experiment {i}?", "use_wikipedia": False}
+        )
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+async def upload_loop(client, headers: dict, fixture: str, name: str, stop: asyncio.Event, done: list):
+    """Upload the fixture under fresh names until stopped"""
+    index = 0
+    while not stop.is_set():
+        with open(fixture, "rb") as f:
+            response = await client.post(
+                "/api/upload", headers=headers, files={"file": (f"{name}-{index}.pdf", f.read())}
+            )
+        done.append(response.status_code)
+        index += 1
+
+
+async def phase(client, label: str, query_headers: dict, upload_headers: list, fixture: str, args) -> dict:
+    from app.utils.scheduler import scheduler, PRIORITIES
+
+    stop = asyncio.Event()
+    uploads: list = []
+    uploaders = [
+        asyncio.create_task(upload_loop(client, headers, fixture, f"{label}-{n}", stop, uploads))
+        for n, headers in enumerate(upload_headers)
+    ]
+    max_depth = {priority: 0 for priority in PRIORITIES}
+
+    async def watch():
+        while not stop.is_set():
+            for priority in PRIORITIES:
+                max_depth[priority] = max(max_depth[priority], scheduler.queue_depth(priority))
+            await asyncio.sleep(0.05)
+
+    watcher = asyncio.create_task(watch())
+    if uploaders:
+        await asyncio.sleep(args.warmup)  # let ingestion get going
+    latencies = await ask(client, query_headers, args.queries)
+    stop.set()
+    await asyncio.gather(*uploaders, watcher)
+    return {
+        "label": label,
+        "latency": summarize_latencies(latencies),
+        "uploads_ok": sum(1 for status in uploads if status == 200),
+        "uploads_rejected": sum(1 for status in uploads if status == 503),
+        "max_depth": max_depth,
+    }
+
+
+async def run(args, enabled: bool) -> list:
+    import httpx
+    from main import app
+    from app.models.database import init_auth_db
+    from app.utils.scheduler import scheduler, SCHEDULER_WAIT_SECONDS, PRIORITIES
+    from benchmarks.fixtures import write_pdf
+
+    scheduler.enabled = enabled
+    init_auth_db()
+    fixture = write_pdf(os.path.join(tempfile.mkdtemp(), "chapter.pdf"), args.pages)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=600) as client:
+        query_headers = await login(client, "asker")
+        upload_headers = [await login(client, f"uploader{n}") for n in range(args.uploaders)]
+        with open(fixture, "rb") as f:
+            await client.post("/api/upload", headers=query_headers, files={"file": ("seed.pdf", f.read())})
+
+        mode = "scheduler" if enabled else "no scheduler"
+        reports = [
+            await phase(client, f"idle ({mode})", query_headers, [], fixture, args),
+            await phase(client, f"ingest ({mode})", query_headers, upload_headers, fixture, args),
+        ]
+    reports[-1]["mean_wait_ms"] = {
+        priority: round(SCHEDULER_WAIT_SECONDS.total(priority=priority) / count * 1000, 1)
+        for priority in PRIORITIES
+        if (count := SCHEDULER_WAIT_SECONDS.count(priority=priority))
+    }
+    return reports
+
+
+def run_mode(args, enabled: bool, results):
+    """One mode in a fresh process and data folder, so both start from the same corpus"""
+    from benchmarks import fakes
+    fakes.use_temp_data("campus_schedule_")
+    fakes.install(fake_embeddings=args.fake_embeddings, llm_latency_ms=args.llm_latency_ms)
+    if args.fake_embeddings:
+        fakes.use_offline_tokenizer()
+    results.put(asyncio.run(run(args, enabled)))
+
+    # Process children skip atexit hooks, so idle extraction workers must be stopped here
+    from app.services.bulk_upload import bulk_upload_service
+    bulk_upload_service.shutdown()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Query latency under concurrent ingestion")
+    parser.add_argument("--queries", type=int, default=40)
+    parser.add_argument("--uploaders", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=40, help="Pages in each uploaded PDF")
+    parser.add_argument("--warmup", type=float, default=1.0, help="Seconds of ingestion before querying")
+    parser.add_argument("--llm-latency-ms", type=float, default=100.0)
+    parser.add_argument("--max-slowdown", type=float, default=2.0)
+    parser.add_argument("--timeout", type=float, default=1800, help="Seconds allowed per mode")
+    parser.add_argument("--fake-embeddings", action="store_true")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    reports = []
+    for enabled in (False, True):
+        results = context.Queue()
+        process = context.Process(target=run_mode, args=(args, enabled, results))
+        process.start()
+        try:
+            reports.extend(results.get(timeout=args.timeout))
+        except queue.Empty:
+            process.terminate()
+            process.join()
+            mode = "scheduler" if enabled else "no scheduler"
+            print(f"FAIL: the {mode} run crashed (exit code {process.exitcode}) or took over {args.timeout}s")
+            return 1
+        process.join()
+
+    print(f"queries={args.queries} uploaders={args.uploaders} pages/upload={args.pages}")
+    print(f"{'phase':<24} {'p50 ms':>8} {'p99 ms':>8} {'uploads':>8} {'503s':>5}  max queue depth")
+    for report in reports:
+        depth = " ".join(f"{p}={d}" for p, d in report["max_depth"].items())
+        print(f"{report['label']:<24} {report['latency']['p50_ms']:>8} {report['latency']['p99_ms']:>8} "
+              f"{report['uploads_ok']:>8} {report['uploads_rejected']:>5}  {depth}")
+    waits = ", ".join(f"{p} {ms} ms" for p, ms in reports[-1]["mean_wait_ms"].items())
+    print(f"mean admission wait with the scheduler: {waits}")
+
+    idle, scheduled = reports[2]["latency"]["p99_ms"], reports[3]["latency"]["p99_ms"]
+    if not reports[3]["uploads_ok"]:
+        print("FAIL: no upload finished while querying, so latency under ingestion was not measured")
+        return 1
+    ok = scheduled <= args.max_slowdown * idle
+    print(f"{'PASS' if ok else 'FAIL'}: p99 under ingestion {scheduled} ms vs idle {idle} ms "
+          f"(limit {args.max_slowdown}x)")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
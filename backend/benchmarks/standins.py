@@ -0,0 +1,281 @@
+"""
+Local HTTP stand-ins for Groq and Wikipedia (standard library only)
+
+The Groq stand-in speaks the OpenAI-compatible chat completions API that
+the Groq SDK calls, with configurable time-to-first-token, generation
+speed, streaming and injected 429s. The Wikipedia stand-in answers the
+MediaWiki API queries made by the `wikipedia` package.
+
+Point the app at them with:
+    GROQ_API_BASE=http://127.0.0.1:9100
+    WIKIPEDIA_API_URL=http://127.0.0.1:9200/w/api.php
+
+Run standalone from the backend folder:
+    python -m benchmarks.standins --groq-port 9100 --wiki-port 9200 --ttft-ms 400 --tokens-per-second 250
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+FAKE_ANSWER = (
+    "Photosynthesis is the process by which green plants use light energy to "
+    "convert carbon dioxide and water into glucose and oxygen."
+)
+
+FAKE_QUIZ_QUESTION = """Question {n}: Which pigment absorbs light during photosynthesis?
+A) Chlorophyll
+B) Haemoglobin
+C) Keratin
+D) Melanin
+Correct Answer: A
+"""
+
+
+def fake_completion(prompt: str) -> str:
+    """Canned answer, shaped like a quiz when the prompt asks for one"""
+    if "multiple-choice" in prompt:
+        match = re.search(r"Generate (\d+)", prompt)
+        count = int(match.group(1)) if match else 5
+        return "\n".join(FAKE_QUIZ_QUESTION.format(n=n) for n in range(1, count + 1))
+    return FAKE_ANSWER
+
+
+class GroqConfig:
+    """Latency and failure behaviour of the Groq stand-in"""
+
+    def __init__(
+        self,
+        ttft_ms: float = 300.0,
+        tokens_per_second: float = 250.0,
+        jitter: float = 0.2,
+        rate_limit_ratio: float = 0.0,
+        retry_after_s: float = 1.0
+    ):
+        self.ttft_ms = ttft_ms
+        self.tokens_per_second = tokens_per_second
+        self.jitter = jitter
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after_s = retry_after_s
+        self.requests = 0
+        self.rate_limited = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+
+    def delay(self, seconds: float) -> float:
+        return max(seconds * random.uniform(1 - self.jitter, 1 + self.jitter), 0.0)
+
+
+class GroqHandler(BaseHTTPRequestHandler):
+    """POST /openai/v1/chat/completions"""
+
+    config = GroqConfig()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict, headers: dict = None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        config = self.config
+        with config._lock:
+            config.requests += 1
+            limited = random.random() < config.rate_limit_ratio
+            if limited:
+                config.rate_limited += 1
+            else:
+                config.in_flight += 1
+                config.peak_in_flight = max(config.peak_in_flight, config.in_flight)
+        if limited:
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit reached", "type": "tokens", "code": "rate_limit_exceeded"}},
+                {"Retry-After": str(config.retry_after_s)}
+            )
+            return
+
+        try:
+            prompt = " ".join(str(m.get("content", "")) for m in request.get("messages", []))
+            text = fake_completion(prompt)
+            words = text.split(" ")
+            usage = {
+                "prompt_tokens": max(len(prompt) // 4, 1),
+                "completion_tokens": len(words),
+                "total_tokens": max(len(prompt) // 4, 1) + len(words),
+            }
+            model = request.get("model", "stand-in")
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            per_token = 1.0 / config.tokens_per_second if config.tokens_per_second else 0.0
+
+            time.sleep(config.delay(config.ttft_ms / 1000))
+            if request.get("stream"):
+                self._stream(completion_id, model, words, per_token, usage)
+            else:
+                time.sleep(config.delay(per_token * len(words)))
+                self._send_json(200, {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": text},
+                        "logprobs": None,
+                        "finish_reason": "stop",
+                    }],
+                    "usage": usage,
+                    "system_fingerprint": "stand-in",
+                })
+        finally:
+            with config._lock:
+                config.in_flight -= 1
+
+    def _stream(self, completion_id: str, model: str, words: list, per_token: float, usage: dict):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(delta: dict, finish_reason=None, extra: dict = None):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "logprobs": None, "finish_reason": finish_reason}],
+            }
+            chunk.update(extra or {})
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+
+        event({"role": "assistant", "content": ""})
+        for i, word in enumerate(words):
+            event({"content": word if i == 0 else f" {word}"})
+            time.sleep(self.config.delay(per_token))
+        event({}, "stop", {"x_groq": {"usage": usage}})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class WikipediaConfig:
+    """Latency of the Wikipedia stand-in"""
+
+    def __init__(self, latency_ms: float = 150.0, jitter: float = 0.2):
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.requests = 0
+
+
+class WikipediaHandler(BaseHTTPRequestHandler):
+    """GET /w/api.php with the query shapes used by wikipedia.search / wikipedia.summary"""
+
+    config = WikipediaConfig()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        params = {key: values[0] for key, values in parse_qs(urlparse(self.path).query, keep_blank_values=True).items()}
+        self.config.requests += 1
+        latency = self.config.latency_ms / 1000
+        time.sleep(max(latency * random.uniform(1 - self.config.jitter, 1 + self.config.jitter), 0.0))
+
+        if params.get("list") == "search":
+            title = params.get("srsearch", "Topic").strip().title() or "Topic"
+            body = {"query": {"search": [{"title": title}], "searchinfo": {}}}
+        else:
+            title = params.get("titles", "Topic")
+            page_id = str(abs(hash(title)) % 1_000_000 + 1)
+            page = {"pageid": int(page_id), "ns": 0, "title": title}
+            if params.get("prop") == "extracts":
+                sentences = int(params.get("exsentences") or 3)
+                page["extract"] = " ".join(
+                    f"{title} is a topic covered in the school curriculum." for _ in range(sentences)
+                )
+            else:
+                page["fullurl"] = f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}"
+            body = {"query": {"pages": {page_id: page}}}
+
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start_server(handler_class, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve handler_class on a daemon thread; port 0 picks a free port"""
+    server = ThreadingHTTPServer((host, port), handler_class)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_standins(groq_config: GroqConfig, wiki_config: WikipediaConfig, groq_port: int = 0, wiki_port: int = 0):
+    """Start both stand-ins and return (groq_server, wiki_server, env vars for the app)"""
+    GroqHandler.config = groq_config
+    WikipediaHandler.config = wiki_config
+    groq_server = start_server(GroqHandler, groq_port)
+    wiki_server = start_server(WikipediaHandler, wiki_port)
+    env = {
+        "GROQ_API_BASE": f"http://127.0.0.1:{groq_server.server_address[1]}",
+        "GROQ_API_KEY": "stand-in",
+        "WIKIPEDIA_API_URL": f"http://127.0.0.1:{wiki_server.server_address[1]}/w/api.php",
+    }
+    return groq_server, wiki_server, env
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run local Groq and Wikipedia stand-ins")
+    parser.add_argument("--groq-port", type=int, default=9100)
+    parser.add_argument("--wiki-port", type=int, default=9200)
+    parser.add_argument("--ttft-ms", type=float, default=300.0, help="Groq time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=250.0, help="Groq generation speed")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="Share of Groq calls answered with 429")
+    parser.add_argument("--wiki-latency-ms", type=float, default=150.0)
+    args = parser.parse_args()
+
+    _, _, env = start_standins(
+        GroqConfig(args.ttft_ms, args.tokens_per_second, rate_limit_ratio=args.rate_limit_ratio),
+        WikipediaConfig(args.wiki_latency_ms),
+        args.groq_port,
+        args.wiki_port,
+    )
+    for key, value in env.items():
+        print(f"{key}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
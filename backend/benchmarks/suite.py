@@ -0,0 +1,229 @@
+"""
+Offline end-to-end benchmark suite
+
+Measures each ingestion stage (extract, chunk, embed, upsert) on synthetic
+PDF/DOCX/PPTX fixtures and the latency percentiles of the main API endpoints
+through the FastAPI app. Groq and Wikipedia are replaced by local fakes, and
+all state (SQLite, ChromaDB, uploads) lives in a temporary folder.
+
+Run from the backend folder:
+    python -m benchmarks.suite --pages 50 --iterations 30 --output bench_results/run.json
+    python -m benchmarks.suite --compare bench_results/baseline.json
+
+Use --fake-embeddings on machines without the MiniLM model in the local
+Hugging Face cache.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarize_latencies(samples_ms: List[float], errors: int = 0) -> dict:
+    """p50/p95/p99/mean of a list of latencies in milliseconds"""
+    return {
+        "count": len(samples_ms),
+        "errors": errors,
+        "mean_ms": round(statistics.fmean(samples_ms), 2) if samples_ms else 0.0,
+        "p50_ms": round(percentile(samples_ms, 50), 2),
+        "p95_ms": round(percentile(samples_ms, 95), 2),
+        "p99_ms": round(percentile(samples_ms, 99), 2),
+    }
+
+
+def timed(func: Callable, *args, **kwargs):
+    """Call func and return (result, elapsed seconds)"""
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def bench_ingestion(fixtures: Dict[str, str]) -> dict:
+    """Time extract, chunk, embed and upsert separately for each fixture"""
+    from app.services.document_processor import DocumentProcessor
+    from app.services.embedding_service import embedding_service
+
+    collection = embedding_service.chroma_client.get_or_create_collection("benchmark_ingestion")
+    results = {}
+    for file_type, path in fixtures.items():
+        text, extract_s = timed(DocumentProcessor.process_document, path, file_type)
+        chunks, chunk_s = timed(embedding_service.chunk_text, text)
+        vectors, embed_s = timed(embedding_service.embeddings.embed_documents, chunks)
+        name = os.path.basename(path)
+        _, upsert_s = timed(
+            collection.upsert,
+            ids=[f"{name}-{i}" for i in range(len(chunks))],
+            embeddings=vectors,
+            documents=chunks,
+            metadatas=[{"source": name, "chunk_index": i} for i in range(len(chunks))],
+        )
+        results[file_type] = {
+            "file_bytes": os.path.getsize(path),
+            "characters": len(text),
+            "chunks": len(chunks),
+            "extract_s": round(extract_s, 4),
+            "chunk_s": round(chunk_s, 4),
+            "embed_s": round(embed_s, 4),
+            "upsert_s": round(upsert_s, 4),
+            "total_s": round(extract_s + chunk_s + embed_s + upsert_s, 4),
+        }
+    return results
+
+
+def bench_api(fixtures: Dict[str, str], iterations: int) -> dict:
+    """Latency percentiles of the main endpoints through the FastAPI app"""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    results = {}
+    with TestClient(app) as client:
+        client.post("/api/register", json={"username": "benchmark", "password": "benchmark"})
+        token = client.post(
+            "/api/login", json={"username": "benchmark", "password": "benchmark"}
+        ).json()["session_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        upload_ms, upload_errors, document_ids = [], 0, []
+        for file_type, path in fixtures.items():
+            with open(path, "rb") as f:
+                started = time.perf_counter()
+                response = client.post(
+                    "/api/upload", headers=headers, files={"file": (os.path.basename(path), f)}
+                )
+                upload_ms.append((time.perf_counter() - started) * 1000)
+            if response.status_code == 200:
+                document_ids.append(response.json()["document_id"])
+            else:
+                upload_errors += 1
+        results["/api/upload"] = summarize_latencies(upload_ms, upload_errors)
+
+        calls = {
+            "/api/query": lambda i: client.post(
+                "/api/query", headers=headers,
+                json={"question": "What does chlorophyll absorb?", "use_wikipedia": i % 2 == 1},
+            ),
+            "/api/summarize": lambda i: client.post(
+                "/api/summarize", headers=headers,
+                json={"document_id": document_ids[i % len(document_ids)]},
+            ),
+            "/api/generate-quiz": lambda i: client.post(
+                "/api/generate-quiz", headers=headers,
+                json={"document_id": document_ids[i % len(document_ids)], "num_questions": 5},
+            ),
+            "/api/documents": lambda i: client.get("/api/documents", headers=headers),
+        }
+        for endpoint, call in calls.items():
+            samples, errors = [], 0
+            for i in range(iterations):
+                started = time.perf_counter()
+                response = call(i)
+                samples.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    errors += 1
+            results[endpoint] = summarize_latencies(samples, errors)
+    return results
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> List[str]:
+    """Lines describing metrics that got slower than baseline by more than threshold"""
+    regressions = []
+    for section, keys in (("ingestion", ("extract_s", "chunk_s", "embed_s", "upsert_s", "total_s")),
+                          ("api", ("p50_ms", "p95_ms", "p99_ms"))):
+        for name, metrics in current.get(section, {}).items():
+            old = baseline.get(section, {}).get(name, {})
+            for key in keys:
+                before, after = old.get(key), metrics.get(key)
+                if before and after and after > before * (1 + threshold):
+                    regressions.append(
+                        f"{section} {name} {key}: {before} -> {after} (+{100 * (after / before - 1):.0f}%)"
+                    )
+    return regressions
+
+
+def print_report(report: dict):
+    print(f"\n{'ingestion':<8}{'chars':>10}{'chunks':>8}{'extract':>10}{'chunk':>9}{'embed':>9}{'upsert':>9}")
+    for file_type, r in report["ingestion"].items():
+        print(
+            f"{file_type:<8}{r['characters']:>10}{r['chunks']:>8}{r['extract_s']:>10}"
+            f"{r['chunk_s']:>9}{r['embed_s']:>9}{r['upsert_s']:>9}"
+        )
+    print(f"\n{'endpoint':<22}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for endpoint, r in report["api"].items():
+        print(f"{endpoint:<22}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}{r['errors']:>8}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline ingestion and API benchmark suite")
+    parser.add_argument("--pages", type=int, default=50, help="Pages (PDF/DOCX) and slides (PPTX) per fixture")
+    parser.add_argument("--iterations", type=int, default=30, help="Requests per endpoint")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated Groq latency")
+    parser.add_argument("--wiki-latency-ms", type=float, default=0.0, help="Simulated Wikipedia latency")
+    parser.add_argument("--fake-embeddings", action="store_true", help="Use hash embeddings instead of MiniLM")
+    parser.add_argument("--output", default=None, help="JSON results file (default bench_results/<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="Baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown vs baseline (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    from benchmarks import fakes
+    workdir = fakes.use_temp_data("campus_bench_")
+    fakes.install(
+        fake_embeddings=args.fake_embeddings,
+        llm_latency_ms=args.llm_latency_ms,
+        wiki_latency_ms=args.wiki_latency_ms,
+    )
+    if args.fake_embeddings:
+        fakes.use_offline_tokenizer()
+
+    from benchmarks.fixtures import write_fixtures
+    fixtures = write_fixtures(os.path.join(workdir, "fixtures"), args.pages)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "ingestion": bench_ingestion(fixtures),
+        "api": bench_api(fixtures, args.iterations),
+    }
+    print_report(report)
+
+    output = args.output or os.path.join(
+        "bench_results", f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) vs {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions vs {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Local exact-search vector store vs Chroma at different corpus sizes
+
+For each corpus size the same clustered 384-d vectors (with chunk text and
+metadata) are written to a LocalVectorStore (float32 and float16) and to a
+Chroma collection with the app's HNSW settings. Each is then opened in a
+fresh process, which runs the query set the way search_candidates does
+(top-k with documents, metadata and embeddings) and reports query latency,
+the resident memory the open store added and its size on disk. Recall is
+measured against exact search, so the local store always scores 1.0.
+
+Run from the backend folder:
+    python -m benchmarks.vector_backend --sizes 500 2000 10000 50000
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.hnsw_tuning import exact_top_k, make_synthetic
+from benchmarks.suite import summarize_latencies
+
+
+def directory_mb(path: str) -> float:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total / 2 ** 20
+
+
+def build(backend: str, path: str, vectors: np.ndarray, space: str) -> float:
+    """Write the corpus, returning the seconds it took"""
+    ids = [str(i) for i in range(len(vectors))]
+    documents = [f"chunk {i} " + "lorem ipsum " * 80 for i in range(len(vectors))]
+    metadatas = [{"source": f"doc{i // 40}.pdf", "chunk_index": i % 40} for i in range(len(vectors))]
+    started = time.perf_counter()
+    if backend == "chroma":
+        import chromadb
+        from app.config import settings
+        client = chromadb.PersistentClient(path=path)
+        hnsw = dict(settings.hnsw_config("course_materials"), space=space)
+        collection = client.create_collection("course_materials", configuration={"hnsw": hnsw})
+        for start in range(0, len(vectors), 1000):
+            collection.add(
+                ids=ids[start:start + 1000], embeddings=vectors[start:start + 1000],
+                documents=documents[start:start + 1000], metadatas=metadatas[start:start + 1000]
+            )
+    else:
+        from app.services.local_vector_store import LocalVectorStore
+        store = LocalVectorStore(os.path.join(path, "course_materials"), backend.split("-")[1], space)
+        store.add(ids, vectors, documents, metadatas)
+    return time.perf_counter() - started
+
+
+def serve(backend: str, path: str, queries: np.ndarray, k: int, space: str, results):
+    """Fresh process: open the store, run every query, report latency, ids and RSS growth"""
+    from app.services.embedding_server import resident_memory_mb
+    if backend == "chroma":
+        import chromadb
+        baseline = resident_memory_mb()
+        collection = chromadb.PersistentClient(path=path).get_collection("course_materials")
+
+        def search(query):
+            result = collection.query(
+                query_embeddings=[query], n_results=k, include=["documents", "metadatas", "embeddings"]
+            )
+            return [int(i) for i in result["ids"][0]]
+    else:
+        from app.services.local_vector_store import LocalVectorStore
+        baseline = resident_memory_mb()
+        store = LocalVectorStore(os.path.join(path, "course_materials"), backend.split("-")[1], space)
+        ids_by_text = None
+
+        def search(query):
+            nonlocal ids_by_text
+            documents, _, _ = store.search(query, k)
+            if ids_by_text is None:
+                snapshot = store._load()
+                ids_by_text = {text: int(i) for i, text in zip(snapshot.ids, snapshot.documents)}
+            return [ids_by_text[text] for text in documents]
+
+    search(queries[0])
+    latencies, found = [], []
+    for query in queries:
+        started = time.perf_counter()
+        found.append(search(query))
+        latencies.append((time.perf_counter() - started) * 1000)
+    results.put({"latencies": latencies, "found": found, "rss_mb": resident_memory_mb() - baseline})
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare the local exact vector store with Chroma")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 2000, 10000, 50000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20, help="Candidates fetched per query (CONTEXT_FETCH_K)")
+    parser.add_argument("--space", choices=["l2", "cosine", "ip"], default="l2")
+    parser.add_argument("--backends", nargs="+", default=["local-float32", "local-float16", "chroma"])
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    print(f"queries={args.queries} k={args.k} space={args.space}")
+    print(f"{'chunks':>7} {'backend':<14} {'build s':>8} {'p50 ms':>8} {'p99 ms':>8} {'recall':>7} "
+          f"{'RSS +MiB':>9} {'disk MiB':>9}")
+    for size in args.sizes:
+        vectors = make_synthetic(size + args.queries, seed=size)
+        queries, corpus = vectors[:args.queries], vectors[args.queries:]
+        truth = exact_top_k(corpus, queries, min(args.k, size), args.space)
+        for backend in args.backends:
+            path = tempfile.mkdtemp(prefix="campus_vectors_")
+            build_s = build(backend, path, corpus, args.space)
+            results = context.Queue()
+            process = context.Process(target=serve, args=(backend, path, queries, args.k, args.space, results))
+            process.start()
+            outcome = results.get()
+            process.join()
+
+            hits = sum(len(set(found) & set(expected.tolist())) for found, expected in zip(outcome["found"], truth))
+            recall = hits / truth.size
+            latency = summarize_latencies(outcome["latencies"])
+            print(f"{size:>7} {backend:<14} {build_s:>8.2f} {latency['p50_ms']:>8} {latency['p99_ms']:>8} "
+                  f"{recall:>7.3f} {outcome['rss_mb']:>9.1f} {directory_mb(path):>9.1f}", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
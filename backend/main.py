@@ -1,10 +1,19 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from dotenv import load_dotenv
 from app.api.routes import router
 from app.models.database import init_auth_db
 from app.api.auth_routes import router as auth_router
+from app.api.profile_routes import router as profile_router
+from app.utils.concurrency import OverloadedError
+from app.utils.metrics import metrics, HTTP_REQUEST_SECONDS
+from app.utils.profiling import profile_store
+from app.services.precompute import precomputer
+from app.services.bulk_upload import bulk_upload_service
+from app.config import settings
 import os
+import time
 
 # Load environment variables
 load_dotenv()
@@ -22,6 +31,23 @@ app = FastAPI(
 @app.on_event("startup")
 async def startup_event():
     init_auth_db()
+    if settings.PRECOMPUTE_ENABLED:
+        precomputer.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    bulk_upload_service.shutdown()
+
+
+# Shed load quickly when the LLM queue is full instead of returning 500s
+@app.exception_handler(OverloadedError)
+async def overloaded_handler(request: Request, exc: OverloadedError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(int(round(exc.retry_after)), 1))}
+    )
 
 
 # Configure CORS
@@ -33,9 +59,59 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+def route_template(request: Request) -> str:
+    """Path template of the route that handled the request, e.g. /api/documents/{document_id}"""
+    endpoint = request.scope.get("endpoint")
+    for route in request.app.routes:
+        if endpoint is not None and getattr(route, "endpoint", None) is endpoint:
+            return route.path
+    return "unmatched"
+
+
+# Record latency of every request, labelled by route template
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=route_template(request),
+            status=str(status)
+        )
+
+
+# Profile a request when it carries the admin X-Profile-Token header, or is randomly sampled
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    if not profile_store.should_profile(request.headers.get("x-profile-token")):
+        return await call_next(request)
+    
+    profile = profile_store.start()
+    if profile is None:
+        return await call_next(request)
+    
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        name = profile_store.stop(
+            profile, request.method, request.url.path, time.perf_counter() - started
+        )
+    response.headers["X-Profile-Id"] = name
+    return response
+
+
 # Include API routes
 app.include_router(router, prefix="/api", tags=["Smart Campus Assistant"])
 app.include_router(auth_router)
+app.include_router(profile_router)
 
 
 @app.get("/")
@@ -49,6 +125,7 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Per-stage timings and counters in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
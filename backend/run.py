@@ -0,0 +1,13 @@
+"""
+Start the development server: python run.py
+
+Kept apart from main.py because processes started with the "spawn" method
+(the extraction pool, uvicorn's reloader) re-import the launching script.
+Importing main.py there would load the routes, the embedding model and
+Chroma in every extraction worker.
+"""
+
+import uvicorn
+
+if __name__ == "__main__":
+    uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)